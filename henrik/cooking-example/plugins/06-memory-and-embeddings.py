@@ -1,17 +1,22 @@
 import semantic_kernel as sk
 import os
 import sys
-import asyncio
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai.services.open_ai_chat_completion import OpenAIChatCompletion
 from semantic_kernel.connectors.ai.open_ai.services.open_ai_text_embedding import OpenAITextEmbedding
 from semantic_kernel.core_plugins.text_memory_plugin import TextMemoryPlugin
 from semantic_kernel.kernel import Kernel
 from semantic_kernel.memory.semantic_text_memory import SemanticTextMemory
-from semantic_kernel.memory.volatile_memory_store import VolatileMemoryStore
 from semantic_kernel.functions import KernelFunction
 from semantic_kernel.prompt_template import PromptTemplateConfig
 from semantic_kernel.functions import KernelArguments
+from runner import get_async_client, run
+from memory_ingestion import BatchSemanticTextMemory, MemoryInput, benchmark_ingestion
+from numpy_memory_store import NumpyMemoryStore
+from persistent_memory_store import PersistentMemoryStore
+from embedding_cache import CachedTextEmbedding
+from ivf_index import benchmark_ivf
+from parallel_prompt_template import ParallelKernelPromptTemplate, benchmark_render
 load_dotenv()
 
 # Get paths
@@ -30,32 +35,43 @@ Convert the text to uppercase."""
 kernel = Kernel()
 chat_service_id = "chat"
 collection_id = "generic"
+memory_directory = os.path.join(notebook_dir, "memory-store")      # Embeddings saved here are reused by the next run
+embedding_cache_path = os.path.join(notebook_dir, "embedding-cache.sqlite")     # Embeddings of texts and queries seen before
 
 # Add services (chat and text embedding)
 oai_chat_service = OpenAIChatCompletion(
         service_id=chat_service_id,
+        async_client=get_async_client(),
 )
-embedding_gen = OpenAITextEmbedding(
-    ai_model_id="text-embedding-3-small",
+embedding_gen = CachedTextEmbedding(
+    OpenAITextEmbedding(
+        ai_model_id="text-embedding-3-small",
+        async_client=get_async_client(),
+    ),
+    cache_path=embedding_cache_path,
 )
 kernel.add_service(oai_chat_service)
 kernel.add_service(embedding_gen)
 
 # Define memory
-memory = SemanticTextMemory(storage=VolatileMemoryStore(), embeddings_generator=embedding_gen)
+memory = BatchSemanticTextMemory(storage=PersistentMemoryStore(memory_directory), embeddings_generator=embedding_gen)
 
 # Add plugin
 kernel.add_plugin(TextMemoryPlugin(memory), "TextMemoryPlugin")
 
 
 # Manually adding memories
-async def populate_memory(memory: SemanticTextMemory) -> None:
-    # Add some documents to the semantic memory
-    await memory.save_information(collection=collection_id, id="info1", text="Your budget for 2024 is $100,000")
-    await memory.save_information(collection=collection_id, id="info2", text="Your savings from 2023 are $50,000")
-    await memory.save_information(collection=collection_id, id="info3", text="Your investments are $80,000")
-
-# asyncio.run(populate_memory(memory))
+async def populate_memory(memory: BatchSemanticTextMemory) -> None:
+    # Add some documents to the semantic memory (embedded in one batch, upserted in one call, skipped if saved by a previous run)
+    await memory.save_batch(
+        collection=collection_id,
+        skip_existing=True,
+        records=[
+            MemoryInput(id="info1", text="Your budget for 2024 is $100,000"),
+            MemoryInput(id="info2", text="Your savings from 2023 are $50,000"),
+            MemoryInput(id="info3", text="Your investments are $80,000"),
+        ],
+    )
 
 # Search the memory
 async def search_memory_examples(memory: SemanticTextMemory) -> None:
@@ -69,8 +85,6 @@ async def search_memory_examples(memory: SemanticTextMemory) -> None:
         print(f"Question: {question}")
         result = await memory.search(collection_id, question)
         print(f"Answer: {result[0].text}\n")
-        
-# asyncio.run(search_memory_examples(memory))
 
 
 ## Using Memory in chat    -    'recall' takes an input ask and performs a similarity search on the contents that have been embedded in the Memory Store and returns the most relevant memory.
@@ -102,6 +116,7 @@ async def setup_chat_with_memory(
         function_name="chat_with_memory",
         plugin_name="chat",
         prompt_template_config=prompt_template_config,
+        prompt_template=ParallelKernelPromptTemplate(prompt_template_config=prompt_template_config),     # The recall blocks run concurrently
     )
 
     return chat_func
@@ -110,7 +125,7 @@ async def setup_chat_with_memory(
 
 
 ## Testing
-def main():
+async def main():
     
     # Setup
     kernel = Kernel()
@@ -119,26 +134,31 @@ def main():
     # Add services, memory and plugins
     oai_chat_service = OpenAIChatCompletion(
             service_id=chat_service_id,
+            async_client=get_async_client(),
     )
-    embedding_gen = OpenAITextEmbedding(
-        ai_model_id="text-embedding-3-small",
+    embedding_gen = CachedTextEmbedding(
+        OpenAITextEmbedding(
+            ai_model_id="text-embedding-3-small",
+            async_client=get_async_client(),
+        ),
+        cache_path=embedding_cache_path,
     )
     kernel.add_service(oai_chat_service)
     kernel.add_service(embedding_gen)
 
-    memory = SemanticTextMemory(storage=VolatileMemoryStore(), embeddings_generator=embedding_gen)
+    memory = BatchSemanticTextMemory(storage=PersistentMemoryStore(memory_directory), embeddings_generator=embedding_gen)
 
     kernel.add_plugin(TextMemoryPlugin(memory), "TextMemoryPlugin")
     
     
     print("Populating memory...")
-    asyncio.run(populate_memory(memory))
+    await populate_memory(memory)
 
     print("Asking questions... (manually)")
-    asyncio.run(search_memory_examples(memory))
+    await search_memory_examples(memory)
 
     print("Setting up a chat (with memory!)")
-    chat_func = asyncio.run(setup_chat_with_memory(kernel, chat_service_id))
+    chat_func = await setup_chat_with_memory(kernel, chat_service_id)
 
     print("Begin chatting (type 'exit' to exit):\n")
     print(
@@ -152,11 +172,12 @@ def main():
         answer = await kernel.invoke(chat_func, request=user_input)
         print(f"ChatBot:> {answer}")
         
-    asyncio.run(chat("What is my budget for 2024?"))
-    asyncio.run(chat("talk to me about my finances"))
-        
-# main()
-# asyncio.run(populate_memory(memory))
+    await chat("What is my budget for 2024?")
+    await chat("talk to me about my finances")
+    print(f"Embedding cache: {embedding_gen.stats}")
+
+    # Uncomment the following line to compare the render latency of sequential and concurrent recall blocks
+    # await benchmark_render(kernel, block_counts=[1, 3, 5, 10])
 
 
 ## Add external documents to memory
@@ -179,31 +200,62 @@ github_files[
     "https://github.com/microsoft/semantic-kernel/blob/main/dotnet/src/SemanticKernel/Memory/Volatile/VolatileMemoryStore.cs"
 ] = "C# class that defines a volatile embedding store"
 
-# Add files to VolatileMemoryStore
+# Add files to the memory store
 memory_collection_name = "SKGitHub"
-print("Adding some GitHub file URLs and their descriptions to a volatile Semantic Memory.")
 
-for index, (entry, value) in enumerate(github_files.items()):
-    asyncio.run(memory.save_reference(
-        collection=memory_collection_name,      # Separate these memories from the chat memories by putting them in a different collection.
-        description=value,
-        text=value,
-        external_id=entry,
-        external_source_name="GitHub",
-    ))
-    print("  URL {} saved".format(index))
-    
-ask = "I love Jupyter notebooks, how should I get started?"
-print("===========================\n" + "Query: " + ask + "\n")
+github_records = [
+    MemoryInput(id=entry, text=value, description=value, external_source_name="GitHub")
+    for entry, value in github_files.items()
+]
 
-memories = asyncio.run(memory.search(memory_collection_name, ask, limit=5, min_relevance_score=0.6))
+async def add_github_files(memory: BatchSemanticTextMemory) -> None:
+    print("Adding some GitHub file URLs and their descriptions to a persistent Semantic Memory.")
 
-for index, memory in enumerate(memories):
-    print(f"Result {index}:")
-    print("  URL:     : " + memory.id)
-    print("  Title    : " + memory.description)
-    print("  Relevance: " + str(memory.relevance))
-    print()
+    keys = await memory.save_batch(
+        collection=memory_collection_name,      # Separate these memories from the chat memories by putting them in a different collection.
+        records=github_records,
+        skip_existing=True,
+    )
+    print("  {} new URLs saved, {} already in memory".format(len(keys), len(github_records) - len(keys)))
+
+async def search_github_files(memory: SemanticTextMemory) -> None:
+    ask = "I love Jupyter notebooks, how should I get started?"
+    print("===========================\n" + "Query: " + ask + "\n")
+
+    memories = await memory.search(memory_collection_name, ask, limit=5, min_relevance_score=0.6)
+
+    for index, result in enumerate(memories):
+        print(f"Result {index}:")
+        print("  URL:     : " + result.id)
+        print("  Title    : " + result.description)
+        print("  Relevance: " + str(result.relevance))
+        print()
+
+async def github_example(memory: BatchSemanticTextMemory) -> None:
+    # Every example runs inside this one coroutine: `run` closes the shared client when it returns, and the
+    # services above hold it, so a second `run` call would fail with a closed client
+    # Uncomment the following lines to add and search the finance memories
+    # await populate_memory(memory)
+    # await search_memory_examples(memory)
+
+    # Uncomment the following line to chat with memory (its services get the same shared client)
+    # await main()
+
+    await add_github_files(memory)
+    await search_github_files(memory)
+    print(f"Embedding cache: {embedding_gen.stats}")
+
+    # Uncomment the following line to compare the per-record loop with batched ingestion
+    # await benchmark_ingestion(
+    #     lambda: BatchSemanticTextMemory(storage=NumpyMemoryStore(), embeddings_generator=embedding_gen),
+    #     [record._replace(id=f"{record.id}#{i}") for i in range(20) for record in github_records],
+    # )
+
+    # Uncomment the following line to compare recall and latency of approximate (IVF) search settings with exact search
+    # (use them for a large collection with `memory._storage.set_ann_options(memory_collection_name, IVFOptions(...))`)
+    # benchmark_ivf()
+
+run(github_example(memory))
     
 
 
@@ -212,8 +264,8 @@ for index, memory in enumerate(memories):
 # api_key = os.getenv("AZURE_AI_SEARCH_API_KEY")
 # endpoint = os.getenv("AZURE_AI_SEARCH_ENDPOINT")
 
-# acs_memory_store = AzureCognitiveSearchMemoryStore(vector_size=1536, admin_key=api_key, search_endpoint=endpoint)   # Instead of VolatileMemoryStore
-# memory = SemanticTextMemory(storage=acs_memory_store, embeddings_generator=embedding_gen)
+# acs_memory_store = AzureCognitiveSearchMemoryStore(vector_size=1536, admin_key=api_key, search_endpoint=endpoint)   # Instead of PersistentMemoryStore
+# memory = BatchSemanticTextMemory(storage=acs_memory_store, embeddings_generator=embedding_gen)
 # kernel.add_plugin(TextMemoryPlugin(memory), "TextMemoryPluginACS")
-# asyncio.run(populate_memory(memory))
-# asyncio.run(search_memory_examples(memory))
\ No newline at end of file
+# (before `run(github_example(memory))` above, with `await populate_memory(memory)` and
+# `await search_memory_examples(memory)` uncommented in github_example)
\ No newline at end of file
@@ -1,13 +1,16 @@
 import semantic_kernel as sk
 import os
 import sys
-import asyncio
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.hugging_face import HuggingFaceTextCompletion, HuggingFaceTextEmbedding
-from semantic_kernel.core_plugins import TextMemoryPlugin
-from semantic_kernel.memory import SemanticTextMemory, VolatileMemoryStore
 from semantic_kernel.connectors.ai.hugging_face import HuggingFacePromptExecutionSettings
 from semantic_kernel.prompt_template import PromptTemplateConfig
+from runner import run
+from memory_ingestion import BatchSemanticTextMemory, BatchTextMemoryPlugin, MemoryInput
+from numpy_memory_store import NumpyMemoryStore
+from embedding_cache import CachedTextEmbedding
+from hf_embedding import ThreadedHuggingFaceTextEmbedding
+from parallel_prompt_template import ParallelKernelPromptTemplate
 load_dotenv()
 
 # Get paths
@@ -28,20 +31,35 @@ kernel.add_service(
         service_id=text_service_id, ai_model_id=text_service_id, task="text-generation"
     ),
 )
-embedding_svc = HuggingFaceTextEmbedding(service_id=embed_service_id, ai_model_id=embed_service_id)
+embedding_svc = CachedTextEmbedding(
+    # Encodes in a worker thread, so the event loop (and the other recall lookups) go on meanwhile
+    ThreadedHuggingFaceTextEmbedding(
+        HuggingFaceTextEmbedding(service_id=embed_service_id, ai_model_id=embed_service_id),
+        max_batch_size=64,
+        torch_threads=4,
+    ),
+    cache_path=os.path.join(notebook_dir, "embedding-cache.sqlite"),        # The fixed recall queries are only embedded once
+)
 kernel.add_service(
     service=embedding_svc,
 )
-memory = SemanticTextMemory(storage=VolatileMemoryStore(), embeddings_generator=embedding_svc)
-kernel.add_plugin(TextMemoryPlugin(memory), "TextMemoryPlugin")
+memory = BatchSemanticTextMemory(storage=NumpyMemoryStore(), embeddings_generator=embedding_svc)
+memory_plugin = BatchTextMemoryPlugin(memory)         # The concurrent recall blocks are searched in one batch
+kernel.add_plugin(memory_plugin, "TextMemoryPlugin")
 
 # Add memories
-async def populate_memory(memory: SemanticTextMemory) -> None:
-    await memory.save_information(collection=collection_id, id="info1", text="Sharks are fish.")
-    await memory.save_information(collection=collection_id, id="info2", text="Whales are mammals.")
-    await memory.save_information(collection=collection_id, id="info3", text="Penguins are birds.")
-    await memory.save_information(collection=collection_id, id="info4", text="Dolphins are mammals.")
-    await memory.save_information(collection=collection_id, id="info5", text="Flies are insects.")
+async def populate_memory(memory: BatchSemanticTextMemory) -> None:
+    # One forward pass for all facts instead of one per fact
+    await memory.save_batch(
+        collection=collection_id,
+        records=[
+            MemoryInput(id="info1", text="Sharks are fish."),
+            MemoryInput(id="info2", text="Whales are mammals."),
+            MemoryInput(id="info3", text="Penguins are birds."),
+            MemoryInput(id="info4", text="Dolphins are mammals."),
+            MemoryInput(id="info5", text="Flies are insects."),
+        ],
+    )
 
 # Define and add prompt function
 my_prompt = """I know these animal facts: 
@@ -71,6 +89,7 @@ my_function = kernel.add_function(
     function_name="text_complete",
     plugin_name="TextCompletionPlugin",
     prompt_template_config=prompt_template_config,
+    prompt_template=ParallelKernelPromptTemplate(prompt_template_config=prompt_template_config),     # The recall blocks run concurrently
 )
 
 ## Testing
@@ -91,5 +110,7 @@ async def main():
     print(f"The queried result for 'What are sharks?' is {query_result1[0].text}")
 
     print(f"{text_service_id} completed prompt with: '{output}'")
+    print(f"Recall batches: {memory_plugin.stats}")
+    print(f"Embedding cache: {embedding_svc.stats}")
     
-asyncio.run(main())
\ No newline at end of file
+run(main())
\ No newline at end of file
@@ -1,12 +1,12 @@
 import semantic_kernel as sk
 import os
 import sys
-import asyncio
 import random
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion, OpenAIChatPromptExecutionSettings
 from semantic_kernel.prompt_template import InputVariable, PromptTemplateConfig
 from semantic_kernel.functions import kernel_function
+from runner import get_async_client, run
 load_dotenv()
 
 # Get paths
@@ -23,6 +23,7 @@ service_id = "default"
 kernel.add_service(
     OpenAIChatCompletion(
         service_id=service_id,
+        async_client=get_async_client(),
     ),
 )
 
@@ -92,13 +93,18 @@ corgi_story = kernel.add_function(
 # Add plugin
 generate_number_plugin = kernel.add_plugin(GenerateNumberPlugin(), "GenerateNumberPlugin")
 
-# Run the number generator
 generate_number_three_or_higher = generate_number_plugin["GenerateNumberThreeOrHigher"]
-number_result = asyncio.run(generate_number_three_or_higher(kernel, input=6))
-print(number_result)
 
-# Run the story generator
-story = asyncio.run(corgi_story.invoke(kernel, input=number_result.value))
-print(f"Generating a corgi story exactly {number_result.value} paragraphs long.")
-print("=====================================================")
-print(story)
\ No newline at end of file
+## Testing
+async def main():
+    # Run the number generator
+    number_result = await generate_number_three_or_higher(kernel, input=6)
+    print(number_result)
+
+    # Run the story generator
+    story = await corgi_story.invoke(kernel, input=number_result.value)
+    print(f"Generating a corgi story exactly {number_result.value} paragraphs long.")
+    print("=====================================================")
+    print(story)
+
+run(main())
\ No newline at end of file
@@ -1,13 +1,14 @@
 import semantic_kernel as sk
 import os
 import sys
-import asyncio
 import random
 from dotenv import load_dotenv
 from typing import Annotated
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion, OpenAIChatPromptExecutionSettings
 from semantic_kernel.prompt_template import InputVariable, PromptTemplateConfig
 from semantic_kernel.functions import kernel_function
+from runner import get_async_client, run
+from parallel_prompt_template import ParallelKernelPromptTemplate
 load_dotenv()
 
 # Get paths
@@ -25,6 +26,7 @@ service_id = "default"
 kernel.add_service(
     OpenAIChatCompletion(
         service_id=service_id,
+        async_client=get_async_client(),
     ),
 )
 
@@ -98,19 +100,21 @@ corgi_story = kernel.add_function(
     prompt_template_config=prompt_template_config,
 )
 
-# Run the number generator
 generate_number = generate_number_plugin["GenerateNumber"]
-number_result = asyncio.run(generate_number(kernel, min=1, max=5))
-num_paragraphs = number_result.value
-print(f"Generating a corgi story {num_paragraphs} paragraphs long.")
 
-# Run the story generator - Pass the output to the semantic story function
-desired_language = "Spanish"
-story = asyncio.run(corgi_story.invoke(kernel, paragraph_count=num_paragraphs, language=desired_language))
-print(f"Generating a corgi story {num_paragraphs} paragraphs long in {desired_language}.")
-print("=====================================================")
-print(story)
-print("\n\n\n")
+async def tell_corgi_story():
+    # Run the number generator
+    number_result = await generate_number(kernel, min=1, max=5)
+    num_paragraphs = number_result.value
+    print(f"Generating a corgi story {num_paragraphs} paragraphs long.")
+
+    # Run the story generator - Pass the output to the semantic story function
+    desired_language = "Spanish"
+    story = await corgi_story.invoke(kernel, paragraph_count=num_paragraphs, language=desired_language)
+    print(f"Generating a corgi story {num_paragraphs} paragraphs long in {desired_language}.")
+    print("=====================================================")
+    print(story)
+    print("\n\n\n")
 
 
 ## Calling Native Functions within a Semantic Function
@@ -174,22 +178,32 @@ prompt_template_config = PromptTemplateConfig(
     execution_settings=execution_settings,
 )
 
-corgi_story = kernel.add_function(
+corgi_story_updated = kernel.add_function(
     function_name="CorgiStoryUpdated",
     plugin_name="CorgiPluginUpdated",
     prompt_template_config=prompt_template_config,
+    prompt_template=ParallelKernelPromptTemplate(prompt_template_config=prompt_template_config),     # Native function calls in the prompt run concurrently
 )
 
-# Run the number generator
-number_result = asyncio.run(generate_number(kernel, min=1, max=5))
-num_paragraphs = number_result.value
+async def tell_corgi_story_with_names():
+    # Run the number generator
+    number_result = await generate_number(kernel, min=1, max=5)
+    num_paragraphs = number_result.value
+
+    # Run the story generator - Pass the output to the semantic story function
+    desired_language = "French"
+    story = await corgi_story_updated.invoke(kernel, paragraph_count=num_paragraphs, language=desired_language)
+    print(f"Generating a corgi story {num_paragraphs} paragraphs long in {desired_language}.")
+    print("=====================================================")
+    print(story)
+
+
+## Testing
+async def main():
+    await tell_corgi_story()
+    await tell_corgi_story_with_names()
 
-# Run the story generator - Pass the output to the semantic story function
-desired_language = "French"
-story = asyncio.run(corgi_story.invoke(kernel, paragraph_count=num_paragraphs, language=desired_language))
-print(f"Generating a corgi story {num_paragraphs} paragraphs long in {desired_language}.")
-print("=====================================================")
-print(story)
+run(main())
 
 
 ## Recap
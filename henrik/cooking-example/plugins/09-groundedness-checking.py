@@ -1,9 +1,18 @@
 import semantic_kernel as sk
 import os
 import sys
-import asyncio
 from dotenv import load_dotenv
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
+from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion, OpenAITextEmbedding
+from runner import get_async_client, run
+from lazy_plugin_loader import LazyPluginLoader
+from response_cache import ResponseCache
+from grounding_pipeline import GroundingPipeline, GroundingTask, parse_entities
+from batch_extraction import BatchEntityExtractor, benchmark_extraction
+from reference_index import entities_block, reference_index
+from embedding_cache import CachedTextEmbedding
+from memory_ingestion import BatchSemanticTextMemory
+from numpy_memory_store import NumpyMemoryStore
+from reference_retrieval import ReferenceRetriever
 load_dotenv()
 
 # Get paths
@@ -59,16 +68,35 @@ service_id = "default"
 kernel.add_service(
     OpenAIChatCompletion(
         service_id=service_id,
+        async_client=get_async_client(),
     ),
 )
+response_cache = ResponseCache(os.path.join(notebook_dir, "response-cache.sqlite"))
+response_cache.register(kernel)
+
+# Passes the reference check only the chunks of the grounding text relevant to the entities to check
+embedding_gen = CachedTextEmbedding(
+    OpenAITextEmbedding(
+        ai_model_id="text-embedding-3-small",
+        async_client=get_async_client(),
+    ),
+    cache_path=os.path.join(notebook_dir, "embedding-cache.sqlite"),
+)
+retriever = ReferenceRetriever(
+    BatchSemanticTextMemory(storage=NumpyMemoryStore(), embeddings_generator=embedding_gen),
+    top_k=3,
+    chunk_words=150,
+)
 
 # Add plugin
-groundingSemanticFunctions = kernel.add_plugin(parent_directory=plugins_directory, plugin_name="GroundingPlugin")
+plugin_loader = LazyPluginLoader(plugins_directory)
+groundingSemanticFunctions = kernel.add_plugin(plugin_loader.plugin("GroundingPlugin"))
 
 # Extract individual functions
 entity_extraction = groundingSemanticFunctions["ExtractEntities"]
 reference_check = groundingSemanticFunctions["ReferenceCheckEntities"]
 entity_excision = groundingSemanticFunctions["ExciseEntities"]
+batch_entity_extraction = groundingSemanticFunctions["ExtractEntitiesBatch"]
 
 
 ## Calling individual functions
@@ -94,19 +122,76 @@ print(summary_text)
 # - Perform a reference check against the grounding text
 # - Excise any entities which failed the reference check from the summary
 
-### Extracting the entities
-extraction_result = asyncio.run(kernel.invoke(
-    entity_extraction,
-    input=summary_text,
-    topic="people and places",
-    example_entities="John, Jane, mother, brother, Paris, Rome",
-))
-print(extraction_result)
-
-### Performing the reference check
-grounding_result = asyncio.run(kernel.invoke(reference_check, input=extraction_result.value, reference_context=grounding_text))
-print(grounding_result)
-
-### Excising the ungrounded entities
-excision_result = asyncio.run(kernel.invoke(entity_excision, input=summary_text, ungrounded_entities=grounding_result.value))
-print(excision_result)
\ No newline at end of file
+## Grounding many summaries
+# A faithful summary, for which the excision is skipped
+faithful_summary_text = (
+    "My father, a respected citizen of Geneva, sought out his friend Beaufort, a merchant who had fallen into "
+    "poverty and retreated to Lucerne. After Beaufort died, my father took care of his daughter Caroline, and "
+    "two years later she became his wife."
+)
+
+async def ground_summaries(summaries):
+    pipeline = GroundingPipeline(
+        kernel,
+        entity_extraction,
+        reference_check,
+        entity_excision,
+        topic="people and places",
+        example_entities="John, Jane, mother, brother, Paris, Rome",
+        workers={"extract": 2, "check": 4, "excise": 2},
+        retriever=retriever,
+        # Extracts the entities of up to 8 summaries per request
+        extractor=BatchEntityExtractor(kernel, batch_entity_extraction, entity_extraction, max_items=8),
+    )
+    results = await pipeline.run(GroundingTask(id, summary, grounding_text) for id, summary in enumerate(summaries))
+    for result in results:
+        print(f"Summary {result.id}: {result.error or result.grounded_summary}")
+        print(f"Ungrounded entities: {result.ungrounded_entities}\n")
+    print(f"Pipeline: {pipeline.stats}")
+
+async def benchmark_batched_extraction(summaries):
+    # Without the response cache, so that both paths send their requests
+    benchmark_kernel = sk.Kernel()
+    benchmark_kernel.add_service(OpenAIChatCompletion(service_id=service_id, async_client=get_async_client()))
+    plugin = benchmark_kernel.add_plugin(plugin_loader.plugin("GroundingPlugin"))
+    extractor = BatchEntityExtractor(benchmark_kernel, plugin["ExtractEntitiesBatch"], plugin["ExtractEntities"])
+    await benchmark_extraction(extractor, summaries)
+
+async def ground_summary():
+    ### Extracting the entities
+    extraction_result = await kernel.invoke(
+        entity_extraction,
+        input=summary_text,
+        topic="people and places",
+        example_entities="John, Jane, mother, brother, Paris, Rome",
+    )
+    print(extraction_result)
+
+    ### Grounding the entities that appear in the grounding text locally
+    grounded, unresolved = reference_index(grounding_text).split(parse_entities(str(extraction_result), "entities"))
+    print(f"Grounded locally: {[match.entity for match in grounded]}")
+    if not unresolved:
+        print("All entities are grounded")
+        return
+
+    ### Performing the reference check (of the other entities only, against the relevant chunks of the grounding text)
+    reference_context = await retriever.context(grounding_text, unresolved)
+    grounding_result = await kernel.invoke(reference_check, input=entities_block(unresolved), reference_context=reference_context)
+    print(grounding_result)
+
+    ### Excising the ungrounded entities
+    excision_result = await kernel.invoke(entity_excision, input=summary_text, ungrounded_entities=grounding_result.value)
+    print(excision_result)
+
+async def main():
+    await ground_summaries([summary_text, faithful_summary_text])
+
+    # Uncomment the following line to compare the tokens and time per summary of single and batched entity extraction
+    # await benchmark_batched_extraction([summary_text, faithful_summary_text] * 8)
+
+    # Uncomment the following line to run the three stages for the summary one by one, printing every result
+    # await ground_summary()
+    print(f"Reference retrieval: {retriever.stats}")
+    print(f"Response cache: {response_cache.stats}")
+
+run(main())
\ No newline at end of file
@@ -1,9 +1,12 @@
 import semantic_kernel as sk
 import os
-import asyncio
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
 from semantic_kernel.functions import KernelArguments
+from runner import get_async_client, run
+from lazy_plugin_loader import LazyPluginLoader
+from response_cache import ResponseCache
+from streaming import PipelineStage, stream_pipeline
 load_dotenv()
 
 # Setup
@@ -17,21 +20,22 @@ ai_model_id = os.getenv("OPENAI_CHAT_MODEL_ID")
 kernel.add_service(OpenAIChatCompletion(
     ai_model_id=ai_model_id,
     service_id="default",
-    api_key=api_key
+    async_client=get_async_client(api_key=api_key),
     ))
 
+# Cache the completions of the deterministic functions (enabled in their config.json) across runs
+response_cache = ResponseCache("response-cache.sqlite")
+response_cache.register(kernel)
+
+# Plugins are listed from the manifest and only loaded when first invoked
+plugin_loader = LazyPluginLoader(plugins_directory)
+
 # Cooking Plugin
-cooking_skill = kernel.add_plugin(
-    parent_directory=plugins_directory,
-    plugin_name="Cooking"
-    )
+cooking_skill = kernel.add_plugin(plugin_loader.plugin("Cooking"))
 recipe_function = cooking_skill["RecipeGenerator"]
 
 # Marketing Plugin
-advertisement_skill = kernel.add_plugin(
-    parent_directory=plugins_directory,
-    plugin_name="Marketing"
-    )
+advertisement_skill = kernel.add_plugin(plugin_loader.plugin("Marketing"))
 advertisment_function = advertisement_skill["AdvertisementGenerator"]
 
 
@@ -57,18 +61,38 @@ async def get_advertisement(recipe):
     return advertisement
 
 
+## With streaming
+# The recipe is printed as it is generated; the advertisement starts as soon as the recipe is complete
+async def stream_recipe_and_advertisement(prompt):
+    stages = [
+        PipelineStage(recipe_function, {"format": ""}),
+        PipelineStage(advertisment_function),
+    ]
+    titles = ["Recipe: ", "\n\nAdvertisement: "]
+    current_stage = None
+    async for chunk in stream_pipeline(kernel, stages, KernelArguments(input=prompt)):
+        if chunk.stage != current_stage:
+            current_stage = chunk.stage
+            print(titles[current_stage], end="", flush=True)
+        print(chunk.text, end="", flush=True)
+    print()
+
+
 ### With main function
 async def main():
     
     # load_dotenv()
-    recipe = await get_recipe(prompt)
-    advertisement = await get_advertisement(recipe)
+    await stream_recipe_and_advertisement(prompt)
+    print(f"Response cache: {response_cache.stats}")
 
-    print("Recipe: ", recipe)
-    print()
-    print("Advertisement: ", advertisement)
+    # Without streaming
+    # recipe = await get_recipe(prompt)
+    # advertisement = await get_advertisement(recipe)
+    # print("Recipe: ", recipe)
+    # print()
+    # print("Advertisement: ", advertisement)
 
-asyncio.run(main())
+run(main())
 
 ### Without main function
 # recipe = asyncio.run(get_recipe(prompt))
@@ -1,8 +1,6 @@
 import semantic_kernel as sk
 import os
-import time
 import sys
-import asyncio
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import (
     OpenAIChatCompletion,
@@ -12,7 +10,10 @@ from semantic_kernel.connectors.ai.open_ai import (
 )
 from semantic_kernel.connectors.ai.hugging_face import HuggingFacePromptExecutionSettings, HuggingFaceTextCompletion
 from semantic_kernel.contents import ChatHistory
-from IPython.display import clear_output
+from runner import get_async_client, run
+from fan_out import CompletionFanOut, FanOutTarget
+from streaming import StreamDemultiplexer, benchmark_demultiplexer
+from hf_batching import BatchedHuggingFaceTextCompletion, benchmark_batching
 load_dotenv()
 
 # Get paths
@@ -29,6 +30,7 @@ plugins_directory = "../plugins"
 oai_chat_service_id = "oai_chat"
 oai_chat_service = OpenAIChatCompletion(
     service_id=oai_chat_service_id,
+    async_client=get_async_client(),
 )
 oai_chat_prompt_execution_settings = OpenAIChatPromptExecutionSettings(
     service_id=oai_chat_service_id,
@@ -44,6 +46,7 @@ oai_chat_prompt_execution_settings = OpenAIChatPromptExecutionSettings(
 oai_text_service_id = "oai_text"
 oai_text_service = OpenAITextCompletion(
     service_id=oai_text_service_id,
+    async_client=get_async_client(),
 )
 oai_text_prompt_execution_settings = OpenAITextPromptExecutionSettings(
     service=oai_text_service_id,
@@ -59,10 +62,15 @@ oai_text_prompt_execution_settings = OpenAITextPromptExecutionSettings(
 
 # Add Hugging Face text service
 hf_text_service_id = "hf_text"
-hf_text_service = HuggingFaceTextCompletion(
-    service_id=hf_text_service_id,
-    ai_model_id="distilgpt2",
-    task="text-generation"
+# Concurrent requests to the local model run as batched generate calls, in a worker thread
+hf_text_service = BatchedHuggingFaceTextCompletion(
+    HuggingFaceTextCompletion(
+        service_id=hf_text_service_id,
+        ai_model_id="distilgpt2",
+        task="text-generation"
+    ),
+    max_batch_size=8,
+    max_wait_seconds=0.02,
 )
 hf_prompt_execution_settings = HuggingFacePromptExecutionSettings(
     service_id=hf_text_service_id,
@@ -77,7 +85,7 @@ hf_prompt_execution_settings = HuggingFacePromptExecutionSettings(
 ## Multiple Results per Prompt
 ### Multiple Open AI Text Completions
 async def get_openai_text_completions(prompt):
-    results = oai_text_service.get_text_contents(
+    results = await oai_text_service.get_text_contents(
         prompt=prompt,
         settings=oai_text_prompt_execution_settings
     )
@@ -87,7 +95,7 @@ async def get_openai_text_completions(prompt):
 
 ### Multiple Hugging Face Text Completions
 async def get_hf_text_completions(prompt):
-    results = hf_text_service.get_text_contents(
+    results = await hf_text_service.get_text_contents(
         prompt=prompt,
         settings=hf_prompt_execution_settings
     )
@@ -99,7 +107,7 @@ async def get_hf_text_completions(prompt):
 async def get_openai_chat_completions(prompt):
     chat = ChatHistory()
     chat.add_user_message(prompt)
-    results = oai_chat_service.get_chat_message_contents(
+    results = await oai_chat_service.get_chat_message_contents(
         chat_history=chat,
         settings=oai_chat_prompt_execution_settings
     )
@@ -109,54 +117,69 @@ async def get_openai_chat_completions(prompt):
 
 ## Streaming Multiple Results
 async def stream_openai_chat_completions(prompt):
-    # Determine the clear command based on OS
-    clear_command = "cls" if os.name == "nt" else "clear"
-
     chat = ChatHistory()
     chat.add_user_message(prompt)
 
     stream = oai_chat_service.get_streaming_chat_message_contents(
         chat_history=chat, settings=oai_chat_prompt_execution_settings
     )
-    number_of_responses = oai_chat_prompt_execution_settings.number_of_responses
-    texts = [""] * number_of_responses
-
-    last_clear_time = time.time()
-    clear_interval = 0.5  # seconds
+    demultiplexer = StreamDemultiplexer(stream, number_of_choices=oai_chat_prompt_execution_settings.number_of_responses)
 
-    # Note: there are some quirks with displaying the output, which sometimes flashes and disappears.
-    # This could be influenced by a few factors specific to Jupyter notebooks and asynchronous processing.
-    # The following code attempts to buffer the results to avoid the output flashing on/off the screen.
+    # Print only the text added to each result, at most every 0.5 seconds, instead of clearing and redrawing all
+    # of the results (which costs more than the stream itself for long results)
+    async for deltas in demultiplexer.deltas(interval=0.5):
+        for idx, delta in deltas.items():
+            print(f"Result {idx + 1}: ...{delta}")
 
-    async for results in stream:
-        current_time = time.time()
-
-        # Update texts with new results
-        for result in results:
-            texts[result.choice_index] += str(result)
+    print("----------------------------------------")
+    for idx, text in enumerate(await demultiplexer.wait()):
+        print(f"Result {idx + 1}: {text}")
+    print("----------------------------------------")
 
-        # Clear and display output at intervals
-        if current_time - last_clear_time > clear_interval:
-            clear_output(wait=True)
-            for idx, text in enumerate(texts):
-                print(f"Result {idx + 1}: {text}")
-            last_clear_time = current_time
 
-    print("----------------------------------------")
+## Multiple Results from Several Services at Once
+async def fan_out_completions(prompt, hf_prompt, first_n=None):
+    # The services run concurrently (the local Hugging Face model in its worker thread), the chat service streamed
+    # so that each of its results is reported as soon as it is finished
+    fan_out = CompletionFanOut([
+        FanOutTarget(oai_text_service, oai_text_prompt_execution_settings),
+        FanOutTarget(hf_text_service, hf_prompt_execution_settings, prompt=hf_prompt),
+        FanOutTarget(oai_chat_service, oai_chat_prompt_execution_settings, stream=True),
+    ])
+    # With first_n, the first results that are not empty win and the slower requests are cancelled
+    async for result in fan_out.results(prompt, first_n=first_n, accept=lambda result: bool(result.text.strip())):
+        print(f"[{result.seconds:.2f}s] {result.service_id} result {result.choice_index + 1}: {result.text}")
+    print(f"Services: {fan_out.stats}")
 
 
 # TODO: Test this
-def main():
+async def main():
     prompt_oai_text = "What is the purpose of a rubber duck?"
     prompt_hf_text = "The purpose of a rubber duck is"
     prompt_oai_chat = "It's a beautiful day outside, birds are singing, flowers are blooming. On days like these, kids like you..."
     
-    asyncio.run(get_openai_text_completions(prompt_oai_text))
-    print()
-    asyncio.run(get_hf_text_completions(prompt_hf_text))
+    # The three services at once
+    await fan_out_completions(prompt_oai_text, prompt_hf_text)
     print()
-    asyncio.run(get_openai_chat_completions(prompt_oai_chat))
+    # The first 3 results of any service
+    await fan_out_completions(prompt_oai_text, prompt_hf_text, first_n=3)
     print()
+
+    # Uncomment to call the services one by one
+    # await get_openai_text_completions(prompt_oai_text)
+    # print()
+    # await get_hf_text_completions(prompt_hf_text)
+    # print()
+    # await get_openai_chat_completions(prompt_oai_chat)
+    # print()
     
     # Uncomment to stream results
-    asyncio.run(stream_openai_chat_completions(prompt_oai_chat))
\ No newline at end of file
+    await stream_openai_chat_completions(prompt_oai_chat)
+
+    # Uncomment to compare the requests per second of the local model, one prompt at a time and batched
+    # print(await benchmark_batching(hf_text_service, [f"{prompt_hf_text} {n}" for n in range(32)], hf_prompt_execution_settings))
+
+    # Uncomment to compare the cost of redrawing all results with rendering only the new text (8 results of 4k tokens)
+    # print(await benchmark_demultiplexer(choices=8, tokens=4096))
+
+# run(main())
\ No newline at end of file
@@ -1,10 +1,12 @@
 import semantic_kernel as sk
 import os
 import sys
-import asyncio
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
 from semantic_kernel.functions import KernelArguments
+from runner import get_async_client, run
+from lazy_plugin_loader import LazyPluginLoader
+from response_cache import ResponseCache
 load_dotenv()
 
 # Get paths
@@ -23,15 +25,16 @@ kernel.add_service(
     OpenAIChatCompletion(
         service_id=service_id,
         ai_model_id=ai_model_id,
+        async_client=get_async_client(),
     ),
 )
+response_cache = ResponseCache(os.path.join(notebook_dir, "response-cache.sqlite"))
+response_cache.register(kernel)
 
 # Get prompt from file
 plugins_directory = "../plugins"
-cooking_functions = kernel.add_plugin(
-    parent_directory=plugins_directory,
-    plugin_name="Cooking"
-    )
+plugin_loader = LazyPluginLoader(plugins_directory)
+cooking_functions = kernel.add_plugin(plugin_loader.plugin("Cooking"))
 cooking_function = cooking_functions["RecipeGenerator"]
 
 # Testing
@@ -45,7 +48,8 @@ async def get_recipe(input):
 
 def main():
     input = "Chicken Adobo Filipino Style"
-    recipe = asyncio.run(get_recipe(input))
+    recipe = run(get_recipe(input))
     print(recipe)
+    print(f"Response cache: {response_cache.stats}")
     
 main()
\ No newline at end of file
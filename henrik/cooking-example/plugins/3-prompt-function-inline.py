@@ -1,10 +1,11 @@
 import semantic_kernel as sk
 import os
-import asyncio
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion, OpenAIChatPromptExecutionSettings
 from semantic_kernel.functions import KernelArguments
 from semantic_kernel.prompt_template import InputVariable, PromptTemplateConfig
+from runner import get_async_client, run
+from streaming import stream_text
 load_dotenv()
 
 # Definitions
@@ -20,6 +21,7 @@ kernel.add_service(
     OpenAIChatCompletion(
         service_id=service_id,
         ai_model_id=ai_model_id,
+        async_client=get_async_client(),
     ),
 )
 
@@ -66,8 +68,15 @@ Demo, like Julia Balbilla, writes in the artificial and poetic Aeolic dialect. T
 async def get_summary(input):
     summary = await kernel.invoke(summarize, input=input)
     print(summary)
+
+# Print the summary as it is generated
+async def stream_summary(input):
+    async for text in stream_text(kernel, summarize, input=input):
+        print(text, end="", flush=True)
+    print()
     
 def main():
-    asyncio.run(get_summary(input_text))
+    run(stream_summary(input_text))
+    # run(get_summary(input_text))      # Without streaming
     
 main()
\ No newline at end of file
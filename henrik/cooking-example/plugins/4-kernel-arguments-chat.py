@@ -1,13 +1,14 @@
 import semantic_kernel as sk
 import os
 import sys
-import asyncio
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion, OpenAIChatPromptExecutionSettings
 from semantic_kernel.functions import KernelArguments
 from semantic_kernel.prompt_template import PromptTemplateConfig
 from semantic_kernel.prompt_template.input_variable import InputVariable
-from semantic_kernel.contents import ChatHistory
+from runner import get_async_client, run
+from lazy_plugin_loader import LazyPluginLoader
+from chat_history_manager import ChatHistoryManager
 load_dotenv()
 
 # Get paths
@@ -25,6 +26,8 @@ It can give explicit instructions or say 'I don't know' if it does not have an a
 User: {{$user_input}}
 ChatBot: """
 ai_model_id = os.getenv("OPENAI_CHAT_MODEL_ID")
+plugins_directory = "../plugins"
+history_max_tokens = 1500
 
 # Setup
 kernel = sk.Kernel()
@@ -33,6 +36,7 @@ kernel.add_service(
     OpenAIChatCompletion(
         service_id=service_id,
         ai_model_id=ai_model_id,
+        async_client=get_async_client(),
     ),
 )
 
@@ -61,8 +65,15 @@ chat_function = kernel.add_function(
     prompt_template_config=prompt_template_config,
 )
 
-# Initialize the chat history
-chat_history = ChatHistory()
+# Summarize Plugin - Used to fold old messages into a summary once the history exceeds its token budget
+summarize_plugin = kernel.add_plugin(LazyPluginLoader(plugins_directory).plugin("SummarizePlugin"))
+
+# Initialize the chat history (rendered incrementally and kept within the token budget)
+chat_history = ChatHistoryManager(
+    max_tokens=history_max_tokens,
+    kernel=kernel,
+    summarize_function=summarize_plugin["SummarizationGenerator"],
+)
 chat_history.add_system_message("You are a helpful chatbot who is good about giving book recommendations.")
 
 # Chat with the Bot
@@ -77,6 +88,7 @@ async def chat(input_text: str) -> None:
     print(f"User: {input_text}")
 
     # Process the user message and get an answer
+    await chat_history.enforce_budget()
     answer = await kernel.invoke(chat_function, KernelArguments(user_input=input_text, history=chat_history))
 
     # Show the response
@@ -85,19 +97,20 @@ async def chat(input_text: str) -> None:
     chat_history.add_user_message(input_text)
     chat_history.add_assistant_message(str(answer))
     
-def main():
-    asyncio.run(add_first_message("Hi, I'm looking for book suggestions"))
-    asyncio.run(chat("I love history and philosophy, I'd like to learn something new about Greece, any suggestion?"))
-    asyncio.run(chat("that sounds interesting, what is it about?"))
-    asyncio.run(chat("if I read that book, what exactly will I learn about Greek history?"))
-    asyncio.run(chat("could you list some more books I could read about this topic?"))
+async def main():
+    await add_first_message("Hi, I'm looking for book suggestions")
+    await chat("I love history and philosophy, I'd like to learn something new about Greece, any suggestion?")
+    await chat("that sounds interesting, what is it about?")
+    await chat("if I read that book, what exactly will I learn about Greek history?")
+    await chat("could you list some more books I could read about this topic?")
     
-    print(chat_history)
+    print(chat_history.chat_history)
+    print(f"History: {chat_history.stats}")
     
     # while True:
     #     input_text = input("User: ")
     #     if input_text.lower() == "exit":
     #         break
-    #     asyncio.run(chat(input_text))         # Alternative
+    #     await chat(input_text)         # Alternative
     
-main()
\ No newline at end of file
+run(main())
\ No newline at end of file
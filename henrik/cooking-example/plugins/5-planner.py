@@ -1,17 +1,18 @@
 import semantic_kernel as sk
 import os
 import sys
-import asyncio
+import time
 from dotenv import load_dotenv
 from semantic_kernel.connectors.ai.open_ai import OpenAIChatPromptExecutionSettings
 from semantic_kernel.core_plugins.text_plugin import TextPlugin
 from semantic_kernel.functions.kernel_function_from_prompt import KernelFunctionFromPrompt
 from semantic_kernel.kernel import Kernel
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion, OpenAIChatPromptExecutionSettings
+from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion, OpenAIChatPromptExecutionSettings, OpenAITextEmbedding
 from semantic_kernel.contents.chat_history import ChatHistory  # noqa: F401
 from semantic_kernel.functions.kernel_arguments import KernelArguments  # noqa: F401
 from semantic_kernel.prompt_template.input_variable import InputVariable  # noqa: F401
 from semantic_kernel.planners import SequentialPlanner
+from semantic_kernel.planners.sequential_planner.sequential_planner_config import SequentialPlannerConfig
 from typing import Annotated
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
 from semantic_kernel.core_plugins.math_plugin import MathPlugin
@@ -20,6 +21,15 @@ from semantic_kernel.planners.function_calling_stepwise_planner import (
     FunctionCallingStepwisePlanner,
     FunctionCallingStepwisePlannerOptions,
 )
+from runner import RateLimiter, add_request_hook, get_async_client, run
+from compiled_prompt_template import benchmark_template_render
+from lazy_plugin_loader import LazyPluginLoader
+from plan_executor import invoke_plan
+from plan_cache import CachedSequentialPlanner, PlanCache
+from embedding_cache import CachedTextEmbedding
+from function_index import FunctionIndex
+from concurrent_stepwise_planner import ConcurrentFunctionCallingStepwisePlanner, tool_call_timings
+from stepwise_batch import run_questions, summarize_results
 load_dotenv()
 
 # Get paths
@@ -35,6 +45,18 @@ She likes Shakespeare so write using his style. She speaks French so write it in
 Convert the text to uppercase."""
 plugins_directory = "../plugins"
 ai_model_id = os.getenv("OPENAI_CHAT_MODEL_ID")
+requests_per_minute = 500         # Of all model requests, across concurrent questions
+max_concurrent_questions = 8
+embedding_cache_path = os.path.join(notebook_dir, "embedding-cache.sqlite")
+
+# Embeds function descriptions and goals, to describe only the relevant functions to the planners
+embedding_gen = CachedTextEmbedding(
+    OpenAITextEmbedding(
+        ai_model_id="text-embedding-3-small",
+        async_client=get_async_client(),
+    ),
+    cache_path=embedding_cache_path,
+)
 
 ## Setup
 sequential_kernel = sk.Kernel()
@@ -43,18 +65,14 @@ sequential_kernel.add_service(
     OpenAIChatCompletion(
         service_id=sequential_service_id,
         ai_model_id=ai_model_id,
+        async_client=get_async_client(),
     ),
 )
 
 # Add plugins
-summarize_plugin = sequential_kernel.add_plugin(
-    plugin_name="SummarizePlugin",
-    parent_directory=plugins_directory
-)
-writer_plugin = sequential_kernel.add_plugin(
-    plugin_name="WriterPlugin",
-    parent_directory=plugins_directory
-)
+plugin_loader = LazyPluginLoader(plugins_directory)
+summarize_plugin = sequential_kernel.add_plugin(plugin_loader.plugin("SummarizePlugin"))
+writer_plugin = sequential_kernel.add_plugin(plugin_loader.plugin("WriterPlugin"))
 # Add new plugin (not in any folder)
 text_plugin = sequential_kernel.add_plugin(
     plugin=TextPlugin(),
@@ -94,14 +112,26 @@ def print_plugins_and_functions(kernel):
         
 
 ## Sequential Planner
-sequential_planner = SequentialPlanner(sequential_kernel, sequential_service_id)   
+# Plans are cached by goal and available functions; SequentialPlanner(sequential_kernel, sequential_service_id) plans every time
+plan_cache = PlanCache(os.path.join(notebook_dir, "plan-cache.json"))
+# Only the 8 functions most relevant to the goal are listed in the planner prompt
+sequential_function_index = FunctionIndex(sequential_kernel, embedding_gen, top_k=8)
+sequential_planner = CachedSequentialPlanner(
+    sequential_kernel,
+    sequential_service_id,
+    SequentialPlannerConfig(get_available_functions=sequential_function_index.sequential_planner_functions),
+    plan_cache=plan_cache,
+)
 
 async def create_sequential_plan(ask, planner):
+    start = time.perf_counter()
     sequential_plan = await planner.create_plan(goal=ask)
+    print(f"Planning took {(time.perf_counter() - start) * 1000:.2f} ms")
     return sequential_plan
         
-async def execute_sequential_plan(sequential_plan, kernel):
-    result = await sequential_plan.invoke(kernel)
+async def execute_sequential_plan(sequential_plan, kernel, max_parallelism=4):
+    # Runs the steps that do not use each other's output concurrently; sequential_plan.invoke(kernel) runs them one by one
+    result = await invoke_plan(sequential_plan, kernel, max_parallelism=max_parallelism)
     return result
         
 def print_sequential_planner_steps(sequential_plan):
@@ -111,11 +141,14 @@ def print_sequential_planner_steps(sequential_plan):
             f"- {step.description.replace('.', '') if step.description else 'No description'} using {step.metadata.fully_qualified_name} with parameters: {step.parameters}"
         )
         
-def test_sequential_planner(ask, kernel, planner):
-    sequential_plan = asyncio.run(create_sequential_plan(ask, planner))
+async def test_sequential_planner(ask, kernel, planner):
+    sequential_plan = await create_sequential_plan(ask, planner)
     print_sequential_planner_steps(sequential_plan)
-    result = asyncio.run(execute_sequential_plan(sequential_plan, kernel))
+    result = await execute_sequential_plan(sequential_plan, kernel)
     print(result)
+    print(result.metadata["trace"])
+    print(f"Plan cache: {planner.plan_cache.stats}")
+    print(f"Function manual: {sequential_function_index.stats}")
     
     # Uncomment the following line to view the planner's process for completing the request
     # print_sequential_planner_steps(sequential_plan)
@@ -128,6 +161,7 @@ function_calling_stepwise_planner_service_id = "default"
 function_calling_stepwise_planner_kernel.add_service(
     OpenAIChatCompletion(
         service_id=function_calling_stepwise_planner_service_id,
+        async_client=get_async_client(),
     ),
 )
 
@@ -196,14 +230,22 @@ function_calling_stepwise_planner_options = FunctionCallingStepwisePlannerOption
     max_iterations=10,
     max_tokens=4000,
 )
-function_calling_stepwise_planner = FunctionCallingStepwisePlanner(service_id=function_calling_stepwise_planner_service_id, options=function_calling_stepwise_planner_options)
+# Runs the tool calls of a model turn concurrently (at most 4 at once); FunctionCallingStepwisePlanner runs them one by one
+function_calling_stepwise_planner = ConcurrentFunctionCallingStepwisePlanner(service_id=function_calling_stepwise_planner_service_id, options=function_calling_stepwise_planner_options, max_concurrent_calls=4)
+
+# Only the 6 functions most relevant to the question are offered as tools
+stepwise_function_index = FunctionIndex(function_calling_stepwise_planner_kernel, embedding_gen, top_k=6)
 
 async def execute_stepwise_planner(question, kernel, planner):
     print("Executing stepwise planner...")
-    result = await planner.invoke(kernel, question)
+    relevant_kernel = await stepwise_function_index.relevant_kernel(question)
+    result = await planner.invoke(relevant_kernel, question)
+    stepwise_function_index.record_iterations(question, result.iterations)     # The tools are sent in every iteration
     return result
 
 def print_stepwise_planner_process(result):
+    for timing in tool_call_timings(result.chat_history):
+        print(f"- {timing['name']}: started at {timing['start_seconds']:.2f}s, took {timing['duration_seconds']:.2f}s")
     return print(f"Chat history: {result.chat_history}\n")
 
 async def test_function_calling_stepwise_planner(questions, kernel, planner):
@@ -214,11 +256,40 @@ async def test_function_calling_stepwise_planner(questions, kernel, planner):
 
         # Uncomment the following line to view the planner's process for completing the request
         # print_stepwise_planner_process(result)
+    print(f"Function manual: {stepwise_function_index.stats}")
+
+async def test_function_calling_stepwise_planner_batch(questions, kernel, planner):
+    start = time.perf_counter()
+    results = await run_questions(
+        planner,
+        kernel,
+        questions,
+        max_concurrency=max_concurrent_questions,
+        kernel_for_question=stepwise_function_index.relevant_kernel,
+        on_result=lambda result: stepwise_function_index.record_iterations(result.question, result.iterations),
+    )
+    for result in results:
+        print(f"Q: {result.question}")
+        print(f"A: {result.error or result.final_answer} ({result.iterations} iterations, {result.tokens} tokens, {result.seconds:.2f}s)\n")
+    print(f"Batch: {summarize_results(results, time.perf_counter() - start)}")
+    print(f"Function manual: {stepwise_function_index.stats}")
 
         
-def main():
-    test_sequential_planner(ask, sequential_kernel, sequential_planner)
+async def main():
+    # Spaces out the model requests of all the questions running at once
+    add_request_hook(RateLimiter(requests_per_minute=requests_per_minute))
+
+    await test_sequential_planner(ask, sequential_kernel, sequential_planner)
     print("\n")
-    asyncio.run(test_function_calling_stepwise_planner(questions, function_calling_stepwise_planner_kernel, function_calling_stepwise_planner))
+    await test_function_calling_stepwise_planner_batch(questions, function_calling_stepwise_planner_kernel, function_calling_stepwise_planner)
+
+    # Uncomment the following line to run the questions one by one, printing the planner's process
+    # await test_function_calling_stepwise_planner(questions, function_calling_stepwise_planner_kernel, function_calling_stepwise_planner)
+
+    # Uncomment the following lines to compare the render throughput of parsed and compiled templates
+    # summarization_template = summarize_plugin["SummarizationGenerator"].prompt_template.prompt_template_config.template
+    # await benchmark_template_render(sequential_kernel, summarization_template, {"input": ask})
+    # email_template = writer_plugin["EmailTo"].prompt_template.prompt_template_config.template
+    # await benchmark_template_render(sequential_kernel, email_template, {"input": ask, "to": "Jane", "sender": "John"})
             
-main()
\ No newline at end of file
+run(main())
\ No newline at end of file
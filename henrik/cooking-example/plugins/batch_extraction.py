@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import re
+import statistics
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from chat_history_manager import count_tokens
+from grounding_pipeline import parse_entities
+from response_cache import used_tokens
+
+if TYPE_CHECKING:
+    from semantic_kernel.functions.kernel_function import KernelFunction
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_max_items = 8
+default_max_input_tokens = 3000     # The texts of a batch, without the instructions
+item_overhead_tokens = 12           # The numbered <input_context> tags around a text
+default_max_concurrency = 4
+
+batch_entities_regex = re.compile(r'<entities id="?(\d+)"?>(.*?)</entities>', re.DOTALL)
+
+
+def items_block(texts: list[str]) -> str:
+    """Texts as the numbered <input_context> items ExtractEntitiesBatch expects as its input (numbered from 1)."""
+    return "\n\n".join(
+        f'<input_context id="{number}">\n{text.strip()}\n</input_context>' for number, text in enumerate(texts, 1)
+    )
+
+
+def parse_batch_entities(text: str, count: int) -> list[str | None]:
+    """
+    The entities of every item of an ExtractEntitiesBatch response, as an ExtractEntities response would give them.
+
+    An item the response has no (complete) list for is None, to be extracted on its own.
+    """
+    items: list[str | None] = [None] * count
+    for number, body in batch_entities_regex.findall(text):
+        position = int(number) - 1
+        if 0 <= position < count and items[position] is None:
+            items[position] = f"<entities>\n{body.strip()}\n</entities>"
+    return items
+
+
+class BatchEntityExtractor:
+    """
+    Description: Extracts the entities of many texts with a few ExtractEntitiesBatch requests.
+
+    ExtractEntities sends its instructions and examples with every text; ExtractEntitiesBatch sends them once for a
+    batch of numbered texts and answers with a numbered list of entities per text. Texts are packed into batches
+    of at most `max_items` texts and `max_input_tokens` tokens, so that the prompt and the response (which grows
+    with the number of texts) fit the model's limits; a text too long for a batch is sent alone. Batches run
+    concurrently. The texts of a batch whose response is missing their list (or that fails) are extracted one by
+    one with ExtractEntities.
+
+    Usage:
+        extractor = BatchEntityExtractor(kernel, grounding["ExtractEntitiesBatch"], grounding["ExtractEntities"])
+        entities = await extractor.extract(summaries)
+        print(extractor.stats)
+    """
+
+    def __init__(
+        self,
+        kernel: "Kernel",
+        batch_function: "KernelFunction",
+        single_function: "KernelFunction",
+        topic: str = "people and places",
+        example_entities: str = "John, Jane, mother, brother, Paris, Rome",
+        max_items: int = default_max_items,
+        max_input_tokens: int = default_max_input_tokens,
+        max_concurrency: int = default_max_concurrency,
+    ) -> None:
+        """
+        Args:
+            kernel -- The kernel to invoke the functions with
+            batch_function -- GroundingPlugin.ExtractEntitiesBatch
+            single_function -- GroundingPlugin.ExtractEntities, for the texts a batch response misses
+            topic -- The topic of the entities to extract
+            example_entities -- Example entities of the topic
+            max_items -- The maximum number of texts per batch; limits the length of the response
+            max_input_tokens -- The maximum number of tokens of the texts of a batch
+            max_concurrency -- The maximum number of requests at once
+        """
+        self.kernel = kernel
+        self.batch_function = batch_function
+        self.single_function = single_function
+        self.topic = topic
+        self.example_entities = example_entities
+        self.max_items = max_items
+        self.max_input_tokens = max_input_tokens
+        self.max_concurrency = max_concurrency
+        self.items = 0
+        self.batches = 0
+        self.fallbacks = 0
+        self.tokens = 0
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            "tokens": self.tokens,
+            "tokens_per_item": self.tokens / self.items if self.items else 0.0,
+        }
+
+    def plan_batches(self, texts: list[str]) -> list[list[int]]:
+        """The positions of the texts of every batch, in order."""
+        batches, current, current_tokens = [], [], 0
+        for position, text in enumerate(texts):
+            tokens = count_tokens(text) + item_overhead_tokens
+            if current and (len(current) >= self.max_items or current_tokens + tokens > self.max_input_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(position)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _invoke(self, function: "KernelFunction", text: str) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            result = await self.kernel.invoke(
+                function, input=text, topic=self.topic, example_entities=self.example_entities
+            )
+        self.tokens += used_tokens(result)
+        return str(result)
+
+    async def extract_batch(self, texts: list[str]) -> list[str | Exception]:
+        """The ExtractEntities response of every text of one batch, or the error extracting it failed with."""
+        self.items += len(texts)
+        items: list[str | None] = [None] * len(texts)
+        if len(texts) > 1:
+            self.batches += 1
+            try:
+                items = parse_batch_entities(await self._invoke(self.batch_function, items_block(texts)), len(texts))
+            except Exception as exc:
+                logger.warning(f"Batch of {len(texts)} texts failed, extracting them one by one: {exc}")
+
+        missing = [position for position, item in enumerate(items) if item is None]
+        if len(texts) > 1:
+            self.fallbacks += len(missing)
+        singles = await asyncio.gather(
+            *(self._invoke(self.single_function, texts[position]) for position in missing), return_exceptions=True
+        )
+        results: list[str | Exception] = list(items)
+        for position, single in zip(missing, singles):
+            results[position] = single
+        return results
+
+    async def extract(self, texts: list[str]) -> list[str]:
+        """The ExtractEntities response of every text, in order; raises the first error of a text that failed."""
+        batches = self.plan_batches(texts)
+        batch_results = await asyncio.gather(
+            *(self.extract_batch([texts[position] for position in batch]) for batch in batches)
+        )
+        results: list[str] = [""] * len(texts)
+        for batch, items in zip(batches, batch_results):
+            for position, item in zip(batch, items):
+                if isinstance(item, Exception):
+                    raise item
+                results[position] = item
+        return results
+
+
+async def benchmark_extraction(
+    extractor: BatchEntityExtractor, texts: list[str], print_function: Callable[[str], Any] = print
+) -> dict[str, dict[str, float]]:
+    """
+    Compare extracting the entities of texts one request per text (ExtractEntities) and in batches.
+
+    Both paths run with the extractor's concurrency. Use a kernel without a response cache, or the second run of
+    the benchmark measures the cache.
+    Returns:
+        The tokens and wall seconds per text of the "single" and "batched" paths
+    """
+    single = BatchEntityExtractor(
+        extractor.kernel,
+        extractor.batch_function,
+        extractor.single_function,
+        extractor.topic,
+        extractor.example_entities,
+        max_items=1,
+        max_concurrency=extractor.max_concurrency,
+    )
+    report = {}
+    for name, runner in (("single", single), ("batched", extractor)):
+        tokens_before, fallbacks_before = runner.tokens, runner.fallbacks
+        start = time.perf_counter()
+        entities = await runner.extract(texts)
+        seconds = time.perf_counter() - start
+        report[name] = {
+            "texts": len(texts),
+            "requests": len(runner.plan_batches(texts)) + runner.fallbacks - fallbacks_before,
+            "tokens_per_text": (runner.tokens - tokens_before) / len(texts) if texts else 0.0,
+            "seconds_per_text": seconds / len(texts) if texts else 0.0,
+            "entities_per_text": (
+                statistics.fmean(len(parse_entities(entity, "entities")) for entity in entities) if entities else 0.0
+            ),
+        }
+        print_function(f"{name}: {report[name]}")
+    return report
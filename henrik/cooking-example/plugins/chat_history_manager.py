@@ -0,0 +1,175 @@
+import logging
+import math
+from typing import TYPE_CHECKING
+from xml.etree.ElementTree import tostring
+
+from semantic_kernel.contents import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+if TYPE_CHECKING:
+    from semantic_kernel.functions.kernel_function import KernelFunction
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_max_tokens = 2000
+default_keep_last = 4
+message_overhead_tokens = 4         # role and separators, as counted by OpenAI chat models
+summary_prefix = "Summary of the earlier conversation: "
+
+_encoding = tiktoken.get_encoding("cl100k_base") if tiktoken else None
+
+
+def count_tokens(text: str) -> int:
+    """The number of tokens of a text; estimated as 4 characters per token when tiktoken is not installed."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+class ChatHistoryManager:
+    """
+    Description: A chat history that renders incrementally and stays within a token budget.
+
+    Every message is rendered to its prompt XML and counted once, when it is added, and the rendered history
+    is kept as a cached prefix that new messages are appended to, so rendering `{{$history}}` does not grow
+    more expensive with every turn. `enforce_budget` keeps the history under `max_tokens`: the oldest messages
+    (except the leading system messages and the last `keep_last` messages) are folded into a rolling summary
+    when a summarize function (e.g. SummarizePlugin.SummarizationGenerator) is given, and dropped otherwise.
+
+    Usage:
+        history = ChatHistoryManager(max_tokens=2000, kernel=kernel, summarize_function=summarize_function)
+        history.add_user_message(user_input)
+        await history.enforce_budget()
+        answer = await kernel.invoke(chat_function, KernelArguments(user_input=user_input, history=history))
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = default_max_tokens,
+        kernel: "Kernel | None" = None,
+        summarize_function: "KernelFunction | None" = None,
+        keep_last: int = default_keep_last,
+    ) -> None:
+        """
+        Args:
+            max_tokens -- The token budget of the rendered history
+            kernel -- The kernel to run the summarize function with
+            summarize_function -- The function to summarize folded messages with (its `input` is the text);
+                                  without one, the oldest messages are dropped
+            keep_last -- The number of most recent messages that are always kept verbatim
+        """
+        if summarize_function is not None and kernel is None:
+            raise ValueError("A kernel is required to run the summarize function")
+        self.max_tokens = max_tokens
+        self.kernel = kernel
+        self.summarize_function = summarize_function
+        self.keep_last = keep_last
+        self.chat_history = ChatHistory()
+        self.message_tokens: list[int] = []
+        self.summarized_messages = 0
+        self.dropped_messages = 0
+        self._rendered_messages: list[str] = []
+        self._rendered: str = ""
+        self._summary: ChatMessageContent | None = None
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.message_tokens)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "messages": len(self.chat_history.messages),
+            "tokens": self.total_tokens,
+            "summarized_messages": self.summarized_messages,
+            "dropped_messages": self.dropped_messages,
+        }
+
+    def __str__(self) -> str:
+        """The history as prompt XML, like `str(ChatHistory)`, for use as a template variable."""
+        return f"<chat_history>{self._rendered}</chat_history>"
+
+    def add_message(self, message: ChatMessageContent) -> None:
+        self._insert(len(self.chat_history.messages), message)
+
+    def add_system_message(self, content: str) -> None:
+        self.add_message(ChatMessageContent(role=AuthorRole.SYSTEM, content=content))
+
+    def add_user_message(self, content: str) -> None:
+        self.add_message(ChatMessageContent(role=AuthorRole.USER, content=content))
+
+    def add_assistant_message(self, content: str) -> None:
+        self.add_message(ChatMessageContent(role=AuthorRole.ASSISTANT, content=content))
+
+    def _insert(self, position: int, message: ChatMessageContent) -> None:
+        rendered = tostring(message.to_element(), encoding="unicode", short_empty_elements=True)
+        self.chat_history.messages.insert(position, message)
+        self._rendered_messages.insert(position, rendered)
+        self.message_tokens.insert(position, count_tokens(message.content or "") + message_overhead_tokens)
+        if position == len(self._rendered_messages) - 1:
+            self._rendered += rendered
+        else:
+            self._rendered = "".join(self._rendered_messages)
+
+    def _remove(self, start: int, end: int) -> list[ChatMessageContent]:
+        removed = self.chat_history.messages[start:end]
+        del self.chat_history.messages[start:end]
+        del self._rendered_messages[start:end]
+        del self.message_tokens[start:end]
+        self._rendered = "".join(self._rendered_messages)
+        return removed
+
+    def _pinned_count(self) -> int:
+        """The number of leading system messages, which are never folded."""
+        count = 0
+        for message in self.chat_history.messages:
+            if message.role != AuthorRole.SYSTEM or message is self._summary:
+                break
+            count += 1
+        return count
+
+    async def enforce_budget(self) -> None:
+        """Fold (or drop) as many of the oldest messages as needed for the history to fit into `max_tokens`."""
+        if self.total_tokens <= self.max_tokens:
+            return
+        start = self._pinned_count()
+        if self._summary is not None:
+            start += 1
+        end = max(start, len(self.chat_history.messages) - self.keep_last)
+
+        # Fold just enough of the oldest messages to get back under the budget
+        excess = self.total_tokens - self.max_tokens
+        stop = start
+        while stop < end and excess > 0:
+            excess -= self.message_tokens[stop]
+            stop += 1
+        if stop == start:
+            logger.warning(f"The last {self.keep_last} messages alone exceed the budget of {self.max_tokens} tokens")
+            return
+
+        if self.summarize_function is None:
+            self._remove(start, stop)
+            self.dropped_messages += stop - start
+            return
+
+        if self._summary is not None:
+            start -= 1
+        folded = self._remove(start, stop)
+        lines = []
+        for message in folded:
+            if message is self._summary:
+                lines.append(message.content.removeprefix(summary_prefix))
+            else:
+                lines.append(f"{message.role.value}: {message.content}")
+                self.summarized_messages += 1
+        summary = await self.kernel.invoke(self.summarize_function, input="\n".join(lines))
+        self._summary = ChatMessageContent(role=AuthorRole.SYSTEM, content=f"{summary_prefix}{str(summary).strip()}")
+        self._insert(start, self._summary)
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from html import escape
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from pydantic import PrivateAttr
+from semantic_kernel.exceptions import PluginInitializationError
+from semantic_kernel.functions import KernelPlugin
+from semantic_kernel.functions.kernel_arguments import KernelArguments
+from semantic_kernel.functions.kernel_function_from_prompt import KernelFunctionFromPrompt
+from semantic_kernel.prompt_template import PromptTemplateConfig
+from semantic_kernel.prompt_template.kernel_prompt_template import KernelPromptTemplate
+from semantic_kernel.template_engine.blocks.block import Block
+from semantic_kernel.template_engine.blocks.var_block import VarBlock
+from semantic_kernel.template_engine.protocols.code_renderer import CodeRenderer
+from semantic_kernel.template_engine.protocols.text_renderer import TextRenderer
+from semantic_kernel.template_engine.template_tokenizer import TemplateTokenizer
+
+from parallel_prompt_template import ParallelKernelPromptTemplate
+
+if TYPE_CHECKING:
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+prompt_file_name = "skprompt.txt"
+config_file_name = "config.json"
+additional_config_sections = ("response_cache",)
+
+
+class RenderPlan(NamedTuple):
+    """
+    A tokenized template, reduced to what changes between calls.
+
+    blocks -- The blocks of the template, as produced by the TemplateTokenizer
+    literals -- The constant text between the slots; there is always one more literal than there are slots
+    slots -- The variable (VarBlock) and function-call (CodeRenderer) blocks, in template order
+    """
+
+    blocks: list[Block]
+    literals: list[str]
+    slots: list[Block]
+
+
+_render_plans: dict[str, RenderPlan] = {}
+
+
+def template_hash(template: str) -> str:
+    return hashlib.sha256(template.encode()).hexdigest()
+
+
+def compile_template(template: str) -> RenderPlan:
+    """Tokenize a template into a render plan, or return the cached plan of an identical template."""
+    key = template_hash(template)
+    plan = _render_plans.get(key)
+    if plan is not None:
+        return plan
+
+    blocks = TemplateTokenizer.tokenize(template) if template else []
+    literals, slots, text = [], [], []
+    for block in blocks:
+        if isinstance(block, VarBlock) or not isinstance(block, TextRenderer):
+            literals.append("".join(text))
+            slots.append(block)
+            text = []
+        else:
+            # Text and value blocks render to the same string on every call
+            text.append(block.render(None, None))
+    literals.append("".join(text))
+
+    plan = _render_plans[key] = RenderPlan(blocks=blocks, literals=literals, slots=slots)
+    return plan
+
+
+class CompiledKernelPromptTemplate(ParallelKernelPromptTemplate):
+    """
+    Description: A semantic-kernel prompt template that renders from a cached render plan.
+
+    The template is compiled once (see `compile_template`) and the plan is shared by every template with the
+    same text, so loading a plugin again (e.g. into another kernel) does not tokenize it again. Rendering fills
+    the variable slots straight from the arguments, escaping only the values that are used, runs the function
+    calls concurrently (see ParallelKernelPromptTemplate) and joins the result once.
+
+    Usage:
+        summarize_plugin = kernel.add_plugin(load_compiled_plugin(plugins_directory, "SummarizePlugin"))
+    """
+
+    _plan: RenderPlan | None = PrivateAttr(default=None)
+    _escape_variables: dict[str, bool] = PrivateAttr(default_factory=dict)
+
+    def extract_blocks(self) -> list[Block]:
+        self._plan = compile_template(self.prompt_template_config.template or "")
+        return self._plan.blocks
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        input_variables = self.prompt_template_config.input_variables
+        self._escape_variables = {
+            slot.name: not self.allow_dangerously_set_content and self._should_escape(slot.name, input_variables)
+            for slot in self._plan.slots
+            if isinstance(slot, VarBlock)
+        }
+
+    def _render_variable(self, block: VarBlock, arguments: "KernelArguments") -> str:
+        value = arguments.get(block.name, None)
+        if value is None:
+            return block.render(None, arguments)    # Logs the missing variable and renders nothing
+        if isinstance(value, str):
+            return escape(value) if self._escape_variables.get(block.name, True) else value
+        return str(value)
+
+    async def render(self, kernel: "Kernel", arguments: "KernelArguments | None" = None) -> str:
+        if arguments is None:
+            arguments = KernelArguments()
+        plan = self._plan
+        if not plan.slots:
+            return plan.literals[0]
+
+        values = [""] * len(plan.slots)
+        calls = []
+        for position, slot in enumerate(plan.slots):
+            if isinstance(slot, VarBlock):
+                values[position] = self._render_variable(slot, arguments)
+            elif isinstance(slot, CodeRenderer):
+                calls.append(position)
+        if calls:
+            results = await self.render_code_blocks(
+                [plan.slots[i] for i in calls], kernel, self._get_trusted_arguments(arguments)
+            )
+            for position, rendered in zip(calls, results):
+                values[position] = rendered
+
+        parts = [plan.literals[0]]
+        for value, literal in zip(values, plan.literals[1:]):
+            parts.append(value)
+            parts.append(literal)
+        return "".join(parts)
+
+
+def load_compiled_function(path: str, plugin_name: str | None = None) -> KernelFunctionFromPrompt:
+    """
+    Create a prompt function from a directory with a skprompt.txt and a config.json, like `add_plugin` does.
+
+    Sections of the config.json that Semantic Kernel does not know (such as "response_cache") are kept in
+    the function's `metadata.additional_properties`.
+    """
+    with open(os.path.join(path, config_file_name)) as config_file:
+        config = config_file.read()
+    prompt_template_config = PromptTemplateConfig.from_json(config)
+    additional_properties = {
+        name: value for name, value in json.loads(config).items() if name in additional_config_sections
+    }
+    prompt_template_config.name = os.path.basename(path)
+    with open(os.path.join(path, prompt_file_name)) as prompt_file:
+        prompt_template_config.template = prompt_file.read()
+
+    function = KernelFunctionFromPrompt(
+        function_name=prompt_template_config.name,
+        plugin_name=plugin_name,
+        prompt_template=CompiledKernelPromptTemplate(prompt_template_config=prompt_template_config),
+        prompt_template_config=prompt_template_config,
+        template_format=prompt_template_config.template_format,
+        description=prompt_template_config.description,
+    )
+    if additional_properties:
+        function.metadata.additional_properties = additional_properties
+    return function
+
+
+def load_compiled_plugin(parent_directory: str, plugin_name: str, description: str | None = None) -> KernelPlugin:
+    """
+    Load the prompt functions of a plugin directory with compiled templates.
+    Args:
+        parent_directory -- The directory containing the plugin directory
+        plugin_name -- The name of the plugin directory
+        description -- The description of the plugin
+    Returns:
+        The plugin, to be added with `kernel.add_plugin(plugin)`
+    """
+    plugin_directory = os.path.abspath(os.path.join(parent_directory, plugin_name))
+    if not os.path.isdir(plugin_directory):
+        raise PluginInitializationError(f"Plugin directory does not exist: {plugin_name}")
+
+    functions = []
+    for name in sorted(os.listdir(plugin_directory)):
+        path = os.path.join(plugin_directory, name)
+        if name.startswith("__") or not os.path.isdir(path):
+            continue
+        if not os.path.exists(os.path.join(path, prompt_file_name)) or not os.path.exists(
+            os.path.join(path, config_file_name)
+        ):
+            logger.warning(f"Skipping {path}: {prompt_file_name} and {config_file_name} are required")
+            continue
+        functions.append(load_compiled_function(path, plugin_name))
+    if not functions:
+        raise PluginInitializationError(f"No functions found in folder: {parent_directory}/{plugin_name}")
+    return KernelPlugin(name=plugin_name, description=description, functions=functions)
+
+
+## Benchmark
+async def benchmark_template_render(
+    kernel: "Kernel",
+    template: str,
+    arguments: dict[str, Any] | None = None,
+    iterations: int = 10_000,
+) -> dict[str, float]:
+    """
+    Measure the render throughput (renders per second) of a template without and with compilation.
+
+    "parse per call" builds a new KernelPromptTemplate for every render, "kernel template" re-renders one
+    KernelPromptTemplate and "compiled" re-renders one CompiledKernelPromptTemplate.
+    """
+    config = PromptTemplateConfig(template=template)
+    arguments = KernelArguments(**(arguments or {}))
+    reused = KernelPromptTemplate(prompt_template_config=config.model_copy(deep=True))
+    compiled = CompiledKernelPromptTemplate(prompt_template_config=config.model_copy(deep=True))
+    assert await reused.render(kernel, arguments) == await compiled.render(kernel, arguments)
+
+    async def parse_and_render() -> str:
+        return await KernelPromptTemplate(prompt_template_config=config.model_copy(deep=True)).render(kernel, arguments)
+
+    result = {}
+    for mode, render in (
+        ("parse per call", parse_and_render),
+        ("kernel template", lambda: reused.render(kernel, arguments)),
+        ("compiled", lambda: compiled.render(kernel, arguments)),
+    ):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await render()
+        result[mode] = iterations / (time.perf_counter() - start)
+        print(f"{mode:>16}: {result[mode]:,.0f} renders/s")
+    return result
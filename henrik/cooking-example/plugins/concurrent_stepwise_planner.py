@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from functools import partial
+from inspect import isasyncgenfunction, iscoroutinefunction, isgenerator
+from typing import TYPE_CHECKING, Any
+
+from semantic_kernel.connectors.ai.function_call_behavior import EnabledFunctions, FunctionCallBehavior
+from semantic_kernel.connectors.ai.open_ai.prompt_execution_settings.open_ai_prompt_execution_settings import (
+    OpenAIChatPromptExecutionSettings,
+)
+from semantic_kernel.connectors.ai.open_ai.services.azure_chat_completion import AzureChatCompletion
+from semantic_kernel.connectors.ai.open_ai.services.open_ai_chat_completion import OpenAIChatCompletion
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+from semantic_kernel.contents.function_result_content import FunctionResultContent
+from semantic_kernel.exceptions.planner_exceptions import PlannerInvalidConfigurationError
+from semantic_kernel.filters.auto_function_invocation.auto_function_invocation_context import (
+    AutoFunctionInvocationContext,
+)
+from semantic_kernel.filters.filter_types import FilterTypes
+from semantic_kernel.filters.functions.function_invocation_context import FunctionInvocationContext
+from semantic_kernel.filters.kernel_filters_extension import (
+    _rebuild_auto_function_invocation_context,
+    _rebuild_function_invocation_context,
+)
+from semantic_kernel.functions.function_result import FunctionResult
+from semantic_kernel.functions.kernel_arguments import KernelArguments
+from semantic_kernel.functions.kernel_function import KernelFunction
+from semantic_kernel.functions.kernel_function_from_method import KernelFunctionFromMethod
+from semantic_kernel.planners.function_calling_stepwise_planner import (
+    FunctionCallingStepwisePlanner,
+    FunctionCallingStepwisePlannerOptions,
+)
+from semantic_kernel.planners.function_calling_stepwise_planner.function_calling_stepwise_planner import (
+    STEPWISE_USER_MESSAGE,
+    USER_INTERACTION_SEND_FINAL_ANSWER,
+)
+from semantic_kernel.planners.function_calling_stepwise_planner.function_calling_stepwise_planner_result import (
+    FunctionCallingStepwisePlannerResult,
+    UserInteraction,
+)
+
+if TYPE_CHECKING:
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_max_concurrent_calls = 4
+
+
+def is_sync_method(function: KernelFunction) -> bool:
+    """Whether a function is a native function with a plain (blocking) method."""
+    if not isinstance(function, KernelFunctionFromMethod):
+        return False
+    return not (iscoroutinefunction(function.method) or isasyncgenfunction(function.method))
+
+
+def call_method(function: KernelFunctionFromMethod, arguments: dict[str, Any]) -> Any:
+    result = function.method(**arguments)
+    return list(result) if isgenerator(result) else result
+
+
+async def invoke_in_thread(
+    function: KernelFunctionFromMethod, kernel: "Kernel", arguments: KernelArguments, executor: ThreadPoolExecutor
+) -> FunctionResult | None:
+    """
+    Invoke a native function like `function.invoke`, through the kernel's function invocation filters, with its
+    method running in a thread of `executor` so it does not block the event loop.
+    """
+
+    async def invoke_method(context: FunctionInvocationContext) -> None:
+        function_arguments = function.gather_function_parameters(context)
+        result = await asyncio.get_running_loop().run_in_executor(
+            executor, partial(call_method, function, function_arguments)
+        )
+        if not isinstance(result, FunctionResult):
+            result = FunctionResult(
+                function=function.metadata,
+                value=result,
+                metadata={"arguments": context.arguments, "used_arguments": function_arguments},
+            )
+        context.result = result
+
+    _rebuild_function_invocation_context()
+    context = FunctionInvocationContext(function=function, kernel=kernel, arguments=arguments)
+    stack = kernel.construct_call_stack(filter_type=FilterTypes.FUNCTION_INVOCATION, inner_function=invoke_method)
+    await stack(context)
+    return context.result
+
+
+def tool_call_timings(chat_history: ChatHistory) -> list[dict[str, Any]]:
+    """The name, start and duration of every tool call of a ConcurrentFunctionCallingStepwisePlanner run."""
+    return [
+        {"name": item.name, **item.metadata["timing"]}
+        for message in chat_history.messages
+        for item in message.items
+        if isinstance(item, FunctionResultContent) and "timing" in item.metadata
+    ]
+
+
+class ConcurrentFunctionCallingStepwisePlanner(FunctionCallingStepwisePlanner):
+    """
+    Description: A FunctionCallingStepwisePlanner that runs the tool calls of a model turn concurrently.
+
+    When the model asks for several functions in one turn (e.g. GetEmailAddress for John and for Mary), they
+    are invoked at the same time, at most `max_concurrent_calls` at once: async functions on the event loop and
+    plain methods in a thread pool. The results are added to the chat history in the order the model asked for
+    them, each with its timing (`timing` in the metadata of the result: start offset within the turn, duration,
+    and whether it ran in a thread); see `tool_call_timings`.
+
+    Usage:
+        planner = ConcurrentFunctionCallingStepwisePlanner(service_id=service_id, options=options, max_concurrent_calls=4)
+        result = await planner.invoke(kernel, question)
+    """
+
+    max_concurrent_calls: int = default_max_concurrent_calls
+
+    def __init__(
+        self,
+        service_id: str,
+        options: FunctionCallingStepwisePlannerOptions | None = None,
+        max_concurrent_calls: int = default_max_concurrent_calls,
+    ) -> None:
+        super().__init__(service_id=service_id, options=options)
+        self.max_concurrent_calls = max_concurrent_calls
+
+    async def invoke(
+        self,
+        kernel: "Kernel",
+        question: str,
+        arguments: KernelArguments | None = None,
+        **kwargs: Any,
+    ) -> FunctionCallingStepwisePlannerResult:
+        """Execute the planner like FunctionCallingStepwisePlanner.invoke, with concurrent tool calls."""
+        if not question:
+            raise PlannerInvalidConfigurationError("Input question cannot be empty")
+        if not arguments:
+            arguments = KernelArguments(**kwargs)
+
+        try:
+            chat_completion: OpenAIChatCompletion | AzureChatCompletion = kernel.get_service(service_id=self.service_id)
+        except Exception as exc:
+            raise PlannerInvalidConfigurationError(
+                f"The OpenAI service `{self.service_id}` is not available. Please configure the AI service."
+            ) from exc
+        if not isinstance(chat_completion, (OpenAIChatCompletion, AzureChatCompletion)):
+            raise PlannerInvalidConfigurationError(
+                f"The service with id `{self.service_id}` is not an OpenAI based service."
+            )
+
+        prompt_execution_settings: OpenAIChatPromptExecutionSettings = (
+            self.options.execution_settings
+            or chat_completion.instantiate_prompt_execution_settings(service_id=self.service_id)
+        )
+        if self.options.max_completion_tokens:
+            prompt_execution_settings.max_tokens = self.options.max_completion_tokens
+
+        cloned_kernel = copy(kernel)
+        cloned_kernel.add_plugin(UserInteraction(), "UserInteraction")
+        initial_plan = await self._generate_plan(question=question, kernel=cloned_kernel, arguments=arguments)
+        chat_history_for_steps = await self._build_chat_history_for_step(
+            goal=question, initial_plan=initial_plan, kernel=cloned_kernel, arguments=arguments, service=chat_completion
+        )
+        prompt_execution_settings.function_call_behavior = FunctionCallBehavior.EnableFunctions(
+            auto_invoke=False, filters={"excluded_plugins": list(self.options.excluded_plugins)}
+        )
+
+        with ThreadPoolExecutor(self.max_concurrent_calls, thread_name_prefix="stepwise-tool") as executor:
+            for i in range(self.options.max_iterations):
+                if i > 0:
+                    await asyncio.sleep(self.options.min_iteration_time_ms / 1000.0)
+                chat_history_for_steps.add_user_message(STEPWISE_USER_MESSAGE)
+                chat_result = await chat_completion.get_chat_message_contents(
+                    chat_history=chat_history_for_steps,
+                    settings=prompt_execution_settings,
+                    kernel=cloned_kernel,
+                )
+                chat_result = chat_result[0]
+                chat_history_for_steps.add_message(chat_result)
+
+                function_calls = [item for item in chat_result.items if isinstance(item, FunctionCallContent)]
+                if not function_calls:
+                    chat_history_for_steps.add_user_message("That function call is invalid. Try something else!")
+                    continue
+
+                final_answer = next(
+                    (item for item in function_calls if item.name == USER_INTERACTION_SEND_FINAL_ANSWER), None
+                )
+                if final_answer is not None:
+                    return FunctionCallingStepwisePlannerResult(
+                        final_answer=final_answer.parse_arguments().get("answer", ""),
+                        chat_history=chat_history_for_steps,
+                        iterations=i + 1,
+                    )
+
+                messages = await self._invoke_function_calls(
+                    function_calls,
+                    cloned_kernel,
+                    chat_history_for_steps,
+                    arguments,
+                    prompt_execution_settings.function_call_behavior,
+                    executor,
+                )
+                for message in messages:
+                    chat_history_for_steps.add_message(message)
+
+        return FunctionCallingStepwisePlannerResult(
+            final_answer="",
+            chat_history=chat_history_for_steps,
+            iterations=i + 1,
+        )
+
+    async def _invoke_function_calls(
+        self,
+        function_calls: list[FunctionCallContent],
+        kernel: "Kernel",
+        chat_history: ChatHistory,
+        arguments: KernelArguments,
+        function_call_behavior: FunctionCallBehavior,
+        executor: ThreadPoolExecutor,
+    ) -> list[ChatMessageContent]:
+        """Invoke the function calls of a model turn concurrently; the result messages are in the order of the calls."""
+        semaphore = asyncio.Semaphore(self.max_concurrent_calls)
+        started = time.perf_counter()
+
+        async def invoke(function_call: FunctionCallContent) -> ChatMessageContent:
+            async with semaphore:
+                start = time.perf_counter()
+                result, in_thread = await self._invoke_function_call(
+                    function_call, kernel, chat_history, arguments, function_call_behavior, executor
+                )
+                end = time.perf_counter()
+            timing = {"start_seconds": start - started, "duration_seconds": end - start, "in_thread": in_thread}
+            logger.info(f"{function_call.name} took {end - start:.3f}s")
+            return FunctionResultContent.from_function_call_content_and_result(
+                function_call_content=function_call, result=result, metadata={"timing": timing}
+            ).to_chat_message_content()
+
+        return await asyncio.gather(*(invoke(function_call) for function_call in function_calls))
+
+    async def _invoke_function_call(
+        self,
+        function_call: FunctionCallContent,
+        kernel: "Kernel",
+        chat_history: ChatHistory,
+        arguments: KernelArguments,
+        function_call_behavior: FunctionCallBehavior,
+        executor: ThreadPoolExecutor,
+    ) -> tuple[Any, bool]:
+        """
+        Invoke one function call, with the checks and auto function invocation filters of the chat completion's
+        `_process_function_call`; returns the result, or the message for the model if the call is invalid or
+        failed, and whether the function ran in a thread.
+        """
+        try:
+            parsed_args = function_call.parse_arguments() or {}
+        except Exception as exc:
+            logger.info(f"Received invalid arguments for function {function_call.name}: {exc}. Trying tool call again.")
+            return "The tool call arguments are malformed. Arguments must be in JSON format. Please try again.", False
+
+        try:
+            if function_call.name is None:
+                raise ValueError("The function name is required.")
+            if isinstance(function_call_behavior, EnabledFunctions):
+                enabled_functions = [
+                    function.fully_qualified_name
+                    for function in kernel.get_list_of_function_metadata(function_call_behavior.filters)
+                ]
+                if function_call.name not in enabled_functions:
+                    raise ValueError(
+                        f"Only functions: {enabled_functions} are allowed, {function_call.name} is not allowed."
+                    )
+            function = kernel.get_function(function_call.plugin_name, function_call.function_name)
+        except Exception as exc:
+            logger.exception(f"Could not find function {function_call.name}: {exc}.")
+            return "The tool call could not be found, please try again and make sure to validate the name.", False
+
+        required = [parameter.name for parameter in function.parameters if parameter.is_required]
+        if len(parsed_args) < len(required):
+            return (
+                f"There are `{len(required)}` tool call arguments required and only `{len(parsed_args)}` received. "
+                f"The required arguments are: {required}. Please provide the required arguments and try again."
+            ), False
+
+        call_arguments = copy(arguments)
+        call_arguments.update(parsed_args)
+        in_thread = is_sync_method(function)
+
+        async def invoke_function(context: AutoFunctionInvocationContext) -> None:
+            try:
+                if in_thread:
+                    result = await invoke_in_thread(context.function, context.kernel, context.arguments, executor)
+                else:
+                    result = await context.function.invoke(context.kernel, context.arguments)
+                if result:
+                    context.function_result = result
+            except Exception as exc:
+                logger.exception(f"Error invoking function {context.function.fully_qualified_name}: {exc}.")
+                context.function_result = FunctionResult(
+                    function=context.function.metadata,
+                    value=f"An error occurred while invoking the function {context.function.fully_qualified_name}: {exc}",
+                )
+
+        _rebuild_auto_function_invocation_context()
+        context = AutoFunctionInvocationContext(
+            function=function,
+            kernel=kernel,
+            arguments=call_arguments,
+            chat_history=chat_history,
+            function_result=FunctionResult(function=function.metadata, value=None),
+            function_count=1,
+            request_sequence_index=0,
+        )
+        if function_call.index is not None:
+            context.function_sequence_index = function_call.index
+        stack = kernel.construct_call_stack(
+            filter_type=FilterTypes.AUTO_FUNCTION_INVOCATION, inner_function=invoke_function
+        )
+        await stack(context)
+        return context.function_result, in_thread
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import sqlite3
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+from numpy import ndarray
+from pydantic import PrivateAttr
+from semantic_kernel.connectors.ai.embeddings.embedding_generator_base import EmbeddingGeneratorBase
+
+# Definitions
+default_max_entries = 10_000
+
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode and whitespace, so trivially different spellings of a text share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedTextEmbedding(EmbeddingGeneratorBase):
+    """
+    Description: A content-addressed cache in front of an embedding service.
+
+    Embeddings are keyed on (model id, hash of the normalized text). Hot entries are kept in a bounded
+    in-memory LRU and every computed embedding is also written to an SQLite file, so identical texts are
+    only embedded once, across runs. Use the same instance for `SemanticTextMemory.save_*` and `search`.
+
+    Usage:
+        embedding_gen = CachedTextEmbedding(OpenAITextEmbedding(ai_model_id="text-embedding-3-small"), "embeddings.sqlite")
+        memory = SemanticTextMemory(storage=NumpyMemoryStore(), embeddings_generator=embedding_gen)
+    """
+
+    inner: EmbeddingGeneratorBase
+    max_entries: int = default_max_entries
+    cache_path: str | None = None
+
+    _lru: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _connection: sqlite3.Connection | None = PrivateAttr(default=None)
+    _hits: int = PrivateAttr(default=0)
+    _disk_hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(
+        self,
+        inner: EmbeddingGeneratorBase,
+        cache_path: str | None = None,
+        max_entries: int = default_max_entries,
+        service_id: str | None = None,
+    ) -> None:
+        """
+        Args:
+            inner -- The embedding service to cache (e.g. OpenAITextEmbedding or HuggingFaceTextEmbedding)
+            cache_path -- The SQLite file to spill embeddings to; None keeps the cache in memory only
+            max_entries -- The maximum number of embeddings held in memory
+            service_id -- The service id, defaults to the id of the wrapped service
+        """
+        super().__init__(
+            ai_model_id=inner.ai_model_id,
+            service_id=service_id or inner.service_id,
+            inner=inner,
+            cache_path=cache_path,
+            max_entries=max_entries,
+        )
+        if cache_path:
+            self._connection = sqlite3.connect(cache_path)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL)"
+            )
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """Hit/miss counters; memory and disk hits both count as hits."""
+        lookups = self._hits + self._disk_hits + self._misses
+        return {
+            "hits": self._hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "hit_rate": (self._hits + self._disk_hits) / lookups if lookups else 0.0,
+            "entries_in_memory": len(self._lru),
+        }
+
+    def _key(self, text: str, kwargs: dict[str, Any]) -> str:
+        content = normalize_text(text)
+        if kwargs:
+            content += "\0" + json.dumps(kwargs, sort_keys=True, default=str)
+        return f"{self.ai_model_id}:{hashlib.sha256(content.encode()).hexdigest()}"
+
+    def _remember(self, key: str, embedding: ndarray) -> None:
+        self._lru[key] = embedding
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _read_disk(self, keys: list[str]) -> dict[str, ndarray]:
+        if self._connection is None or not keys:
+            return {}
+        found = {}
+        # Stay well below SQLite's limit on the number of query parameters
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            rows = self._connection.execute(
+                f"SELECT key, embedding FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            found.update({key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows})
+        return found
+
+    def _write_disk(self, entries: dict[str, ndarray]) -> None:
+        if self._connection is None or not entries:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)",
+                [(key, embedding.tobytes()) for key, embedding in entries.items()],
+            )
+
+    async def generate_embeddings(self, texts: list[str], **kwargs: Any) -> ndarray:
+        if not texts:
+            return await self.inner.generate_embeddings(texts, **kwargs)
+        keys = [self._key(text, kwargs) for text in texts]
+        found: dict[str, ndarray] = {}
+        for key in keys:
+            if key in self._lru and key not in found:
+                self._lru.move_to_end(key)
+                found[key] = self._lru[key]
+                self._hits += 1
+
+        from_disk = self._read_disk([key for key in dict.fromkeys(keys) if key not in found])
+        for key, embedding in from_disk.items():
+            self._remember(key, embedding)
+            self._disk_hits += 1
+        found.update(from_disk)
+
+        # Embed every missing text once, even if it occurs several times in `texts`
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            self._misses += len(missing)
+            embeddings = np.asarray(await self.inner.generate_embeddings(list(missing.values()), **kwargs), dtype=np.float32)
+            # The cache keeps views of these rows and may return the matrix itself: nobody may change them in place
+            embeddings.setflags(write=False)
+            computed = dict(zip(missing, embeddings))
+            self._write_disk(computed)
+            for key, embedding in computed.items():
+                self._remember(key, embedding)
+            if len(missing) == len(keys):
+                # Nothing was cached: the inner service's matrix is the result, without stacking a copy of it
+                return embeddings
+            found.update(computed)
+
+        return np.stack([found[key] for key in keys])
+
+    def close(self) -> None:
+        """Close the SQLite file."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
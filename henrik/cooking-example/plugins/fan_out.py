@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Callable, Coroutine
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.contents.chat_history import ChatHistory
+
+from streaming import choice_finished
+
+if TYPE_CHECKING:
+    from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+    from semantic_kernel.connectors.ai.text_completion_client_base import TextCompletionClientBase
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+_finished = object()     # Tells the consumer that a service sent all its results
+
+
+class FanOutTarget(NamedTuple):
+    """
+    A service to send the prompt to.
+
+    service -- A text or chat completion service
+    settings -- Its execution settings, with the number of results to ask for (`number_of_responses`,
+                `num_return_sequences`)
+    prompt -- The prompt for this service instead of the shared one (e.g. a text to continue for a base model)
+    stream -- Whether to stream the completion, so that each result is reported as soon as it is finished rather
+              than when all of the service's results are
+    blocking -- Whether the service computes in the calling thread (local models, e.g. HuggingFaceTextCompletion);
+                it is then run in a worker thread, so that the other services are not held up
+    """
+
+    service: "TextCompletionClientBase | ChatCompletionClientBase"
+    settings: "PromptExecutionSettings"
+    prompt: str | None = None
+    stream: bool = False
+    blocking: bool = False
+
+
+class FanOutResult(NamedTuple):
+    """
+    A result of one of the services, with the seconds from the start of the fan-out to its arrival.
+
+    target -- The position of the service's FanOutTarget in the fan-out's targets (a service may be a target
+              several times, e.g. with other settings)
+    """
+
+    service_id: str
+    choice_index: int
+    text: str
+    seconds: float
+    target: int
+
+
+class CompletionFanOut:
+    """
+    Description: Sends one prompt to several services at once and reports their results as they arrive.
+
+    Every service is asked for its own number of results. Results are yielded as soon as they arrive, tagged with
+    the service and choice index, in the order they arrive. With `first_n`, the fan-out stops at the first `first_n`
+    results that `accept` accepts and cancels the requests still running, so a slow service does not bound the
+    latency. A failing service is logged and recorded in `stats`; the others go on.
+
+    Usage:
+        fan_out = CompletionFanOut(
+            [FanOutTarget(oai_chat_service, chat_settings), FanOutTarget(hf_service, hf_settings, blocking=True)]
+        )
+        async for result in fan_out.results("What is the purpose of a rubber duck?", first_n=3):
+            print(f"{result.service_id}[{result.choice_index}]: {result.text}")
+    """
+
+    def __init__(self, targets: list[FanOutTarget]) -> None:
+        """
+        Args:
+            targets -- The services to send the prompt to, with their settings
+        """
+        self.targets = targets
+        self._stats: dict[int, dict[str, Any]] = {}
+
+    @property
+    def stats(self) -> dict[int, dict[str, Any]]:
+        """
+        Per target (by position) of the last fan-out: its service, its results, the seconds to the first and last,
+        and how it ended.
+        """
+        return self._stats
+
+    async def results(
+        self,
+        prompt: str,
+        first_n: int | None = None,
+        accept: Callable[[FanOutResult], bool] | None = None,
+    ) -> AsyncIterator[FanOutResult]:
+        """
+        Yield the results of all services as they arrive.
+
+        To stop early without `first_n`, close the iterator (e.g. with `contextlib.aclosing`) so the requests
+        still running are cancelled.
+        Args:
+            prompt -- The prompt, as the user message for chat services
+            first_n -- Stop after this many accepted results
+            accept -- Whether a result counts (e.g. is not empty); rejected results are not yielded
+        """
+        start = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue()
+        self._stats = {
+            position: {
+                "service_id": target.service.service_id,
+                "results": 0,
+                "first_seconds": None,
+                "seconds": None,
+                "outcome": "running",
+            }
+            for position, target in enumerate(self.targets)
+        }
+        tasks = [
+            asyncio.create_task(self._run(position, target, prompt, queue, start))
+            for position, target in enumerate(self.targets)
+        ]
+        running, accepted = len(tasks), 0
+        try:
+            while running:
+                item = await queue.get()
+                if item is _finished:
+                    running -= 1
+                    continue
+                service_stats = self._stats[item.target]
+                service_stats["results"] += 1
+                if service_stats["first_seconds"] is None:
+                    service_stats["first_seconds"] = item.seconds
+                if accept is not None and not accept(item):
+                    continue
+                yield item
+                accepted += 1
+                if first_n is not None and accepted >= first_n:
+                    return
+        finally:
+            for position, task in enumerate(tasks):
+                if not task.done():
+                    task.cancel()
+                    self._stats[position]["outcome"] = "cancelled"
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def gather(
+        self,
+        prompt: str,
+        first_n: int | None = None,
+        accept: Callable[[FanOutResult], bool] | None = None,
+    ) -> list[FanOutResult]:
+        """All the results (or the first `first_n` accepted ones), in the order they arrived."""
+        return [result async for result in self.results(prompt, first_n, accept)]
+
+    async def _run(self, position: int, target: FanOutTarget, prompt: str, queue: asyncio.Queue, start: float) -> None:
+        service_id = target.service.service_id
+        service_stats = self._stats[position]
+
+        def put(choice_index: int, text: str) -> None:
+            queue.put_nowait(FanOutResult(service_id, choice_index, text, time.perf_counter() - start, position))
+
+        try:
+            prompt = target.prompt or prompt
+            if target.stream:
+                await self._stream(target, prompt, put)
+            else:
+                for choice_index, content in enumerate(await self._complete(target, prompt)):
+                    put(choice_index, str(content))
+            service_stats["outcome"] = "completed"
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning(f"Service {service_id} failed: {exc}")
+            service_stats["outcome"] = f"failed: {exc}"
+        finally:
+            service_stats["seconds"] = time.perf_counter() - start
+            queue.put_nowait(_finished)
+
+    @staticmethod
+    def _chat_history(prompt: str) -> ChatHistory:
+        chat_history = ChatHistory()
+        chat_history.add_user_message(prompt)
+        return chat_history
+
+    async def _complete(self, target: FanOutTarget, prompt: str) -> list[Any]:
+        service = target.service
+
+        def request() -> Coroutine[Any, Any, list[Any]]:
+            if isinstance(service, ChatCompletionClientBase):
+                return service.get_chat_message_contents(self._chat_history(prompt), target.settings)
+            return service.get_text_contents(prompt, target.settings)
+
+        if target.blocking:
+            # The service does not await while it computes; run it on an event loop of its own in a worker thread.
+            # The coroutine is created there, so a fan-out cancelled before the thread starts leaves none unawaited.
+            return await asyncio.to_thread(lambda: asyncio.run(request()))
+        return await request()
+
+    async def _stream(self, target: FanOutTarget, prompt: str, put: Callable[[int, str], None]) -> None:
+        service = target.service
+        if isinstance(service, ChatCompletionClientBase):
+            stream = service.get_streaming_chat_message_contents(self._chat_history(prompt), target.settings)
+        else:
+            stream = service.get_streaming_text_contents(prompt, target.settings)
+        texts: dict[int, list[str]] = {}
+        reported: set[int] = set()
+        async for chunks in stream:
+            for content in chunks:
+                texts.setdefault(content.choice_index, []).append(str(content))
+                if choice_finished(content) and content.choice_index not in reported:
+                    reported.add(content.choice_index)
+                    put(content.choice_index, "".join(texts[content.choice_index]))
+        for choice_index in sorted(set(texts) - reported):
+            put(choice_index, "".join(texts[choice_index]))
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import logging
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from semantic_kernel.connectors.ai.open_ai.services.utils import kernel_function_metadata_to_openai_tool_format
+from semantic_kernel.functions import KernelPlugin
+from semantic_kernel.functions.kernel_function_metadata import KernelFunctionMetadata
+from semantic_kernel.planners.sequential_planner.sequential_planner_config import SequentialPlannerConfig
+from semantic_kernel.planners.sequential_planner.sequential_planner_extensions import (
+    SequentialPlannerFunctionExtension,
+)
+
+from chat_history_manager import count_tokens
+
+if TYPE_CHECKING:
+    from semantic_kernel.connectors.ai.embeddings.embedding_generator_base import EmbeddingGeneratorBase
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_top_k = 5
+
+
+def function_text(function: KernelFunctionMetadata) -> str:
+    """The text a function is embedded as: its name, description and parameter descriptions."""
+    parameters = "; ".join(f"{p.name}: {p.description or ''}" for p in function.parameters)
+    return f"{function.plugin_name}.{function.name}: {function.description or ''} ({parameters})"
+
+
+class FunctionIndex:
+    """
+    Description: Selects the functions relevant to a goal, so planners only describe those to the model.
+
+    Function descriptions are embedded once (and again only when a description changes); every goal is embedded
+    and the `top_k` most similar functions, plus the `always_include` ones, are listed to the planner. The
+    index counts the tokens of the function lists that were sent and of the complete lists they replaced, per
+    model request: FunctionCallingStepwisePlanner sends its list with the initial plan request and again in every
+    iteration, so pass the iterations of its results to `record_iterations`.
+
+    Usage:
+        function_index = FunctionIndex(kernel, embedding_service, top_k=5)
+        planner = SequentialPlanner(kernel, service_id, SequentialPlannerConfig(
+            get_available_functions=function_index.sequential_planner_functions))
+        result = await stepwise_planner.invoke(await function_index.relevant_kernel(question), question)
+        function_index.record_iterations(question, result.iterations)
+    """
+
+    def __init__(
+        self,
+        kernel: "Kernel",
+        embedding_service: "EmbeddingGeneratorBase",
+        top_k: int = default_top_k,
+        always_include: Iterable[str] = (),
+    ) -> None:
+        """
+        Args:
+            kernel -- The kernel whose functions are selected from
+            embedding_service -- The service to embed function descriptions and goals with
+            top_k -- The number of functions to select per goal
+            always_include -- Fully qualified names of functions to always select (e.g. "TextPlugin-uppercase")
+        """
+        self.kernel = kernel
+        self.embedding_service = embedding_service
+        self.top_k = top_k
+        self.always_include = set(always_include)
+        self.requests = 0
+        self.functions_total = 0
+        self.functions_sent = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+        self._embeddings: dict[str, tuple[str, np.ndarray]] = {}
+        # The sizes of the function list selected for a question, until its iterations are recorded
+        self._tool_lists: dict[str, tuple[int, int, int, int]] = {}
+        # Concurrent goals (e.g. run_questions) would otherwise embed the same new functions at once
+        self._index_lock = asyncio.Lock()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "requests": self.requests,
+            "functions_total": self.functions_total,
+            "functions_sent": self.functions_sent,
+            "full_tokens": self.full_tokens,
+            "sent_tokens": self.sent_tokens,
+            "tokens_saved": self.full_tokens - self.sent_tokens,
+        }
+
+    async def _index(self, functions: list[KernelFunctionMetadata]) -> None:
+        """Embed the functions that are new or whose description changed, in one request at a time."""
+        async with self._index_lock:
+            pending = {}
+            for function in functions:
+                text = function_text(function)
+                digest = hashlib.sha256(text.encode()).hexdigest()
+                known = self._embeddings.get(function.fully_qualified_name)
+                if known is None or known[0] != digest:
+                    pending[function.fully_qualified_name] = (digest, text)
+            if not pending:
+                return
+            logger.info(f"Embedding {len(pending)} function descriptions")
+            embeddings = await self.embedding_service.generate_embeddings([text for _, text in pending.values()])
+            for (name, (digest, _)), embedding in zip(pending.items(), embeddings):
+                embedding = np.asarray(embedding, dtype=np.float32)
+                self._embeddings[name] = (digest, embedding / (np.linalg.norm(embedding) or 1.0))
+
+    async def relevant_functions(
+        self, goal: str, functions: list[KernelFunctionMetadata]
+    ) -> list[KernelFunctionMetadata]:
+        """The `top_k` functions most similar to a goal and the `always_include` ones, sorted by plugin and name."""
+        if len(functions) <= self.top_k:
+            return list(functions)
+        await self._index(functions)
+        query = np.asarray((await self.embedding_service.generate_embeddings([goal]))[0], dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        matrix = np.stack([self._embeddings[function.fully_qualified_name][1] for function in functions])
+        ranked = np.argsort(-(matrix @ query), kind="stable")[: self.top_k]
+        selected = {int(i) for i in ranked}
+        selected.update(i for i, function in enumerate(functions) if function.fully_qualified_name in self.always_include)
+        return sorted((functions[i] for i in selected), key=lambda f: (f.plugin_name or "", f.name))
+
+    def _record(self, full: list[Any], sent: list[Any], render) -> tuple[int, int, int, int]:
+        """Count one model request listing `sent` instead of `full`; returns the sizes of both lists."""
+        sizes = (len(full), len(sent), count_tokens(render(full)), count_tokens(render(sent)))
+        self._count(sizes, 1)
+        return sizes
+
+    def _count(self, sizes: tuple[int, int, int, int], requests: int) -> None:
+        full_functions, sent_functions, full_tokens, sent_tokens = sizes
+        self.requests += requests
+        self.functions_total += requests * full_functions
+        self.functions_sent += requests * sent_functions
+        self.full_tokens += requests * full_tokens
+        self.sent_tokens += requests * sent_tokens
+
+    def record_iterations(self, question: str, iterations: int) -> None:
+        """
+        Count the function lists of the iterations of a FunctionCallingStepwisePlanner run for a question.
+
+        `relevant_kernel` only counts the list of the initial plan request; the planner sends it again with the
+        model request of each iteration (`FunctionCallingStepwisePlannerResult.iterations`).
+        """
+        sizes = self._tool_lists.pop(question, None)
+        if sizes is not None:
+            self._count(sizes, iterations)
+
+    async def sequential_planner_functions(
+        self, config: SequentialPlannerConfig, semantic_query: str | None = None
+    ) -> list[KernelFunctionMetadata]:
+        """
+        The functions to list for a SequentialPlanner goal; pass as `SequentialPlannerConfig.get_available_functions`.
+
+        Like SequentialPlanner, the excluded plugins and functions are left out and the included functions are
+        always listed.
+        """
+        functions = [
+            function
+            for function in self.kernel.get_list_of_function_metadata({"excluded_plugins": config.excluded_plugins})
+            if function.name not in config.excluded_functions
+        ]
+        if semantic_query is None:
+            return functions
+        selected = await self.relevant_functions(semantic_query, functions)
+        selected_names = {function.fully_qualified_name for function in selected}
+        selected += [
+            function
+            for function in functions
+            if function.name in config.included_functions and function.fully_qualified_name not in selected_names
+        ]
+
+        def manual(functions: list[KernelFunctionMetadata]) -> str:
+            return "\n\n".join(SequentialPlannerFunctionExtension.to_manual_string(function) for function in functions)
+
+        self._record(functions, selected, manual)
+        return selected
+
+    async def relevant_kernel(self, question: str, excluded_plugins: Iterable[str] = ()) -> "Kernel":
+        """
+        A copy of the kernel with only the functions relevant to a question, for FunctionCallingStepwisePlanner.
+
+        The planner offers every function of the kernel it is given as a tool, in the initial plan and in every
+        iteration; the copy shares the kernel's services.
+        """
+        excluded_plugins = set(excluded_plugins)
+        functions = self.kernel.get_list_of_function_metadata({"excluded_plugins": list(excluded_plugins)})
+        selected = await self.relevant_functions(question, functions)
+
+        def tools(functions: list[KernelFunctionMetadata]) -> str:
+            return json.dumps([kernel_function_metadata_to_openai_tool_format(function) for function in functions])
+
+        self._tool_lists[question] = self._record(functions, selected, tools)
+        names: dict[str, list[str]] = {}
+        for function in selected:
+            names.setdefault(function.plugin_name, []).append(function.name)
+        plugins = {
+            plugin_name: KernelPlugin(
+                name=plugin_name,
+                description=plugin.description,
+                functions=[plugin[name] for name in names[plugin_name]],
+            )
+            for plugin_name, plugin in self.kernel.plugins.items()
+            if plugin_name in names
+        }
+        plugins.update(
+            {name: plugin for name, plugin in self.kernel.plugins.items() if name in excluded_plugins}
+        )
+        return self.kernel.model_copy(update={"plugins": plugins})
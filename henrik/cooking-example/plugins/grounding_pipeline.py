@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import re
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from reference_index import entities_block, reference_index
+
+if TYPE_CHECKING:
+    from batch_extraction import BatchEntityExtractor
+    from reference_retrieval import ReferenceRetriever
+    from semantic_kernel.functions.kernel_function import KernelFunction
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_workers = {"extract": 4, "check": 4, "excise": 2}
+no_entities = {"", "none", "n/a", "nothing"}
+
+_done = object()     # Tells a stage worker that no more items will come
+
+
+class GroundingTask(NamedTuple):
+    """A summary to check against the text it summarizes."""
+
+    id: Any
+    summary: str
+    reference_context: str
+
+
+class GroundingResult(NamedTuple):
+    """
+    The outcome of grounding a summary.
+
+    id -- The id of the task
+    summary -- The summary as given
+    entities -- The entities extracted from the summary (the output of ExtractEntities)
+    ungrounded_entities -- The entities not found in the reference context
+    grounded_summary -- The summary without the ungrounded entities; the summary itself if all are grounded
+    error -- The error of the stage that failed, if any
+    """
+
+    id: Any
+    summary: str
+    entities: str = ""
+    ungrounded_entities: list[str] = []
+    grounded_summary: str = ""
+    error: str | None = None
+
+
+def parse_entities(text: str, tag: str, required: bool = False) -> list[str]:
+    """
+    The bulleted items between <tag> and </tag> in a model response.
+
+    If the tag is missing, the items of the whole response, or a ValueError if the tag is `required`: the responses
+    of ReferenceCheckEntities list every entity before the ungrounded ones, so without the tag all would be read
+    as ungrounded.
+    """
+    match = re.search(rf"<{tag}>(.*?)(?:</{tag}>|$)", text, re.DOTALL)
+    if match is None and required:
+        raise ValueError(f"No <{tag}> in the response")
+    body = match.group(1) if match else text
+    entities = []
+    for line in body.splitlines():
+        line = line.strip()
+        if not line.startswith(("-", "*")):
+            continue
+        entity = line.lstrip("-* ").strip()
+        if entity.lower() not in no_entities:
+            entities.append(entity)
+    return entities
+
+
+class StageMetrics:
+    """Counters of a pipeline stage."""
+
+    def __init__(self, name: str, workers: int) -> None:
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.max_queue_length = 0
+        self._first_start: float | None = None
+        self._last_end: float | None = None
+
+    def record(self, start: float, end: float, failed: bool) -> None:
+        self.items += 1
+        self.failed += failed
+        self.busy_seconds += end - start
+        self._first_start = start if self._first_start is None else min(self._first_start, start)
+        self._last_end = end if self._last_end is None else max(self._last_end, end)
+
+    @property
+    def stats(self) -> dict[str, float]:
+        active = (self._last_end - self._first_start) if self.items else 0.0
+        return {
+            "items": self.items,
+            "failed": self.failed,
+            "workers": self.workers,
+            "throughput_per_second": self.items / active if active else 0.0,
+            "mean_seconds": self.busy_seconds / self.items if self.items else 0.0,
+            "utilization": self.busy_seconds / (active * self.workers) if active else 0.0,
+            "max_queue_length": self.max_queue_length,
+        }
+
+
+class GroundingPipeline:
+    """
+    Description: Grounds many summaries with the GroundingPlugin, as a pipeline of concurrent stages.
+
+    Every stage (ExtractEntities, ReferenceCheckEntities, ExciseEntities) is a pool of workers reading from a
+    bounded queue, so the entities of the next summaries are extracted while earlier ones are reference-checked
+    and excised. When a stage falls behind, its queue fills up and the stages before it wait (backpressure), so
+    at most a few summaries per stage are in flight however many are submitted. Entities that appear in the
+    reference text are grounded locally (see ReferenceIndex), so only the others are sent to the reference check,
+    and summaries whose entities are all grounded skip the excision stage. With a ReferenceRetriever, the reference
+    check gets only the chunks of the reference text relevant to those entities instead of all of it. With a
+    BatchEntityExtractor, the extract stage takes batches of summaries and extracts their entities in one request.
+
+    Usage:
+        pipeline = GroundingPipeline(kernel, entity_extraction, reference_check, entity_excision)
+        results = await pipeline.run(GroundingTask(id, summary, grounding_text) for id, summary in summaries)
+        print(pipeline.stats)
+    """
+
+    def __init__(
+        self,
+        kernel: "Kernel",
+        extract_function: "KernelFunction",
+        reference_check_function: "KernelFunction",
+        excise_function: "KernelFunction",
+        topic: str = "people and places",
+        example_entities: str = "John, Jane, mother, brother, Paris, Rome",
+        workers: dict[str, int] | None = None,
+        queue_size: int | None = None,
+        prefilter: bool = True,
+        retriever: "ReferenceRetriever | None" = None,
+        extractor: "BatchEntityExtractor | None" = None,
+    ) -> None:
+        """
+        Args:
+            kernel -- The kernel to invoke the functions with
+            extract_function -- GroundingPlugin.ExtractEntities
+            reference_check_function -- GroundingPlugin.ReferenceCheckEntities
+            excise_function -- GroundingPlugin.ExciseEntities
+            topic -- The topic of the entities to extract
+            example_entities -- Example entities of the topic
+            workers -- The number of workers of the "extract", "check" and "excise" stages
+            queue_size -- The capacity of the queue in front of every stage; defaults to twice its workers
+            prefilter -- Whether to ground the entities that appear in the reference text locally (see ReferenceIndex)
+                         and only send the others to ReferenceCheckEntities
+            retriever -- Passes the chunks of the reference text relevant to the entities to check, instead of all of it
+            extractor -- Extracts the entities of batches of summaries (its batches are items of the extract stage)
+        """
+        self.kernel = kernel
+        self.extract_function = extract_function
+        self.reference_check_function = reference_check_function
+        self.excise_function = excise_function
+        self.topic = topic
+        self.example_entities = example_entities
+        self.workers = {**default_workers, **(workers or {})}
+        self.queue_size = queue_size
+        self.prefilter = prefilter
+        self.retriever = retriever
+        self.extractor = extractor
+        self.entities = 0
+        self.grounded_locally = 0
+        self.skipped_checks = 0
+        self.skipped_excisions = 0
+        self.metrics = {name: StageMetrics(name, count) for name, count in self.workers.items()}
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            **{name: metrics.stats for name, metrics in self.metrics.items()},
+            "entities": self.entities,
+            "grounded_locally": self.grounded_locally,
+            "skipped_checks": self.skipped_checks,
+            "skipped_excisions": self.skipped_excisions,
+        }
+
+    def _queue(self, stage: str) -> asyncio.Queue:
+        return asyncio.Queue(maxsize=self.queue_size or 2 * self.workers[stage])
+
+    async def _run_stage(
+        self,
+        stage: str,
+        inbox: asyncio.Queue,
+        process: Callable[[int, Any], Awaitable[list[tuple[int, Any]]]],
+        fail: Callable[[int, str], None],
+        outbox: asyncio.Queue | None,
+    ) -> None:
+        """
+        Process the items of a queue with the stage's workers until every worker got the end marker.
+
+        `process` returns the items for the next stage; they are put in `outbox` after the item's time is recorded,
+        so time waiting for the next stage (backpressure) does not count as work.
+        """
+        metrics = self.metrics[stage]
+
+        async def worker() -> None:
+            while True:
+                item = await inbox.get()
+                if item is _done:
+                    return
+                metrics.max_queue_length = max(metrics.max_queue_length, inbox.qsize() + 1)
+                position, value = item
+                start = time.perf_counter()
+                failed = False
+                forward: list[tuple[int, Any]] = []
+                try:
+                    forward = await process(position, value)
+                except Exception as exc:
+                    logger.warning(f"{stage} failed for item {position}: {exc}")
+                    failed = True
+                    fail(position, f"{stage}: {exc}")
+                metrics.record(start, time.perf_counter(), failed)
+                for next_item in forward:
+                    await outbox.put(next_item)
+
+        await asyncio.gather(*(worker() for _ in range(self.workers[stage])))
+
+    async def run(
+        self,
+        tasks: Iterable[GroundingTask],
+        on_result: Callable[[GroundingResult], None] | None = None,
+    ) -> list[GroundingResult]:
+        """Ground summaries; returns the results in the order of the tasks, `on_result` gets each as it completes."""
+        tasks = list(tasks)
+        results = [GroundingResult(id=task.id, summary=task.summary) for task in tasks]
+        extract_queue, check_queue, excise_queue = self._queue("extract"), self._queue("check"), self._queue("excise")
+
+        def complete(position: int, **values: Any) -> None:
+            results[position] = results[position]._replace(**values)
+            if on_result is not None:
+                on_result(results[position])
+
+        def fail(position: int, error: str) -> None:
+            complete(position, error=error)
+
+        async def extract(position: int, task: GroundingTask) -> list[tuple[int, Any]]:
+            entities = await self.kernel.invoke(
+                self.extract_function, input=task.summary, topic=self.topic, example_entities=self.example_entities
+            )
+            results[position] = results[position]._replace(entities=str(entities))
+            return [(position, task)]
+
+        async def extract_batch(first_position: int, batch: list[tuple[int, GroundingTask]]) -> list[tuple[int, Any]]:
+            extracted = await self.extractor.extract_batch([task.summary for _, task in batch])
+            forward = []
+            for (position, task), entities in zip(batch, extracted):
+                if isinstance(entities, Exception):
+                    fail(position, f"extract: {entities}")
+                    continue
+                results[position] = results[position]._replace(entities=entities)
+                forward.append((position, task))
+            return forward
+
+        async def check(position: int, task: GroundingTask) -> list[tuple[int, Any]]:
+            check_input = results[position].entities
+            if self.prefilter:
+                entities = parse_entities(check_input, "entities")
+                grounded, unresolved = reference_index(task.reference_context).split(entities)
+                self.entities += len(entities)
+                self.grounded_locally += len(grounded)
+                if not unresolved:
+                    self.skipped_checks += 1
+                    self.skipped_excisions += 1
+                    complete(position, grounded_summary=task.summary)
+                    return []
+                check_input = entities_block(unresolved)
+
+            reference_context = task.reference_context
+            if self.retriever is not None:
+                reference_context = await self.retriever.context(
+                    reference_context, parse_entities(check_input, "entities")
+                )
+            check_result = str(
+                await self.kernel.invoke(
+                    self.reference_check_function,
+                    input=check_input,
+                    reference_context=reference_context,
+                )
+            )
+            # A response cut off before its list fails the check rather than excising every entity
+            ungrounded = parse_entities(check_result, "ungrounded_entities", required=True)
+            if not ungrounded:
+                self.skipped_excisions += 1
+                complete(position, grounded_summary=task.summary)
+                return []
+            results[position] = results[position]._replace(ungrounded_entities=ungrounded)
+            return [(position, (task, check_result))]
+
+        async def excise(position: int, value: tuple[GroundingTask, str]) -> list[tuple[int, Any]]:
+            task, check_result = value
+            excised = await self.kernel.invoke(
+                self.excise_function, input=task.summary, ungrounded_entities=check_result
+            )
+            complete(position, grounded_summary=str(excised).strip())
+            return []
+
+        async def feed() -> None:
+            if self.extractor is None:
+                for position, task in enumerate(tasks):
+                    await extract_queue.put((position, task))
+            else:
+                for batch in self.extractor.plan_batches([task.summary for task in tasks]):
+                    await extract_queue.put((batch[0], [(position, tasks[position]) for position in batch]))
+            await self._finish(extract_queue, "extract")
+
+        async def stage(
+            name: str, inbox: asyncio.Queue, process: Callable, outbox: asyncio.Queue | None, next_stage: str
+        ) -> None:
+            await self._run_stage(name, inbox, process, fail, outbox)
+            if outbox is not None:
+                await self._finish(outbox, next_stage)
+
+        await asyncio.gather(
+            feed(),
+            stage("extract", extract_queue, extract_batch if self.extractor else extract, check_queue, "check"),
+            stage("check", check_queue, check, excise_queue, "excise"),
+            stage("excise", excise_queue, excise, None, ""),
+        )
+        return results
+
+    async def _finish(self, queue: asyncio.Queue, stage: str) -> None:
+        """Tell every worker of a stage that its queue is complete."""
+        for _ in range(self.workers[stage]):
+            await queue.put(_done)
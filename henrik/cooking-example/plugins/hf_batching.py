@@ -0,0 +1,188 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+from pydantic import PrivateAttr
+from semantic_kernel.connectors.ai.text_completion_client_base import TextCompletionClientBase
+from semantic_kernel.contents.streaming_text_content import StreamingTextContent
+from semantic_kernel.contents.text_content import TextContent
+from semantic_kernel.exceptions import ServiceResponseException
+
+if TYPE_CHECKING:
+    from semantic_kernel.connectors.ai.hugging_face import (
+        HuggingFacePromptExecutionSettings,
+        HuggingFaceTextCompletion,
+    )
+    from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+
+# Definitions
+default_max_batch_size = 8
+default_max_wait_seconds = 0.02
+
+
+class BatchedHuggingFaceTextCompletion(TextCompletionClientBase):
+    """
+    Description: Runs concurrent requests to a Hugging Face text completion service as batched generate calls.
+
+    HuggingFaceTextCompletion runs its pipeline on the calling thread, one prompt at a time, so concurrent requests
+    wait for each other and block the event loop. Here requests are queued by their settings; a queue is run as one
+    batch (padded, in one `generate` call of the pipeline) when it holds `max_batch_size` prompts or `max_wait_seconds`
+    after its first one arrived, and every caller gets the results of its own prompt. Batches run one at a time in a
+    worker thread, so requests arriving while the model is busy make up the next batch. Streaming requests are
+    passed to the service unbatched.
+
+    Usage:
+        hf_text_service = BatchedHuggingFaceTextCompletion(
+            HuggingFaceTextCompletion(service_id="hf_text", ai_model_id="distilgpt2", task="text-generation")
+        )
+        results = await asyncio.gather(*(hf_text_service.get_text_contents(prompt, settings) for prompt in prompts))
+    """
+
+    inner: Any
+    max_batch_size: int = default_max_batch_size
+    max_wait_seconds: float = default_max_wait_seconds
+
+    _pending: dict[str, list[tuple[str, asyncio.Future]]] = PrivateAttr(default_factory=dict)
+    _pending_settings: dict[str, Any] = PrivateAttr(default_factory=dict)
+    _timers: dict[str, asyncio.TimerHandle] = PrivateAttr(default_factory=dict)
+    _executor: ThreadPoolExecutor | None = PrivateAttr(default=None)
+    _running: set[asyncio.Task] = PrivateAttr(default_factory=set)
+    _requests: int = PrivateAttr(default=0)
+    _batches: int = PrivateAttr(default=0)
+    _max_batch: int = PrivateAttr(default=0)
+    _busy_seconds: float = PrivateAttr(default=0.0)
+
+    def __init__(
+        self,
+        inner: "HuggingFaceTextCompletion",
+        max_batch_size: int = default_max_batch_size,
+        max_wait_seconds: float = default_max_wait_seconds,
+        service_id: str | None = None,
+    ) -> None:
+        """
+        Args:
+            inner -- The Hugging Face text completion service, whose pipeline runs the batches
+            max_batch_size -- The maximum number of prompts per batch
+            max_wait_seconds -- How long the first request of a batch waits for others
+            service_id -- The service id, defaults to the id of the wrapped service
+        """
+        super().__init__(
+            ai_model_id=inner.ai_model_id,
+            service_id=service_id or inner.service_id,
+            inner=inner,
+            max_batch_size=max_batch_size,
+            max_wait_seconds=max_wait_seconds,
+        )
+        tokenizer = inner.generator.tokenizer
+        if tokenizer.pad_token_id is None:
+            # Models without a padding token (GPT-2) pad with the end of text token
+            tokenizer.pad_token_id = inner.generator.model.config.eos_token_id
+        if inner.task == "text-generation":
+            # Decoder-only models continue after the last token of every row, so the padding goes in front
+            tokenizer.padding_side = "left"
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hf-generate")
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "requests": self._requests,
+            "batches": self._batches,
+            "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+            "max_batch_size": self._max_batch,
+            "busy_seconds": self._busy_seconds,
+        }
+
+    def get_prompt_execution_settings_class(self) -> "PromptExecutionSettings":
+        return self.inner.get_prompt_execution_settings_class()
+
+    async def get_text_contents(
+        self, prompt: str, settings: "HuggingFacePromptExecutionSettings"
+    ) -> list[TextContent]:
+        loop = asyncio.get_running_loop()
+        key = settings.model_dump_json(exclude={"service_id"})
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((prompt, future))
+        self._pending_settings[key] = settings
+        self._requests += 1
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_wait_seconds, self._flush, key)
+        return await future
+
+    def _flush(self, key: str) -> None:
+        """Start the batch of the requests queued with the same settings."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        settings = self._pending_settings.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch, settings))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: list[tuple[str, asyncio.Future]], settings: Any) -> None:
+        self._batches += 1
+        self._max_batch = max(self._max_batch, len(batch))
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            outputs = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._generate, prompts, settings
+            )
+        except Exception as exc:
+            error = ServiceResponseException("Hugging Face completion failed", exc)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), output in zip(batch, outputs):
+            if not future.done():
+                future.set_result(output)
+
+    def _generate(self, prompts: list[str], settings: Any) -> list[list[TextContent]]:
+        """Run one batch through the pipeline (in the worker thread); the results of every prompt, in order."""
+        start = time.perf_counter()
+        try:
+            outputs = self.inner.generator(prompts, batch_size=len(prompts), **settings.prepare_settings_dict())
+        finally:
+            self._busy_seconds += time.perf_counter() - start
+        results = []
+        for output in outputs:
+            candidates = output if isinstance(output, list) else [output]
+            results.append([self.inner._create_text_content(output, candidate) for candidate in candidates])
+        return results
+
+    async def get_streaming_text_contents(
+        self, prompt: str, settings: "HuggingFacePromptExecutionSettings"
+    ) -> AsyncGenerator[list[StreamingTextContent], Any]:
+        async for contents in self.inner.get_streaming_text_contents(prompt, settings):
+            yield contents
+
+
+async def benchmark_batching(
+    service: BatchedHuggingFaceTextCompletion, prompts: list[str], settings: "HuggingFacePromptExecutionSettings"
+) -> dict[str, dict[str, float]]:
+    """
+    Compare the throughput of concurrent requests to the Hugging Face service one prompt at a time and batched.
+
+    Returns:
+        The wall seconds and requests per second of the "single" and "batched" modes
+    """
+    report = {}
+    requests_before, batches_before = service.stats["requests"], service.stats["batches"]
+    for name, requester in (("single", service.inner), ("batched", service)):
+        start = time.perf_counter()
+        await asyncio.gather(*(requester.get_text_contents(prompt, settings) for prompt in prompts))
+        seconds = time.perf_counter() - start
+        report[name] = {
+            "requests": len(prompts),
+            "seconds": seconds,
+            "requests_per_second": len(prompts) / seconds if seconds else 0.0,
+        }
+    batches = service.stats["batches"] - batches_before
+    report["batched"]["mean_batch_size"] = (service.stats["requests"] - requests_before) / batches if batches else 0.0
+    return report
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from numpy import ndarray
+from pydantic import PrivateAttr
+from semantic_kernel.connectors.ai.embeddings.embedding_generator_base import EmbeddingGeneratorBase
+from semantic_kernel.exceptions import ServiceResponseException
+
+if TYPE_CHECKING:
+    from semantic_kernel.connectors.ai.hugging_face import HuggingFaceTextEmbedding
+
+# Definitions
+default_max_batch_size = 64
+default_max_wait_seconds = 0.005
+
+
+def set_torch_threads(threads: int) -> None:
+    """Limit the threads torch computes with; the setting is process-wide, for every model of the process."""
+    import torch
+
+    torch.set_num_threads(threads)
+
+
+class ThreadedHuggingFaceTextEmbedding(EmbeddingGeneratorBase):
+    """
+    Description: Runs a Hugging Face embedding model in a worker thread, batching concurrent requests.
+
+    HuggingFaceTextEmbedding encodes on the event loop thread, so every other coroutine (e.g. concurrent `recall`
+    lookups) waits for each forward pass. Here the texts of the requests that arrive within `max_wait_seconds`
+    of each other (with the same arguments) are encoded together, in one `encode` call in a dedicated worker thread,
+    up to `max_batch_size` texts per call. The model returns one float32 matrix per call; every request gets its
+    rows as a (read-only) view of it, without converting or copying them. A CachedTextEmbedding in front passes
+    the view on when none of a request's texts was cached, and stacks a new matrix otherwise.
+
+    Usage:
+        embedding_svc = ThreadedHuggingFaceTextEmbedding(
+            HuggingFaceTextEmbedding(service_id=embed_service_id, ai_model_id=embed_service_id), torch_threads=4
+        )
+        memory = SemanticTextMemory(storage=NumpyMemoryStore(), embeddings_generator=embedding_svc)
+    """
+
+    inner: Any
+    max_batch_size: int = default_max_batch_size
+    max_wait_seconds: float = default_max_wait_seconds
+    torch_threads: int | None = None
+
+    _pending: dict[str, list[tuple[list[str], asyncio.Future]]] = PrivateAttr(default_factory=dict)
+    _pending_texts: dict[str, int] = PrivateAttr(default_factory=dict)
+    _timers: dict[str, asyncio.TimerHandle] = PrivateAttr(default_factory=dict)
+    _executor: ThreadPoolExecutor | None = PrivateAttr(default=None)
+    _running: set[asyncio.Task] = PrivateAttr(default_factory=set)
+    _requests: int = PrivateAttr(default=0)
+    _texts: int = PrivateAttr(default=0)
+    _batches: int = PrivateAttr(default=0)
+    _busy_seconds: float = PrivateAttr(default=0.0)
+
+    def __init__(
+        self,
+        inner: "HuggingFaceTextEmbedding",
+        max_batch_size: int = default_max_batch_size,
+        max_wait_seconds: float = default_max_wait_seconds,
+        torch_threads: int | None = None,
+        service_id: str | None = None,
+    ) -> None:
+        """
+        Args:
+            inner -- The Hugging Face embedding service, whose model encodes the batches
+            max_batch_size -- The maximum number of texts per encode call (a larger request is encoded alone)
+            max_wait_seconds -- How long the first request of a batch waits for others
+            torch_threads -- The number of threads torch computes with, set for the whole process when the wrapper is
+                             created; None keeps torch's setting (by default, all cores)
+            service_id -- The service id, defaults to the id of the wrapped service
+        """
+        super().__init__(
+            ai_model_id=inner.ai_model_id,
+            service_id=service_id or inner.service_id,
+            inner=inner,
+            max_batch_size=max_batch_size,
+            max_wait_seconds=max_wait_seconds,
+            torch_threads=torch_threads,
+        )
+        if torch_threads:
+            set_torch_threads(torch_threads)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hf-embed")
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "requests": self._requests,
+            "texts": self._texts,
+            "batches": self._batches,
+            "mean_batch_texts": self._texts / self._batches if self._batches else 0.0,
+            "busy_seconds": self._busy_seconds,
+        }
+
+    async def generate_embeddings(self, texts: list[str], **kwargs: Any) -> ndarray:
+        loop = asyncio.get_running_loop()
+        key = json.dumps(kwargs, sort_keys=True, default=str)
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((texts, future))
+        self._pending_texts[key] = self._pending_texts.get(key, 0) + len(texts)
+        self._requests += 1
+        if self._pending_texts[key] >= self.max_batch_size:
+            self._flush(key, kwargs)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_wait_seconds, self._flush, key, kwargs)
+        return await future
+
+    def _flush(self, key: str, kwargs: dict[str, Any]) -> None:
+        """Start encoding the texts of the requests queued with the same arguments."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        self._pending_texts.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch, kwargs))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: list[tuple[list[str], asyncio.Future]], kwargs: dict[str, Any]) -> None:
+        self._batches += 1
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        self._texts += len(texts)
+        try:
+            embeddings = await asyncio.get_running_loop().run_in_executor(self._executor, self._encode, texts, kwargs)
+        except Exception as exc:
+            error = ServiceResponseException("Hugging Face embeddings failed", exc)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        start = 0
+        for request_texts, future in batch:
+            end = start + len(request_texts)
+            if not future.done():
+                future.set_result(embeddings[start:end])
+            start = end
+
+    def _encode(self, texts: list[str], kwargs: dict[str, Any]) -> ndarray:
+        """Encode texts in the worker thread; one float32 matrix, a row per text."""
+        start = time.perf_counter()
+        try:
+            embeddings = self.inner.generator.encode(
+                texts, **{"batch_size": self.max_batch_size, "convert_to_numpy": True, **kwargs}
+            )
+        finally:
+            self._busy_seconds += time.perf_counter() - start
+        # sentence-transformers already returns float32; only other types are converted
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        # Shared by all the requests of the batch, as views
+        embeddings.setflags(write=False)
+        return embeddings
@@ -0,0 +1,166 @@
+import time
+
+import numpy as np
+from numpy import ndarray
+from semantic_kernel.kernel_pydantic import KernelBaseModel
+
+
+class IVFOptions(KernelBaseModel):
+    """
+    Settings of the approximate (IVF) index of a memory collection.
+
+    n_lists -- The number of k-means clusters; 0 picks ~4*sqrt(size) when the index is trained
+    n_probe -- The number of clusters scanned per query; higher is slower but has better recall
+    min_train_size -- Collections smaller than this are searched exactly
+    retrain_growth -- Retrain the clusters once the collection has grown by this factor since the last training
+    kmeans_iterations -- The number of k-means iterations per training
+    training_sample_size -- The maximum number of vectors used to train the clusters
+    """
+
+    n_lists: int = 0
+    n_probe: int = 8
+    min_train_size: int = 4096
+    retrain_growth: float = 4.0
+    kmeans_iterations: int = 10
+    training_sample_size: int = 65536
+
+
+class IVFIndex:
+    """
+    An inverted-file index over the rows of a pre-normalized embedding matrix.
+
+    Every row is assigned to its nearest cluster centroid. A query only scores the rows of its `n_probe`
+    nearest clusters, so the cost of a search is a fraction of an exact scan. Rows added after training are
+    assigned incrementally; `train` (re)builds the clusters from the current rows.
+    """
+
+    def __init__(self, options: IVFOptions | None = None, seed: int = 0) -> None:
+        self.options = options or IVFOptions()
+        self.centroids: ndarray | None = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _reserve(self, size: int) -> None:
+        if size > len(self.assignments):
+            assignments = np.full(max(size, 2 * len(self.assignments)), -1, dtype=np.int32)
+            assignments[: len(self.assignments)] = self.assignments
+            self.assignments = assignments
+
+    def _assign(self, vectors: ndarray) -> ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train(self, matrix: ndarray, size: int) -> None:
+        """(Re)build the clusters with spherical k-means over the first `size` rows and reassign every row."""
+        if size == 0:
+            self.centroids = None
+            return
+        n_lists = self.options.n_lists or int(4 * np.sqrt(size))
+        n_lists = max(1, min(n_lists, size))
+        sample = matrix[:size]
+        if size > self.options.training_sample_size:
+            sample = sample[self._rng.choice(size, self.options.training_sample_size, replace=False)]
+
+        centroids = sample[self._rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.options.kmeans_iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=n_lists)
+            # Re-seed empty clusters with random vectors
+            empty = counts == 0
+            sums[empty] = sample[self._rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1)
+            centroids = sums / np.where(norms == 0, 1, norms)[:, None]
+
+        self.centroids = centroids.astype(np.float32)
+        self._reserve(size)
+        self.assignments[:size] = self._assign(matrix[:size])
+        self.trained_size = size
+
+    def add(self, matrix: ndarray, size: int, rows: list[int]) -> None:
+        """Index new or replaced rows, training (or retraining) the clusters when the collection has grown enough."""
+        if self.is_trained and size < self.trained_size * self.options.retrain_growth:
+            self._reserve(size)
+            rows = np.asarray(rows, dtype=np.int64)
+            self.assignments[rows] = self._assign(matrix[rows])
+        elif size >= self.options.min_train_size:
+            self.train(matrix, size)
+
+    def move(self, source: int, destination: int) -> None:
+        """Follow a row that was moved by the collection's compaction."""
+        if self.is_trained:
+            self.assignments[destination] = self.assignments[source]
+            self.assignments[source] = -1
+
+    def candidates(self, query: ndarray, size: int) -> ndarray | None:
+        """The rows in the `n_probe` clusters nearest to a normalized query, or None for an exact search."""
+        if not self.is_trained or size < self.options.min_train_size:
+            return None
+        centroid_scores = self.centroids @ query
+        n_probe = min(self.options.n_probe, len(centroid_scores))
+        probed = np.zeros(len(centroid_scores) + 1, dtype=bool)
+        probed[np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]] = True
+        # Unassigned rows (-1) map to the last, never probed, slot
+        return np.flatnonzero(probed[self.assignments[:size]])
+
+
+## Benchmark
+def benchmark_ivf(
+    size: int = 100_000,
+    dimension: int = 384,
+    query_count: int = 100,
+    k: int = 5,
+    settings: list[tuple[int, int]] | None = None,
+    seed: int = 0,
+) -> list[dict[str, float]]:
+    """
+    Measure recall@k and latency of IVF search against exact search on a synthetic clustered corpus.
+    Args:
+        size -- The number of vectors in the collection
+        dimension -- The embedding dimension
+        query_count -- The number of queries
+        k -- The number of neighbours per query
+        settings -- The (n_lists, n_probe) pairs to try
+    Returns:
+        One row per setting with n_lists, n_probe, recall and milliseconds per query
+    """
+    rng = np.random.default_rng(seed)
+    settings = settings or [(0, 1), (0, 4), (0, 8), (0, 16), (0, 32)]
+
+    # Clustered data, like embeddings of documents about a handful of topics
+    topics = rng.standard_normal((256, dimension)).astype(np.float32)
+    matrix = topics[rng.integers(0, len(topics), size)] + 0.5 * rng.standard_normal((size, dimension)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1)[:, None]
+    queries = matrix[rng.choice(size, query_count, replace=False)] + 0.1 * rng.standard_normal(
+        (query_count, dimension)
+    ).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1)[:, None]
+
+    start = time.perf_counter()
+    exact = [set(np.argpartition(-(matrix @ query), k - 1)[:k].tolist()) for query in queries]
+    exact_ms = 1000 * (time.perf_counter() - start) / query_count
+    print(f"Exact search: {exact_ms:.2f} ms/query")
+
+    results = []
+    for n_lists, n_probe in settings:
+        index = IVFIndex(IVFOptions(n_lists=n_lists, n_probe=n_probe, min_train_size=0), seed=seed)
+        index.train(matrix, size)
+        hits = 0
+        start = time.perf_counter()
+        for query, expected in zip(queries, exact):
+            rows = index.candidates(query, size)
+            if len(rows) == 0:
+                continue
+            scores = matrix[rows] @ query
+            top = rows[np.argpartition(-scores, min(k, len(rows)) - 1)[:k]]
+            hits += len(expected.intersection(top.tolist()))
+        milliseconds = 1000 * (time.perf_counter() - start) / query_count
+        recall = hits / (k * query_count)
+        print(f"IVF n_lists={len(index.centroids)} n_probe={n_probe}: recall@{k}={recall:.3f}, {milliseconds:.2f} ms/query")
+        results.append({"n_lists": len(index.centroids), "n_probe": n_probe, "recall": recall, "ms_per_query": milliseconds})
+    return results
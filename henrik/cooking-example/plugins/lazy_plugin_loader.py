@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+from typing import Any
+
+from pydantic import PrivateAttr
+from semantic_kernel.filters.functions.function_invocation_context import FunctionInvocationContext
+from semantic_kernel.functions import KernelPlugin
+from semantic_kernel.functions.kernel_function import KernelFunction
+from semantic_kernel.functions.kernel_function_from_prompt import PROMPT_RETURN_PARAM, KernelFunctionFromPrompt
+from semantic_kernel.functions.kernel_function_metadata import KernelFunctionMetadata
+from semantic_kernel.functions.kernel_parameter_metadata import KernelParameterMetadata
+
+from compiled_prompt_template import config_file_name, load_compiled_function, prompt_file_name
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+manifest_file_name = ".plugin-manifest.json"
+manifest_version = 2
+
+
+class LazyKernelFunction(KernelFunction):
+    """
+    A prompt function that is known from the plugin manifest only, until it is invoked.
+
+    The metadata (name, description, parameters) is all the kernel and the planners need to list the
+    function; its template and execution settings are read from `path` on first use.
+    """
+
+    path: str
+
+    _function: KernelFunctionFromPrompt | None = PrivateAttr(default=None)
+
+    @property
+    def function(self) -> KernelFunctionFromPrompt:
+        """The materialized prompt function."""
+        if self._function is None:
+            logger.debug(f"Materializing {self.fully_qualified_name} from {self.path}")
+            self._function = load_compiled_function(self.path, self.plugin_name)
+        return self._function
+
+    @property
+    def prompt_template(self):
+        return self.function.prompt_template
+
+    @property
+    def prompt_execution_settings(self):
+        return self.function.prompt_execution_settings
+
+    async def _invoke_internal(self, context: FunctionInvocationContext) -> None:
+        await self.function._invoke_internal(context)
+
+    async def _invoke_internal_stream(self, context: FunctionInvocationContext) -> None:
+        await self.function._invoke_internal_stream(context)
+
+
+def file_mtimes(path: str) -> dict[str, int] | None:
+    """The modification times of a function directory's files, or None if it is not a prompt function."""
+    try:
+        return {name: os.stat(os.path.join(path, name)).st_mtime_ns for name in (prompt_file_name, config_file_name)}
+    except FileNotFoundError:
+        return None
+
+
+def describe_function(path: str, plugin_name: str) -> dict[str, Any]:
+    """Build the manifest entry of a prompt function directory (this reads and parses its files)."""
+    function = load_compiled_function(path, plugin_name)
+    return {
+        "description": function.description,
+        "parameters": [
+            parameter.model_dump(exclude={"type_object"}, exclude_none=True) for parameter in function.parameters
+        ],
+        "additional_properties": function.metadata.additional_properties,
+    }
+
+
+class LazyPluginLoader:
+    """
+    Description: Lists the prompt plugins of a directory from a manifest and loads their functions on first invoke.
+
+    The manifest (`.plugin-manifest.json` in the plugins directory) holds the name, description and parameters
+    of every prompt function, with the modification times of its skprompt.txt and config.json. Creating the
+    loader only stats those files; functions whose files changed (or are new) are re-read and the manifest is
+    rewritten.
+
+    Usage:
+        plugin_loader = LazyPluginLoader(plugins_directory)
+        cooking_plugin = kernel.add_plugin(plugin_loader.plugin("Cooking"))
+    """
+
+    def __init__(self, plugins_directory: str, manifest_path: str | None = None) -> None:
+        self.plugins_directory = os.path.abspath(plugins_directory)
+        self.manifest_path = manifest_path or os.path.join(self.plugins_directory, manifest_file_name)
+        self.plugins: dict[str, dict[str, dict[str, Any]]] = {}
+        self.refreshed: list[str] = []
+        self._scan()
+
+    def _read_manifest(self) -> dict[str, dict[str, dict[str, Any]]]:
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return manifest.get("plugins", {}) if manifest.get("version") == manifest_version else {}
+
+    def _write_manifest(self) -> None:
+        temporary = self.manifest_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"version": manifest_version, "plugins": self.plugins}, f, indent=1)
+        os.replace(temporary, self.manifest_path)
+
+    def _scan(self) -> None:
+        previous = self._read_manifest()
+        for plugin_name in sorted(os.listdir(self.plugins_directory)):
+            plugin_directory = os.path.join(self.plugins_directory, plugin_name)
+            if plugin_name.startswith(("__", ".")) or not os.path.isdir(plugin_directory):
+                continue
+            functions = {}
+            for function_name in sorted(os.listdir(plugin_directory)):
+                path = os.path.join(plugin_directory, function_name)
+                mtimes = file_mtimes(path) if os.path.isdir(path) else None
+                if mtimes is None:
+                    continue
+                entry = previous.get(plugin_name, {}).get(function_name)
+                if entry is None or entry["mtimes"] != mtimes:
+                    try:
+                        entry = {**describe_function(path, plugin_name), "mtimes": mtimes}
+                    except Exception as exc:
+                        logger.warning(f"Failed to create function from directory: {path}: {exc}")
+                        continue
+                    self.refreshed.append(f"{plugin_name}.{function_name}")
+                functions[function_name] = entry
+            if functions:
+                self.plugins[plugin_name] = functions
+
+        if self.plugins != previous:
+            self._write_manifest()
+
+    def plugin(self, plugin_name: str, description: str | None = None) -> KernelPlugin:
+        """A plugin whose functions are materialized on first invoke; add it with `kernel.add_plugin(plugin)`."""
+        if plugin_name not in self.plugins:
+            raise KeyError(f"No prompt functions found for plugin '{plugin_name}' in {self.plugins_directory}")
+        functions = [
+            LazyKernelFunction(
+                metadata=KernelFunctionMetadata(
+                    name=function_name,
+                    plugin_name=plugin_name,
+                    description=entry["description"],
+                    parameters=[KernelParameterMetadata(**parameter) for parameter in entry["parameters"]],
+                    is_prompt=True,
+                    return_parameter=PROMPT_RETURN_PARAM,
+                    additional_properties=entry["additional_properties"],
+                ),
+                path=os.path.join(self.plugins_directory, plugin_name, function_name),
+            )
+            for function_name, entry in self.plugins[plugin_name].items()
+        ]
+        return KernelPlugin(name=plugin_name, description=description, functions=functions)
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Callable, Iterable
+from typing import Annotated, Any, NamedTuple
+
+from pydantic import PrivateAttr
+from semantic_kernel.core_plugins import TextMemoryPlugin
+from semantic_kernel.core_plugins.text_memory_plugin import DEFAULT_COLLECTION, DEFAULT_LIMIT, DEFAULT_RELEVANCE
+from semantic_kernel.functions.kernel_function_decorator import kernel_function
+from semantic_kernel.memory.memory_query_result import MemoryQueryResult
+from semantic_kernel.memory.memory_record import MemoryRecord
+from semantic_kernel.memory.semantic_text_memory import SemanticTextMemory
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_batch_size = 64
+default_max_concurrency = 4
+default_recall_wait_seconds = 0.005
+
+
+class MemoryInput(NamedTuple):
+    """
+    A record to be saved to memory.
+
+    Records with an external_source_name are saved as references (like `save_reference`, where id is the
+    external id), all others as local information (like `save_information`).
+    """
+
+    id: str
+    text: str
+    description: str | None = None
+    external_source_name: str | None = None
+    additional_metadata: str | None = None
+
+
+def chunk(items: list[Any], size: int) -> list[list[Any]]:
+    """Split a list into consecutive chunks of at most `size` items."""
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def to_memory_record(record: MemoryInput, embedding: Any) -> MemoryRecord:
+    """Build a local or reference MemoryRecord from a MemoryInput."""
+    if record.external_source_name:
+        return MemoryRecord.reference_record(
+            external_id=record.id,
+            source_name=record.external_source_name,
+            description=record.description,
+            additional_metadata=record.additional_metadata,
+            embedding=embedding,
+        )
+    return MemoryRecord.local_record(
+        id=record.id,
+        text=record.text,
+        description=record.description,
+        additional_metadata=record.additional_metadata,
+        embedding=embedding,
+    )
+
+
+class BatchSemanticTextMemory(SemanticTextMemory):
+    """
+    Description: SemanticTextMemory with bulk ingestion.
+
+    Usage:
+        memory = BatchSemanticTextMemory(storage=VolatileMemoryStore(), embeddings_generator=embedding_gen)
+        await memory.save_batch(collection="generic", records=[MemoryInput(id="info1", text="...")])
+        results = await memory.search_batch(collection="generic", queries=["budget by year", "investments"])
+    """
+
+    async def save_batch(
+        self,
+        collection: str,
+        records: Iterable[MemoryInput],
+        batch_size: int = default_batch_size,
+        max_concurrency: int = default_max_concurrency,
+        embeddings_kwargs: dict[str, Any] | None = None,
+        skip_existing: bool = False,
+    ) -> list[str]:
+        """
+        Embed and save many records at once.
+
+        The texts are embedded in batches of `batch_size` (one embedding request or forward pass per batch),
+        with at most `max_concurrency` batches in flight, and all records are upserted in a single call.
+        Args:
+            collection -- The collection to save the records to
+            records -- The records to save
+            batch_size -- The number of texts per embedding request
+            max_concurrency -- The maximum number of embedding requests running at the same time
+            embeddings_kwargs -- Additional arguments for the embeddings generator
+            skip_existing -- Do not re-embed records whose id is already in the collection (e.g. in a persistent store)
+        Returns:
+            The keys of the saved records
+        """
+        records = list(records)
+        if not records:
+            return []
+        if not await self._storage.does_collection_exist(collection_name=collection):
+            await self._storage.create_collection(collection_name=collection)
+        elif skip_existing:
+            existing = await self._storage.get_batch(
+                collection_name=collection, keys=[record.id for record in records], with_embeddings=False
+            )
+            existing_ids = {record._id for record in existing}
+            records = [record for record in records if record.id not in existing_ids]
+            if not records:
+                return []
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def embed(batch: list[MemoryInput]) -> list[MemoryRecord]:
+            async with semaphore:
+                embeddings = await self._embeddings_generator.generate_embeddings(
+                    [record.text for record in batch], **(embeddings_kwargs or {})
+                )
+            return [to_memory_record(record, embedding) for record, embedding in zip(batch, embeddings)]
+
+        batches = await asyncio.gather(*(embed(batch) for batch in chunk(records, batch_size)))
+        memory_records = [memory_record for batch in batches for memory_record in batch]
+        return await self._storage.upsert_batch(collection_name=collection, records=memory_records)
+
+    async def search_batch(
+        self,
+        collection: str,
+        queries: list[str],
+        limit: int = 1,
+        min_relevance_score: float = 0.0,
+        with_embeddings: bool = False,
+        embeddings_kwargs: dict[str, Any] | None = None,
+    ) -> list[list[MemoryQueryResult]]:
+        """
+        Search the memory for several queries at once.
+
+        All queries are embedded in one request; stores with a `get_nearest_matches_batch` method (such as
+        NumpyMemoryStore) then score them with a single matrix product, others are searched concurrently.
+        Returns:
+            One list of results per query, in the order of `queries`
+        """
+        if not queries:
+            return []
+        query_embeddings = await self._embeddings_generator.generate_embeddings(queries, **(embeddings_kwargs or {}))
+        if hasattr(self._storage, "get_nearest_matches_batch"):
+            matches = await self._storage.get_nearest_matches_batch(
+                collection_name=collection,
+                embeddings=query_embeddings,
+                limit=limit,
+                min_relevance_score=min_relevance_score,
+                with_embeddings=with_embeddings,
+            )
+        else:
+            matches = await asyncio.gather(
+                *(
+                    self._storage.get_nearest_matches(
+                        collection_name=collection,
+                        embedding=query_embedding,
+                        limit=limit,
+                        min_relevance_score=min_relevance_score,
+                        with_embeddings=with_embeddings,
+                    )
+                    for query_embedding in query_embeddings
+                )
+            )
+        return [[MemoryQueryResult.from_memory_record(record, score) for record, score in match] for match in matches]
+
+
+class BatchTextMemoryPlugin(TextMemoryPlugin):
+    """
+    Description: TextMemoryPlugin whose concurrent `recall` calls are answered by one `search_batch`.
+
+    With ParallelKernelPromptTemplate, the `{{recall ...}}` blocks of a prompt run concurrently. Every call is
+    queued by its collection, relevance and limit; a queue is searched with one `search_batch` (one embedding
+    request, and one matrix product on a NumpyMemoryStore) `max_wait_seconds` after its first call arrived, and
+    every call gets the results of its own ask, as TextMemoryPlugin would return them.
+
+    Usage:
+        memory = BatchSemanticTextMemory(storage=NumpyMemoryStore(), embeddings_generator=embedding_gen)
+        kernel.add_plugin(BatchTextMemoryPlugin(memory), "TextMemoryPlugin")
+    """
+
+    memory: BatchSemanticTextMemory
+    max_wait_seconds: float = default_recall_wait_seconds
+
+    _pending: dict[tuple[str, float, int], list[tuple[str, asyncio.Future]]] = PrivateAttr(default_factory=dict)
+    _running: set[asyncio.Task] = PrivateAttr(default_factory=set)
+    _recalls: int = PrivateAttr(default=0)
+    _batches: int = PrivateAttr(default=0)
+
+    def __init__(
+        self,
+        memory: BatchSemanticTextMemory,
+        embeddings_kwargs: dict[str, Any] = {},
+        max_wait_seconds: float = default_recall_wait_seconds,
+    ) -> None:
+        """
+        Args:
+            memory -- The memory to search
+            embeddings_kwargs -- Additional arguments for the embeddings generator
+            max_wait_seconds -- How long the first call of a batch waits for others
+        """
+        super().__init__(memory=memory, embeddings_kwargs=embeddings_kwargs)
+        self.max_wait_seconds = max_wait_seconds
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "recalls": self._recalls,
+            "batches": self._batches,
+            "mean_batch_size": self._recalls / self._batches if self._batches else 0.0,
+        }
+
+    @kernel_function(
+        description="Recall a fact from the long term memory",
+        name="recall",
+    )
+    async def recall(
+        self,
+        ask: Annotated[str, "The information to retrieve"],
+        collection: Annotated[str, "The collection to search for information."] = DEFAULT_COLLECTION,
+        relevance: Annotated[
+            float, "The relevance score, from 0.0 to 1.0; 1.0 means perfect match"
+        ] = DEFAULT_RELEVANCE,
+        limit: Annotated[int, "The maximum number of relevant memories to recall."] = DEFAULT_LIMIT,
+    ) -> str:
+        loop = asyncio.get_running_loop()
+        key = (collection, float(relevance), int(limit))
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((ask, future))
+        self._recalls += 1
+        if len(pending) == 1:
+            loop.call_later(self.max_wait_seconds, self._flush, key)
+        results = await future
+        if not results:
+            logger.warning(f"Memory not found in collection: {collection}")
+            return ""
+        return results[0].text if limit == 1 else json.dumps([result.text for result in results])
+
+    def _flush(self, key: tuple[str, float, int]) -> None:
+        """Start searching the asks queued with the same collection, relevance and limit."""
+        batch = self._pending.pop(key, [])
+        if batch:
+            task = asyncio.ensure_future(self._search(batch, *key))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _search(
+        self, batch: list[tuple[str, asyncio.Future]], collection: str, relevance: float, limit: int
+    ) -> None:
+        self._batches += 1
+        try:
+            matches = await self.memory.search_batch(
+                collection=collection,
+                queries=[ask for ask, _ in batch],
+                limit=limit,
+                min_relevance_score=relevance,
+                embeddings_kwargs=self.embeddings_kwargs,
+            )
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), results in zip(batch, matches):
+            if not future.done():
+                future.set_result(results)
+
+
+## Benchmark
+async def benchmark_ingestion(
+    create_memory: Callable[[], BatchSemanticTextMemory],
+    records: list[MemoryInput],
+    batch_size: int = default_batch_size,
+    max_concurrency: int = default_max_concurrency,
+) -> dict[str, float]:
+    """
+    Compare the per-record save loop with save_batch, each on a fresh memory.
+
+    Returns the throughput (records per second) of both modes.
+    """
+    memory = create_memory()
+    start = time.perf_counter()
+    for record in records:
+        if record.external_source_name:
+            await memory.save_reference(
+                collection="benchmark",
+                text=record.text,
+                external_id=record.id,
+                external_source_name=record.external_source_name,
+                description=record.description,
+                additional_metadata=record.additional_metadata,
+            )
+        else:
+            await memory.save_information(
+                collection="benchmark",
+                text=record.text,
+                id=record.id,
+                description=record.description,
+                additional_metadata=record.additional_metadata,
+            )
+    per_record_seconds = time.perf_counter() - start
+
+    memory = create_memory()
+    start = time.perf_counter()
+    await memory.save_batch(
+        collection="benchmark", records=records, batch_size=batch_size, max_concurrency=max_concurrency
+    )
+    batch_seconds = time.perf_counter() - start
+
+    result = {
+        "per_record_records_per_second": len(records) / per_record_seconds,
+        "batch_records_per_second": len(records) / batch_seconds,
+    }
+    print(f"Per-record: {len(records)} records in {per_record_seconds:.2f}s ({result['per_record_records_per_second']:.1f}/s)")
+    print(f"Batched:    {len(records)} records in {batch_seconds:.2f}s ({result['batch_records_per_second']:.1f}/s)")
+    print(f"Speedup:    {per_record_seconds / batch_seconds:.1f}x")
+    return result
@@ -0,0 +1,332 @@
+import logging
+from copy import copy
+
+import numpy as np
+from numpy import ndarray
+from semantic_kernel.exceptions import ServiceResourceNotFoundError
+from semantic_kernel.memory.memory_record import MemoryRecord
+from semantic_kernel.memory.memory_store_base import MemoryStoreBase
+
+from ivf_index import IVFIndex, IVFOptions
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+initial_capacity = 16
+growth_factor = 2
+
+
+def normalize_rows(vectors: ndarray) -> tuple[ndarray, ndarray]:
+    """Scale each row to unit length (zero rows stay zero); returns the float32 rows and their original norms."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1)
+    return vectors / np.where(norms == 0, 1, norms)[:, None], norms
+
+
+class NumpyCollection:
+    """
+    The records of one collection, with their embeddings in a contiguous, pre-normalized float32 matrix.
+
+    Row i of the matrix belongs to records[i]. The matrix grows geometrically on insert and is kept
+    compact on delete by moving the last row into the freed slot, so the first `size` rows are always live.
+    With `ann_options`, searches of large collections go through an approximate IVF index instead.
+    """
+
+    def __init__(self, ann_options: IVFOptions | None = None) -> None:
+        self.matrix: ndarray | None = None
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.records: list[MemoryRecord] = []
+        self.rows: dict[str, int] = {}
+        self.index = IVFIndex(ann_options) if ann_options else None
+
+    @property
+    def size(self) -> int:
+        return len(self.records)
+
+    @property
+    def dimension(self) -> int | None:
+        return None if self.matrix is None else self.matrix.shape[1]
+
+    def _reserve(self, size: int, dimension: int) -> None:
+        if self.matrix is None:
+            capacity = max(initial_capacity, size)
+            self.matrix = np.zeros((capacity, dimension), dtype=np.float32)
+            self.norms = np.zeros(capacity, dtype=np.float32)
+            return
+        if dimension != self.dimension:
+            raise ValueError(f"Embedding dimension {dimension} does not match collection dimension {self.dimension}")
+        capacity = self.matrix.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= growth_factor
+        matrix = np.zeros((capacity, dimension), dtype=np.float32)
+        matrix[: self.size] = self.matrix[: self.size]
+        norms = np.zeros(capacity, dtype=np.float32)
+        norms[: self.size] = self.norms[: self.size]
+        self.matrix, self.norms = matrix, norms
+
+    def upsert(self, records: list[MemoryRecord]) -> list[str]:
+        """Insert or replace records, normalizing all new embeddings in one pass."""
+        if not records:
+            return []
+        embeddings, norms = normalize_rows(
+            np.asarray([record._embedding for record in records], dtype=np.float32).reshape(len(records), -1)
+        )
+
+        new_keys = {record._id for record in records if record._id not in self.rows}
+        self._reserve(self.size + len(new_keys), embeddings.shape[1])
+        touched = []
+        for record, embedding, norm in zip(records, embeddings, norms):
+            record._key = record._id
+            # The matrix owns the embedding; it is rebuilt on demand in `get_record`
+            stored = copy(record)
+            stored._embedding = None
+            row = self.rows.get(record._key)
+            if row is None:
+                row = self.size
+                self.rows[record._key] = row
+                self.records.append(stored)
+            else:
+                self.records[row] = stored
+            self.matrix[row] = embedding
+            self.norms[row] = norm
+            touched.append(row)
+        if self.index:
+            self.index.add(self.matrix, self.size, touched)
+        return [record._key for record in records]
+
+    def remove(self, key: str) -> None:
+        """Remove a record, moving the last row into its slot to keep the matrix compact."""
+        row = self.rows.pop(key)
+        last = self.size - 1
+        if row != last:
+            moved = self.records[last]
+            self.records[row] = moved
+            self.matrix[row] = self.matrix[last]
+            self.norms[row] = self.norms[last]
+            self.rows[moved._key] = row
+            if self.index:
+                self.index.move(last, row)
+        self.records.pop()
+        self.matrix[last] = 0
+        self.norms[last] = 0
+
+    def compact(self) -> None:
+        """Release unused capacity and rebuild the approximate index (if any) from the current rows."""
+        if self.matrix is not None:
+            capacity = max(initial_capacity, self.size)
+            self.matrix = self.matrix[:capacity].copy()
+            self.norms = self.norms[:capacity].copy()
+        if self.index and self.size >= self.index.options.min_train_size:
+            self.index.train(self.matrix, self.size)
+
+    def get_record(self, row: int, with_embedding: bool) -> MemoryRecord:
+        """Get a copy of the record in `row`, with its original (de-normalized) embedding if requested."""
+        record = copy(self.records[row])
+        if with_embedding:
+            record._embedding = self.matrix[row] * self.norms[row]
+        return record
+
+    def search(
+        self, queries: ndarray, limit: int, min_relevance_score: float
+    ) -> list[list[tuple[int, float]]]:
+        """The (row, cosine similarity) of the best matches of each (m, d) query, best first."""
+        queries, query_norms = normalize_rows(np.asarray(queries).reshape(-1, self.dimension))
+        # Zero vectors have no defined similarity, score them like VolatileMemoryStore does
+        invalid = self.norms[: self.size] == 0
+        dead = self.dead_rows()
+
+        results: list[list[tuple[int, float]]] = []
+        exact_scores = None
+        for i, query in enumerate(queries):
+            rows = self.index.candidates(query, self.size) if self.index else None
+            if rows is None:
+                if exact_scores is None:
+                    # One matrix product for every query that needs an exact search
+                    exact_scores = queries @ self.matrix[: self.size].T
+                    exact_scores[:, invalid] = -1.0
+                scores = exact_scores[i]
+            else:
+                scores = self.matrix[rows] @ query
+                scores[invalid[rows]] = -1.0
+            if query_norms[i] == 0:
+                scores = np.full_like(scores, -1.0)
+            if dead is not None:
+                scores[dead if rows is None else dead[rows]] = -np.inf
+            matches = self.top_k(scores, limit, min_relevance_score)
+            if rows is not None:
+                matches = [(int(rows[position]), score) for position, score in matches]
+            results.append(matches)
+        return results
+
+    def dead_rows(self) -> ndarray | None:
+        """A mask of rows that hold no live record and must never match (this collection keeps none)."""
+        return None
+
+    def top_k(self, scores: ndarray, limit: int, min_relevance_score: float) -> list[tuple[int, float]]:
+        """The rows of the `limit` best scores above the threshold, best first."""
+        if limit <= 0 or scores.size == 0:
+            return []
+        if limit < scores.size:
+            candidates = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            candidates = np.arange(scores.size)
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(row), float(scores[row])) for row in candidates if scores[row] >= min_relevance_score]
+
+
+class NumpyMemoryStore(MemoryStoreBase):
+    """
+    Description: A drop-in, vectorized replacement for VolatileMemoryStore.
+
+    Each collection keeps its embeddings in one float32 matrix, so a search is a single matrix-vector
+    product plus an `argpartition` top-k instead of a record-by-record scan. Large collections can
+    use an approximate IVF index instead, configured for all collections with `ann_options` or per
+    collection with `set_ann_options`.
+
+    Usage:
+        memory = SemanticTextMemory(storage=NumpyMemoryStore(), embeddings_generator=embedding_gen)
+        memory = SemanticTextMemory(storage=NumpyMemoryStore(ann_options=IVFOptions(n_probe=16)), ...)
+    """
+
+    def __init__(self, ann_options: IVFOptions | None = None) -> None:
+        self._collections: dict[str, NumpyCollection] = {}
+        self._ann_options = ann_options
+        self._collection_ann_options: dict[str, IVFOptions | None] = {}
+
+    def _get_collection(self, collection_name: str) -> NumpyCollection:
+        if collection_name not in self._collections:
+            raise ServiceResourceNotFoundError(f"Collection '{collection_name}' does not exist")
+        return self._collections[collection_name]
+
+    def set_ann_options(self, collection_name: str, ann_options: IVFOptions | None) -> None:
+        """
+        Use an approximate index with these settings for one collection (None for exact search).
+
+        Takes effect when the collection is created, or immediately (with a rebuild) if it already exists.
+        """
+        self._collection_ann_options[collection_name] = ann_options
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            collection.index = IVFIndex(ann_options) if ann_options else None
+            collection.compact()
+
+    async def rebuild_index(self, collection_name: str) -> None:
+        """Compact a collection and retrain its approximate index, e.g. after many deletes."""
+        self._get_collection(collection_name).compact()
+
+    async def create_collection(self, collection_name: str) -> None:
+        if collection_name not in self._collections:
+            ann_options = self._collection_ann_options.get(collection_name, self._ann_options)
+            self._collections[collection_name] = self._new_collection(collection_name, ann_options)
+
+    def _new_collection(self, collection_name: str, ann_options: IVFOptions | None) -> NumpyCollection:
+        return NumpyCollection(ann_options)
+
+    async def get_collections(self) -> list[str]:
+        return list(self._collections.keys())
+
+    async def delete_collection(self, collection_name: str) -> None:
+        self._collections.pop(collection_name, None)
+
+    async def does_collection_exist(self, collection_name: str) -> bool:
+        return collection_name in self._collections
+
+    async def upsert(self, collection_name: str, record: MemoryRecord) -> str:
+        return self._get_collection(collection_name).upsert([record])[0]
+
+    async def upsert_batch(self, collection_name: str, records: list[MemoryRecord]) -> list[str]:
+        return self._get_collection(collection_name).upsert(records)
+
+    async def get(self, collection_name: str, key: str, with_embedding: bool = False) -> MemoryRecord:
+        collection = self._get_collection(collection_name)
+        if key not in collection.rows:
+            raise ServiceResourceNotFoundError(f"Key '{key}' not found in collection '{collection_name}'")
+        return collection.get_record(collection.rows[key], with_embedding)
+
+    async def get_batch(
+        self, collection_name: str, keys: list[str], with_embeddings: bool = False
+    ) -> list[MemoryRecord]:
+        collection = self._get_collection(collection_name)
+        return [collection.get_record(collection.rows[key], with_embeddings) for key in keys if key in collection.rows]
+
+    async def remove(self, collection_name: str, key: str) -> None:
+        collection = self._get_collection(collection_name)
+        if key not in collection.rows:
+            raise ServiceResourceNotFoundError(f"Key '{key}' not found in collection '{collection_name}'")
+        collection.remove(key)
+
+    async def remove_batch(self, collection_name: str, keys: list[str]) -> None:
+        collection = self._get_collection(collection_name)
+        for key in keys:
+            if key in collection.rows:
+                collection.remove(key)
+
+    async def get_nearest_match(
+        self,
+        collection_name: str,
+        embedding: ndarray,
+        min_relevance_score: float = 0.0,
+        with_embedding: bool = False,
+    ) -> tuple[MemoryRecord, float] | None:
+        matches = await self.get_nearest_matches(
+            collection_name=collection_name,
+            embedding=embedding,
+            limit=1,
+            min_relevance_score=min_relevance_score,
+            with_embeddings=with_embedding,
+        )
+        return matches[0] if matches else None
+
+    async def get_nearest_matches(
+        self,
+        collection_name: str,
+        embedding: ndarray,
+        limit: int,
+        min_relevance_score: float = 0.0,
+        with_embeddings: bool = False,
+    ) -> list[tuple[MemoryRecord, float]]:
+        results = await self.get_nearest_matches_batch(
+            collection_name=collection_name,
+            embeddings=np.asarray(embedding).reshape(1, -1),
+            limit=limit,
+            min_relevance_score=min_relevance_score,
+            with_embeddings=with_embeddings,
+        )
+        return results[0]
+
+    async def get_nearest_matches_batch(
+        self,
+        collection_name: str,
+        embeddings: ndarray,
+        limit: int,
+        min_relevance_score: float = 0.0,
+        with_embeddings: bool = False,
+    ) -> list[list[tuple[MemoryRecord, float]]]:
+        """
+        Get the nearest matches for several query embeddings with one matrix-matrix product.
+        Args:
+            collection_name -- The collection to search
+            embeddings -- The (number of queries, dimension) query embeddings
+            limit -- The maximum number of matches per query
+            min_relevance_score -- The minimum cosine similarity of a match
+            with_embeddings -- Whether to include the embeddings in the matched records
+        Returns:
+            One list of (record, score) tuples per query, best match first
+        """
+        embeddings = np.asarray(embeddings)
+        if collection_name not in self._collections:
+            logger.warning(
+                f"Collection '{collection_name}' does not exist in collections: "
+                f"{', '.join(await self.get_collections())}"
+            )
+            return [[] for _ in range(len(embeddings))]
+        collection = self._collections[collection_name]
+        if collection.size == 0:
+            return [[] for _ in range(len(embeddings))]
+
+        return [
+            [(collection.get_record(row, with_embeddings), score) for row, score in matches]
+            for matches in collection.search(embeddings, limit, min_relevance_score)
+        ]
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from html import escape
+from typing import TYPE_CHECKING
+
+from semantic_kernel.exceptions import TemplateRenderException
+from semantic_kernel.functions.kernel_arguments import KernelArguments
+from semantic_kernel.prompt_template import PromptTemplateConfig
+from semantic_kernel.prompt_template.kernel_prompt_template import KernelPromptTemplate
+from semantic_kernel.template_engine.blocks.block import Block
+from semantic_kernel.template_engine.protocols.code_renderer import CodeRenderer
+from semantic_kernel.template_engine.protocols.text_renderer import TextRenderer
+
+if TYPE_CHECKING:
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_max_concurrency = 8
+
+
+class ParallelKernelPromptTemplate(KernelPromptTemplate):
+    """
+    Description: A semantic-kernel prompt template that runs its function-call blocks concurrently.
+
+    Function calls in a template (e.g. `{{recall 'investments'}}` or `{{GenerateNames.generate_names}}`) only
+    read the kernel arguments, so they do not depend on each other. They are all started up front, with at
+    most `max_concurrency` running at the same time, and their results are spliced back in template order.
+    Text and variable blocks are rendered as usual.
+
+    Usage:
+        kernel.add_function(
+            function_name="chat_with_memory",
+            plugin_name="chat",
+            prompt_template=ParallelKernelPromptTemplate(prompt_template_config=prompt_template_config),
+        )
+    """
+
+    max_concurrency: int = default_max_concurrency
+
+    async def render_code_blocks(
+        self, blocks: list[CodeRenderer], kernel: "Kernel", arguments: "KernelArguments"
+    ) -> list[str]:
+        """Run the function calls concurrently and return their (escaped) output in the order of `blocks`."""
+        allow_unsafe_function_output = self._get_allow_dangerously_set_function_output()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def render_code(block: CodeRenderer) -> str:
+            async with semaphore:
+                try:
+                    rendered = await block.render_code(kernel, arguments)
+                except Exception as exc:
+                    logger.error(f"Error rendering code block: {exc}")
+                    raise TemplateRenderException(f"Error rendering code block: {exc}") from exc
+            return rendered if allow_unsafe_function_output else escape(rendered)
+
+        tasks = [asyncio.ensure_future(render_code(block)) for block in blocks]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # Do not leave the other calls running once the prompt cannot be rendered
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def render_blocks(self, blocks: list[Block], kernel: "Kernel", arguments: "KernelArguments") -> str:
+        logger.debug(f"Rendering list of {len(blocks)} blocks")
+        arguments = self._get_trusted_arguments(arguments)
+        rendered_blocks: list[str | None] = [None] * len(blocks)
+        code_positions = []
+        for position, block in enumerate(blocks):
+            if isinstance(block, TextRenderer):
+                rendered_blocks[position] = block.render(kernel, arguments)
+            elif isinstance(block, CodeRenderer):
+                code_positions.append(position)
+
+        if code_positions:
+            results = await self.render_code_blocks([blocks[i] for i in code_positions], kernel, arguments)
+            for position, rendered in zip(code_positions, results):
+                rendered_blocks[position] = rendered
+
+        prompt = "".join(rendered for rendered in rendered_blocks if rendered is not None)
+        logger.debug(f"Rendered prompt: {prompt}")
+        return prompt
+
+
+## Benchmark
+async def benchmark_render(
+    kernel: "Kernel",
+    block_counts: list[int] | None = None,
+    function_name: str = "recall",
+    max_concurrency: int = default_max_concurrency,
+) -> list[dict[str, float]]:
+    """
+    Compare the render latency of the sequential and the parallel template for prompts with N function calls.
+
+    The kernel needs a plugin providing `function_name` (e.g. TextMemoryPlugin for `recall`). Every call gets a
+    distinct argument, and the two templates get different ones, so embedding caches do not favour either.
+    Returns:
+        One row per block count with the sequential and the parallel render time in milliseconds
+    """
+    results = []
+    for count in block_counts or [1, 3, 5, 10]:
+        timings = {}
+        for mode, template_class in (("sequential", KernelPromptTemplate), ("parallel", ParallelKernelPromptTemplate)):
+            template = "\n".join(f"- {{{{{function_name} 'benchmark {mode} query {i}'}}}}" for i in range(count))
+            config = PromptTemplateConfig(template=template)
+            if template_class is ParallelKernelPromptTemplate:
+                prompt_template = template_class(prompt_template_config=config, max_concurrency=max_concurrency)
+            else:
+                prompt_template = template_class(prompt_template_config=config)
+            start = time.perf_counter()
+            await prompt_template.render(kernel, KernelArguments())
+            timings[mode] = 1000 * (time.perf_counter() - start)
+        print(
+            f"{count} {function_name} blocks: sequential {timings['sequential']:.0f} ms, "
+            f"parallel {timings['parallel']:.0f} ms ({timings['sequential'] / timings['parallel']:.1f}x)"
+        )
+        results.append({"blocks": count, "sequential_ms": timings["sequential"], "parallel_ms": timings["parallel"]})
+    return results
@@ -0,0 +1,308 @@
+import json
+import logging
+import os
+import shutil
+from copy import copy
+from datetime import datetime
+
+import numpy as np
+from numpy import ndarray
+from semantic_kernel.memory.memory_record import MemoryRecord
+
+from ivf_index import IVFIndex, IVFOptions
+from numpy_memory_store import NumpyCollection, NumpyMemoryStore, normalize_rows
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_compaction_ratio = 0.5      # compact once this share of the rows on disk is dead
+default_compaction_min_rows = 1024
+
+
+class MappedCollection(NumpyCollection):
+    """
+    A collection stored in a directory, with its embeddings memory-mapped from disk.
+
+    Files (gen is the generation, bumped by every compaction):
+        collection.json     -- {"dimension": ..., "generation": ...}, replaced atomically
+        embeddings.<gen>.f32 -- the normalized float32 embeddings, one row per write, append-only
+        index.<gen>.jsonl    -- append-only log of upserts (metadata + row + norm) and removes
+
+    Replacing or removing a record only appends to the log and leaves a dead row behind; dead rows are
+    skipped in searches and dropped by `compact`, which rewrites both files into a new generation.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ann_options: IVFOptions | None = None,
+        compaction_ratio: float = default_compaction_ratio,
+        compaction_min_rows: int = default_compaction_min_rows,
+    ) -> None:
+        super().__init__(ann_options)
+        self.directory = directory
+        self.compaction_ratio = compaction_ratio
+        self.compaction_min_rows = compaction_min_rows
+        self.generation = 0
+        self._dimension: int | None = None
+        self.records: list[MemoryRecord | None] = []
+        self.dead = np.zeros(0, dtype=bool)
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def dimension(self) -> int | None:
+        return self._dimension
+
+    @property
+    def live_count(self) -> int:
+        return len(self.rows)
+
+    def _path(self, name: str, generation: int | None = None) -> str:
+        if name == "collection.json":
+            return os.path.join(self.directory, name)
+        stem, extension = name.split(".")
+        return os.path.join(self.directory, f"{stem}.{self.generation if generation is None else generation}.{extension}")
+
+    def _write_header(self) -> None:
+        temporary = self._path("collection.json") + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"dimension": self._dimension, "generation": self.generation}, f)
+        os.replace(temporary, self._path("collection.json"))
+
+    def _map(self) -> None:
+        """(Re)map the embeddings file; mapping is lazy, so this is cheap even for large collections."""
+        path = self._path("embeddings.f32")
+        file_rows = os.path.getsize(path) // (4 * self._dimension) if self._dimension and os.path.exists(path) else 0
+        self.matrix = (
+            np.memmap(path, dtype=np.float32, mode="r", shape=(file_rows, self._dimension)) if file_rows else None
+        )
+
+    def _repair_embeddings(self) -> None:
+        """Cut the embeddings file back to its last complete row, left by an interrupted write."""
+        path = self._path("embeddings.f32")
+        if self._dimension and os.path.exists(path):
+            size = os.path.getsize(path)
+            partial = size % (4 * self._dimension)
+            if partial:
+                # The next append would start mid-row, and its rows be read at the wrong offset
+                logger.warning(f"Dropping a partial row at the end of {path}")
+                os.truncate(path, size - partial)
+
+    def _load(self) -> None:
+        if os.path.exists(self._path("collection.json")):
+            with open(self._path("collection.json")) as f:
+                header = json.load(f)
+            self._dimension = header["dimension"]
+            self.generation = header["generation"]
+        self._repair_embeddings()
+        self._map()
+        file_rows = 0 if self.matrix is None else self.matrix.shape[0]
+        self.records = [None] * file_rows
+        self.norms = np.zeros(file_rows, dtype=np.float32)
+        self.dead = np.ones(file_rows, dtype=bool)
+
+        if os.path.exists(self._path("index.jsonl")):
+            complete = 0
+            with open(self._path("index.jsonl"), "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    complete += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping a torn entry in {self._path('index.jsonl')}")
+                        continue
+                    if entry["op"] == "remove":
+                        self._forget(entry["key"])
+                    elif entry["row"] < file_rows:
+                        self._forget(entry["key"])
+                        self._place(entry["row"], entry_to_record(entry), entry["norm"])
+            if complete < os.path.getsize(self._path("index.jsonl")):
+                # An interrupted append; the next entry would be glued to it and skipped as torn
+                logger.warning(f"Dropping a torn entry at the end of {self._path('index.jsonl')}")
+                os.truncate(self._path("index.jsonl"), complete)
+
+        if self.index and self.live_count >= self.index.options.min_train_size:
+            self.index.train(self.matrix, self.size)
+
+    def _forget(self, key: str) -> None:
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.records[row] = None
+            self.dead[row] = True
+
+    def _place(self, row: int, record: MemoryRecord, norm: float) -> None:
+        self.rows[record._key] = row
+        self.records[row] = record
+        self.norms[row] = norm
+        self.dead[row] = False
+
+    def upsert(self, records: list[MemoryRecord]) -> list[str]:
+        """Append the records' embeddings and metadata; replaced records leave a dead row behind."""
+        if not records:
+            return []
+        embeddings, norms = normalize_rows(
+            np.asarray([record._embedding for record in records], dtype=np.float32).reshape(len(records), -1)
+        )
+        if self._dimension is None:
+            self._dimension = embeddings.shape[1]
+            self._write_header()
+        elif embeddings.shape[1] != self._dimension:
+            raise ValueError(
+                f"Embedding dimension {embeddings.shape[1]} does not match collection dimension {self._dimension}"
+            )
+
+        # Embeddings first: log entries pointing past the end of the file are ignored on load
+        start = self.size
+        with open(self._path("embeddings.f32"), "ab") as f:
+            f.write(embeddings.tobytes())
+        self.records.extend([None] * len(records))
+        self.norms = np.concatenate([self.norms, norms.astype(np.float32)])
+        self.dead = np.concatenate([self.dead, np.ones(len(records), dtype=bool)])
+
+        lines = []
+        for row, (record, norm) in enumerate(zip(records, norms), start=start):
+            record._key = record._id
+            stored = copy(record)
+            stored._embedding = None
+            self._forget(record._key)
+            self._place(row, stored, float(norm))
+            lines.append(json.dumps(record_to_entry(stored, row, float(norm))) + "\n")
+        with open(self._path("index.jsonl"), "a") as f:
+            f.writelines(lines)
+
+        self._map()
+        if self.index:
+            self.index.add(self.matrix, self.size, list(range(start, self.size)))
+        self._maybe_compact()
+        return [record._key for record in records]
+
+    def remove(self, key: str) -> None:
+        self._forget(key)
+        with open(self._path("index.jsonl"), "a") as f:
+            f.write(json.dumps({"op": "remove", "key": key}) + "\n")
+        self._maybe_compact()
+
+    def dead_rows(self) -> ndarray:
+        return self.dead
+
+    def _maybe_compact(self) -> None:
+        dead_count = self.size - self.live_count
+        if self.size >= self.compaction_min_rows and dead_count > self.compaction_ratio * self.size:
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the live rows into a new generation of files and drop the old one."""
+        previous = self.generation
+        live_rows = sorted(self.rows.values())
+        self.generation += 1
+        with open(self._path("embeddings.f32"), "wb") as f:
+            if live_rows:
+                f.write(np.ascontiguousarray(self.matrix[live_rows]).tobytes())
+        records = [self.records[row] for row in live_rows]
+        norms = self.norms[live_rows]
+        with open(self._path("index.jsonl"), "w") as f:
+            f.writelines(
+                json.dumps(record_to_entry(record, row, float(norm))) + "\n"
+                for row, (record, norm) in enumerate(zip(records, norms))
+            )
+        # Switching the header is the commit point of the compaction
+        self._write_header()
+
+        self.matrix = None
+        for name in ("embeddings.f32", "index.jsonl"):
+            path = self._path(name, previous)
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.rows = {}
+        self.records = [None] * len(records)
+        self.norms = np.zeros(len(records), dtype=np.float32)
+        self.dead = np.ones(len(records), dtype=bool)
+        for row, (record, norm) in enumerate(zip(records, norms)):
+            self._place(row, record, float(norm))
+        self._map()
+        if self.index and self.live_count >= self.index.options.min_train_size:
+            self.index.train(self.matrix, self.size)
+
+
+def record_to_entry(record: MemoryRecord, row: int, norm: float) -> dict:
+    return {
+        "op": "upsert",
+        "key": record._key,
+        "row": row,
+        "norm": norm,
+        "id": record._id,
+        "is_reference": record._is_reference,
+        "external_source_name": record._external_source_name,
+        "description": record._description,
+        "text": record._text,
+        "additional_metadata": record._additional_metadata,
+        "timestamp": record._timestamp.isoformat() if record._timestamp else None,
+    }
+
+
+def entry_to_record(entry: dict) -> MemoryRecord:
+    return MemoryRecord(
+        is_reference=entry["is_reference"],
+        external_source_name=entry["external_source_name"],
+        id=entry["id"],
+        description=entry["description"],
+        text=entry["text"],
+        additional_metadata=entry["additional_metadata"],
+        embedding=None,
+        key=entry["key"],
+        timestamp=datetime.fromisoformat(entry["timestamp"]) if entry["timestamp"] else None,
+    )
+
+
+class PersistentMemoryStore(NumpyMemoryStore):
+    """
+    Description: A local, file-backed memory store that survives restarts.
+
+    Every collection is a sub-directory of `directory` (see MappedCollection). Existing collections are
+    memory-mapped when the store is created, so a restart does not need to re-embed anything.
+
+    Usage:
+        memory = SemanticTextMemory(storage=PersistentMemoryStore("memory-store"), embeddings_generator=embedding_gen)
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ann_options: IVFOptions | None = None,
+        compaction_ratio: float = default_compaction_ratio,
+        compaction_min_rows: int = default_compaction_min_rows,
+    ) -> None:
+        super().__init__(ann_options)
+        self._directory = directory
+        self._compaction_ratio = compaction_ratio
+        self._compaction_min_rows = compaction_min_rows
+        os.makedirs(directory, exist_ok=True)
+        for collection_name in sorted(os.listdir(directory)):
+            if os.path.isdir(os.path.join(directory, collection_name)):
+                self._collections[collection_name] = self._new_collection(collection_name, ann_options)
+
+    def _new_collection(self, collection_name: str, ann_options: IVFOptions | None) -> MappedCollection:
+        if os.sep in collection_name or collection_name in ("", ".", ".."):
+            raise ValueError(f"Invalid collection name '{collection_name}'")
+        return MappedCollection(
+            os.path.join(self._directory, collection_name),
+            ann_options,
+            compaction_ratio=self._compaction_ratio,
+            compaction_min_rows=self._compaction_min_rows,
+        )
+
+    def set_ann_options(self, collection_name: str, ann_options: IVFOptions | None) -> None:
+        self._collection_ann_options[collection_name] = ann_options
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            collection.index = IVFIndex(ann_options) if ann_options else None
+            if collection.index and collection.live_count >= collection.index.options.min_train_size:
+                collection.index.train(collection.matrix, collection.size)
+
+    async def delete_collection(self, collection_name: str) -> None:
+        if self._collections.pop(collection_name, None) is not None:
+            shutil.rmtree(os.path.join(self._directory, collection_name), ignore_errors=True)
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from semantic_kernel.const import METADATA_EXCEPTION_KEY
+from semantic_kernel.exceptions import PlannerCreatePlanError, PlannerException, PlannerInvalidGoalError
+from semantic_kernel.functions.function_result import FunctionResult
+from semantic_kernel.planners import SequentialPlanner
+from semantic_kernel.planners.plan import Plan
+from semantic_kernel.planners.sequential_planner.sequential_planner_config import SequentialPlannerConfig
+from semantic_kernel.planners.sequential_planner.sequential_planner_extensions import (
+    SequentialPlannerFunctionExtension,
+    SequentialPlannerKernelExtension,
+)
+from semantic_kernel.planners.sequential_planner.sequential_planner_parser import SequentialPlanParser
+
+from embedding_cache import normalize_text
+
+if TYPE_CHECKING:
+    from semantic_kernel.connectors.ai.embeddings.embedding_generator_base import EmbeddingGeneratorBase
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+plan_cache_version = 1
+default_max_entries = 256
+default_min_similarity = 0.95
+
+
+def normalize_goal(goal: str) -> str:
+    """Lowercase a goal and normalize its whitespace and trailing punctuation."""
+    return normalize_text(goal).lower().rstrip(".!?")
+
+
+async def functions_fingerprint(kernel: "Kernel", config: SequentialPlannerConfig) -> str:
+    """A hash of the function manual the planner shows the model; it changes when any listed function changes."""
+    functions = await SequentialPlannerKernelExtension.get_available_functions(kernel, None, config)
+    manual = sorted(SequentialPlannerFunctionExtension.to_manual_string(function) for function in functions)
+    return hashlib.sha256("\n\n".join(manual).encode()).hexdigest()
+
+
+class PlanCache:
+    """
+    Description: Stores the plans a planner created, by normalized goal and function fingerprint.
+
+    A plan is stored as the XML the model returned and parsed again on every hit, so each replay gets fresh
+    step state. An entry only matches the functions it was planned with: when a plugin changes (a function is
+    added, removed or described differently), the fingerprint changes and the stale entries no longer match.
+    They are kept, since planners with other functions may share the file, and dropped oldest-first once the
+    cache holds `max_entries` plans, or by `invalidate`. With an `embedding_service`, a goal that is not cached
+    verbatim also matches the most similar cached goal of the same functions at or above `min_similarity`; the
+    plan of that goal is replayed as is, including its parameters.
+
+    Usage:
+        plan_cache = PlanCache("plan-cache.json")
+        planner = CachedSequentialPlanner(kernel, service_id, plan_cache=plan_cache)
+    """
+
+    def __init__(
+        self,
+        cache_path: str | None = None,
+        embedding_service: "EmbeddingGeneratorBase | None" = None,
+        min_similarity: float = default_min_similarity,
+        max_entries: int = default_max_entries,
+    ) -> None:
+        """
+        Args:
+            cache_path -- The JSON file to keep plans in across runs; None keeps the cache in memory only
+            embedding_service -- The service to embed goals with for similarity matching; None matches exact goals only
+            min_similarity -- The minimum cosine similarity of two goals to share a plan
+            max_entries -- The maximum number of plans kept; the oldest are dropped first
+        """
+        self.cache_path = cache_path
+        self.embedding_service = embedding_service
+        self.min_similarity = min_similarity
+        self.max_entries = max_entries
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.entries: dict[str, dict[str, Any]] = self._read()
+
+    @property
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+            "invalidated": self.invalidated,
+            "entries": len(self.entries),
+        }
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return cache.get("entries", {}) if cache.get("version") == plan_cache_version else {}
+
+    def _write(self) -> None:
+        if not self.cache_path:
+            return
+        temporary = self.cache_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"version": plan_cache_version, "entries": self.entries}, f)
+        os.replace(temporary, self.cache_path)
+
+    @staticmethod
+    def key(goal: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}\n{normalize_goal(goal)}".encode()).hexdigest()
+
+    def invalidate(self, fingerprint: str) -> None:
+        """
+        Drop the plans that were made for other functions than those of `fingerprint`.
+
+        Only call this when no other planner with other functions shares the cache file; their plans are dropped too.
+        """
+        stale = [key for key, entry in self.entries.items() if entry["fingerprint"] != fingerprint]
+        for key in stale:
+            del self.entries[key]
+        if stale:
+            self.invalidated += len(stale)
+            logger.info(f"Dropped {len(stale)} cached plans made for other functions")
+            self._write()
+
+    async def _embed(self, goal: str) -> list[float]:
+        embeddings = await self.embedding_service.generate_embeddings([normalize_goal(goal)])
+        return [float(value) for value in embeddings[0]]
+
+    async def get(self, goal: str, fingerprint: str) -> str | None:
+        """The plan XML for a goal, if one was made for the same (or, with similarity matching, a similar) goal."""
+        entry = self.entries.get(self.key(goal, fingerprint))
+        if entry is not None:
+            self.hits += 1
+            return entry["plan"]
+
+        if self.embedding_service is not None:
+            candidates = [
+                entry
+                for entry in self.entries.values()
+                if entry["fingerprint"] == fingerprint and entry.get("embedding")
+            ]
+            if candidates:
+                query = np.asarray(await self._embed(goal))
+                matrix = np.asarray([entry["embedding"] for entry in candidates])
+                similarities = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.min_similarity:
+                    self.similar_hits += 1
+                    logger.info(f"Replaying the plan of a similar goal ({similarities[best]:.3f}): {candidates[best]['goal']}")
+                    return candidates[best]["plan"]
+        self.misses += 1
+        return None
+
+    async def put(self, goal: str, fingerprint: str, plan: str) -> None:
+        entry = {"goal": normalize_goal(goal), "fingerprint": fingerprint, "plan": plan, "created_at": time.time()}
+        if self.embedding_service is not None:
+            entry["embedding"] = await self._embed(goal)
+        # Keep the plans other planners sharing the file saved since it was read
+        self.entries = {**self._read(), **self.entries}
+        self.entries[self.key(goal, fingerprint)] = entry
+        while len(self.entries) > self.max_entries:
+            oldest = min(self.entries, key=lambda key: self.entries[key]["created_at"])
+            del self.entries[oldest]
+        self._write()
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self._write()
+
+
+class CachedSequentialPlanner(SequentialPlanner):
+    """
+    A SequentialPlanner that looks plans up in a PlanCache before asking the model for one.
+
+    On a hit, the plan is parsed from the stored XML without calling the model; on a miss, the plan is created
+    as by SequentialPlanner and stored once it parsed.
+    """
+
+    def __init__(
+        self,
+        kernel: "Kernel",
+        service_id: str,
+        config: SequentialPlannerConfig = None,
+        prompt: str | None = None,
+        plan_cache: PlanCache | None = None,
+    ) -> None:
+        super().__init__(kernel, service_id, config, prompt)
+        self.plan_cache = plan_cache or PlanCache()
+
+    def _parse(self, plan_xml: str, goal: str) -> Plan:
+        return SequentialPlanParser.to_plan_from_xml(
+            xml_string=plan_xml,
+            goal=goal,
+            kernel=self._kernel,
+            get_plugin_function=self.config.get_plugin_function,
+            allow_missing_functions=self.config.allow_missing_functions,
+        )
+
+    async def create_plan(self, goal: str) -> Plan:
+        """Create a plan for the specified goal, or replay the cached plan of the same goal."""
+        if len(goal) == 0:
+            raise PlannerInvalidGoalError("The goal specified is empty")
+
+        fingerprint = await functions_fingerprint(self._kernel, self.config)
+        plan_xml = await self.plan_cache.get(goal, fingerprint)
+        if plan_xml is not None:
+            return self._parse(plan_xml, goal)
+
+        relevant_function_manual = await SequentialPlannerKernelExtension.get_functions_manual(
+            self._kernel, self._arguments, goal, self.config
+        )
+        self._arguments["available_functions"] = relevant_function_manual
+        self._arguments["input"] = goal
+        plan_result = await self._function_flow_function.invoke(self._kernel, self._arguments)
+        if isinstance(plan_result, FunctionResult) and METADATA_EXCEPTION_KEY in plan_result.metadata:
+            raise PlannerCreatePlanError(
+                f"Error creating plan for goal: {plan_result.metadata['exception']}",
+            ) from plan_result.metadata[METADATA_EXCEPTION_KEY]
+
+        plan_xml = str(plan_result).strip()
+        try:
+            plan = self._parse(plan_xml, goal)
+        except PlannerException as e:
+            raise e
+        except Exception as e:
+            raise PlannerException("Unknown error creating plan", e) from e
+        if len(plan._steps) == 0:
+            raise PlannerCreatePlanError(
+                "Not possible to create plan for goal with available functions.\n",
+                f"Goal:{goal}\nFunctions:\n{relevant_function_manual}",
+            )
+        await self.plan_cache.put(goal, fingerprint, plan_xml)
+        return plan
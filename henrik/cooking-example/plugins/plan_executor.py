@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import re
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from semantic_kernel.exceptions import KernelInvokeException
+from semantic_kernel.functions.function_result import FunctionResult
+from semantic_kernel.functions.kernel_arguments import KernelArguments
+from semantic_kernel.planners.plan import Plan
+
+if TYPE_CHECKING:
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_max_parallelism = 4
+variables_regex = re.compile(r"\$(?P<var>\w+)")
+
+
+class StepNode(NamedTuple):
+    """
+    A step of a plan, with the earlier steps it consumes the output of.
+
+    index -- The position of the step in the plan
+    step -- The step
+    dependencies -- The positions of the steps that must complete first, in order
+    sources -- The variables the step reads from earlier steps, with the position of the step that sets them
+    chained_input -- Whether the step's input is the result of the previous step (it sets no input of its own)
+    """
+
+    index: int
+    step: Plan
+    dependencies: tuple[int, ...]
+    sources: dict[str, int]
+    chained_input: bool
+
+
+class StepTrace(NamedTuple):
+    index: int
+    name: str
+    dependencies: tuple[int, ...]
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class PlanTrace(NamedTuple):
+    """The timing of every step of a plan run, and the chain of steps that determined its total time."""
+
+    steps: list[StepTrace]
+    critical_path: list[int]
+    elapsed: float
+    max_parallelism: int
+
+    def __str__(self) -> str:
+        lines = [f"Plan trace ({len(self.steps)} steps, {self.elapsed:.2f}s, max parallelism {self.max_parallelism}):"]
+        for trace in self.steps:
+            marker = "*" if trace.index in self.critical_path else " "
+            dependencies = ", ".join(str(d) for d in trace.dependencies) or "-"
+            lines.append(
+                f" {marker} [{trace.index}] {trace.name:<40} {trace.start:6.2f}s -> {trace.end:6.2f}s"
+                f"  ({trace.duration:.2f}s, after: {dependencies})"
+            )
+        path = " -> ".join(f"[{i}] {self.steps[i].name}" for i in self.critical_path)
+        lines.append(f"Critical path: {path}")
+        return "\n".join(lines)
+
+
+def referenced_variables(value: Any) -> list[str]:
+    """The `$VARIABLE` names a step parameter refers to."""
+    return [match.group("var") for match in variables_regex.finditer(str(value))] if value else []
+
+
+def expand_variables(value: Any, variables: dict[str, str]) -> Any:
+    """Replace the `$VARIABLE` references of a step parameter, like `Plan.expand_from_arguments`."""
+    names = sorted(set(referenced_variables(value)), key=len, reverse=True)
+    for name in names:
+        if name in variables:
+            value = value.replace(f"${name}", variables[name])
+    return value
+
+
+def analyze_plan(plan: Plan) -> list[StepNode]:
+    """
+    Build the dependency graph of a plan's steps from the variables they set and read.
+
+    A step depends on the last earlier step that sets (`setContextVariable`/`appendToResult`) each variable it
+    refers to (`$VARIABLE`) or takes by name, and on the step right before it if it takes that step's result as
+    its input (it has an `input` parameter and no value for it).
+    """
+    nodes = []
+    producers: dict[str, int] = {}
+    for index, step in enumerate(plan._steps):
+        parameters = step._parameters or {}
+        parameter_names = {parameter.name for parameter in step.metadata.parameters} if step._function else set()
+        sources = {}
+        for name, value in parameters.items():
+            names = referenced_variables(value) if value else [name] if name in parameter_names else []
+            for variable in names:
+                if variable in producers:
+                    sources[variable] = producers[variable]
+        chained_input = index > 0 and "input" in parameters and not parameters.get("input")
+        dependencies = set(sources.values())
+        if chained_input:
+            dependencies.add(index - 1)
+        nodes.append(
+            StepNode(
+                index=index,
+                step=step,
+                dependencies=tuple(sorted(dependencies)),
+                sources=sources,
+                chained_input=chained_input,
+            )
+        )
+        for output in step._outputs:
+            producers[output] = index
+    return nodes
+
+
+def step_arguments(
+    plan: Plan, node: StepNode, arguments: KernelArguments, results: dict[int, str]
+) -> KernelArguments:
+    """The arguments of a step, from the plan arguments and the results of the steps it depends on only."""
+    variables = {name: value for name, value in arguments.items() if isinstance(value, str)}
+    variables.update({variable: results[index] for variable, index in node.sources.items()})
+    step_arguments = KernelArguments(**arguments)
+    step_arguments.update({variable: results[index] for variable, index in node.sources.items()})
+
+    parameters = node.step._parameters or {}
+    if parameters.get("input"):
+        step_arguments["input"] = expand_variables(parameters["input"], variables)
+    elif node.chained_input:
+        step_arguments["input"] = results[node.index - 1]
+    elif not arguments.get("input") and plan.description:
+        step_arguments["input"] = plan.description
+
+    for name, value in parameters.items():
+        if name == "input":
+            continue
+        if value:
+            step_arguments[name] = expand_variables(value, variables)
+        elif name not in step_arguments:
+            step_arguments[name] = value
+    return step_arguments
+
+
+def critical_path(nodes: list[StepNode], traces: list[StepTrace]) -> list[int]:
+    """The chain of dependent steps that ended last: each step's dependency that finished last, back to the start."""
+    if not traces:
+        return []
+    index = max(range(len(traces)), key=lambda i: traces[i].end)
+    path = [index]
+    while nodes[index].dependencies:
+        index = max(nodes[index].dependencies, key=lambda i: traces[i].end)
+        path.append(index)
+    return path[::-1]
+
+
+async def invoke_plan(
+    plan: Plan,
+    kernel: "Kernel",
+    arguments: KernelArguments | None = None,
+    max_parallelism: int = default_max_parallelism,
+) -> FunctionResult:
+    """
+    Invoke a plan (e.g. from `SequentialPlanner.create_plan`), running the steps that do not depend on each other
+    concurrently.
+
+    Every step starts as soon as the steps it depends on (see `analyze_plan`) are complete, with at most
+    `max_parallelism` steps running at once, and sees only the results of those steps, so the results do not
+    depend on the order the steps complete in. As with `plan.invoke`, the result is that of the last step, with
+    the results of all steps, in plan order, in `metadata["results"]`; `metadata["trace"]` is a PlanTrace.
+    Unlike `plan.invoke`, a step's own `input` parameter is not overwritten by the previous step's result.
+    """
+    if not plan._steps:
+        return await plan.invoke(kernel, arguments)
+    arguments = KernelArguments(**(arguments or plan._state))
+    nodes = analyze_plan(plan)
+    semaphore = asyncio.Semaphore(max_parallelism)
+    results: dict[int, str] = {}
+    function_results: dict[int, FunctionResult] = {}
+    traces: dict[int, StepTrace] = {}
+    tasks: list[asyncio.Task] = []
+    started = time.perf_counter()
+
+    async def run_step(node: StepNode) -> None:
+        await asyncio.gather(*(tasks[index] for index in node.dependencies))
+        async with semaphore:
+            start = time.perf_counter() - started
+            logger.info(f"Invoking step {node.index}: {node.step.name}")
+            try:
+                result = await node.step.invoke(kernel, step_arguments(plan, node, arguments, results))
+            except Exception as exc:
+                raise KernelInvokeException(f"Error occurred while running plan step: {exc}", exc) from exc
+            end = time.perf_counter() - started
+        function_results[node.index] = result
+        results[node.index] = str(result)
+        traces[node.index] = StepTrace(node.index, node.step.metadata.fully_qualified_name, node.dependencies, start, end)
+
+    for node in nodes:
+        tasks.append(asyncio.create_task(run_step(node)))
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    # Update the plan state in plan order, as `plan.invoke` would have
+    for node in nodes:
+        plan._state["input"] = results[node.index]
+        if set(plan._outputs).intersection(node.step._outputs):
+            current = plan._state.get(Plan.DEFAULT_RESULT_KEY, "")
+            plan._state[Plan.DEFAULT_RESULT_KEY] = current.strip() + results[node.index]
+    plan._next_step_index = len(nodes)
+
+    step_traces = [traces[node.index] for node in nodes]
+    trace = PlanTrace(
+        steps=step_traces,
+        critical_path=critical_path(nodes, step_traces),
+        elapsed=time.perf_counter() - started,
+        max_parallelism=max_parallelism,
+    )
+    return FunctionResult(
+        function=plan.metadata,
+        value=results[nodes[-1].index],
+        metadata={"results": [function_results[node.index] for node in nodes], "trace": trace},
+    )
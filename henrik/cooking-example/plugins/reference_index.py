@@ -0,0 +1,133 @@
+import hashlib
+import re
+import unicodedata
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import NamedTuple
+
+# Definitions
+default_max_ngram = 4
+default_min_similarity = 0.88
+min_fuzzy_length = 5            # Shorter words must match exactly ("Mary" is not "many", "Joan" is not "John")
+default_max_indexes = 16
+
+word_regex = re.compile(r"\w+")
+
+
+def normalize_token(token: str) -> str:
+    """Casefold a word, strip its accents and reduce simple plurals and possessives ("counsellors" -> "counsellor")."""
+    token = unicodedata.normalize("NFKD", token.casefold())
+    token = "".join(character for character in token if not unicodedata.combining(character))
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    # "Beaufort's" is read as "beaufort" and "s"; the lone "s" is dropped
+    return [normalize_token(word) for word in word_regex.findall(text.replace("'s", " ").replace("’s", " "))]
+
+
+class EntityMatch(NamedTuple):
+    """How an entity was found in the reference text: "exact" or "fuzzy" (with the matched text), or None."""
+
+    entity: str
+    kind: str | None
+    matched: str | None = None
+    similarity: float = 0.0
+
+
+class ReferenceIndex:
+    """
+    Description: An index of the words and phrases of a reference text, to ground entities without the model.
+
+    The text is tokenized once into normalized words (casefolded, without accents, plurals and possessives) and
+    every phrase of up to `max_ngram` words is indexed. An entity is grounded "exact" if its normalized words
+    appear as a phrase of the text, and "fuzzy" if a phrase of the same length is at least `min_similarity`
+    similar, word by word (for spelling variants; words shorter than `min_fuzzy_length` must match exactly, so a
+    swapped first name or title is not grounded); anything else is left for ReferenceCheckEntities to decide,
+    since only the model recognizes re-phrasings and equivalent meanings.
+
+    Usage:
+        index = reference_index(grounding_text)
+        grounded, unresolved = index.split(entities)
+    """
+
+    def __init__(
+        self, text: str, max_ngram: int = default_max_ngram, min_similarity: float = default_min_similarity
+    ) -> None:
+        self.max_ngram = max_ngram
+        self.min_similarity = min_similarity
+        tokens = tokenize(text)
+        self.phrases: set[tuple[str, ...]] = set()
+        # Phrases by number of words and first letter, the candidates of a fuzzy match
+        self._buckets: dict[tuple[int, str], set[str]] = {}
+        for size in range(1, max_ngram + 1):
+            for start in range(len(tokens) - size + 1):
+                phrase = tuple(tokens[start : start + size])
+                self.phrases.add(phrase)
+                self._buckets.setdefault((size, phrase[0][:1]), set()).add(" ".join(phrase))
+
+    def match(self, entity: str) -> EntityMatch:
+        words = tuple(word for word in tokenize(entity) if word != "s")
+        if not words or len(words) > self.max_ngram:
+            return EntityMatch(entity, None)
+        if words in self.phrases:
+            return EntityMatch(entity, "exact", " ".join(words), 1.0)
+
+        text = " ".join(words)
+        if len(text) < min_fuzzy_length:
+            return EntityMatch(entity, None)
+        best, best_similarity = None, 0.0
+        for candidate in self._buckets.get((len(words), words[0][:1]), ()):
+            matcher = SequenceMatcher(None, text, candidate)
+            if matcher.real_quick_ratio() < self.min_similarity or matcher.quick_ratio() < self.min_similarity:
+                continue
+            similarity = matcher.ratio()
+            if similarity > best_similarity and self._words_match(words, candidate.split(" ")):
+                best, best_similarity = candidate, similarity
+        if best_similarity >= self.min_similarity:
+            return EntityMatch(entity, "fuzzy", best, best_similarity)
+        return EntityMatch(entity, None)
+
+    def _words_match(self, words: tuple[str, ...], candidate: list[str]) -> bool:
+        """Whether every word of an entity is the word of the candidate phrase at its place, or a spelling variant."""
+        for word, other in zip(words, candidate):
+            if word == other:
+                continue
+            if len(word) < min_fuzzy_length or len(other) < min_fuzzy_length:
+                return False
+            if SequenceMatcher(None, word, other).ratio() < self.min_similarity:
+                return False
+        return True
+
+    def split(self, entities: list[str]) -> tuple[list[EntityMatch], list[str]]:
+        """The entities found in the text (grounded), and those left for the model to check."""
+        grounded, unresolved = [], []
+        for entity in entities:
+            match = self.match(entity)
+            if match.kind is None:
+                unresolved.append(entity)
+            else:
+                grounded.append(match)
+        return grounded, unresolved
+
+
+_indexes: OrderedDict[str, ReferenceIndex] = OrderedDict()
+
+
+def reference_index(text: str) -> ReferenceIndex:
+    """The index of a reference text, built once for all the summaries checked against it."""
+    key = hashlib.sha256(text.encode()).hexdigest()
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = ReferenceIndex(text)
+        while len(_indexes) > default_max_indexes:
+            _indexes.popitem(last=False)
+    _indexes.move_to_end(key)
+    return index
+
+
+def entities_block(entities: list[str]) -> str:
+    """Entities in the format ReferenceCheckEntities expects as its input."""
+    return "<entities>\n" + "\n".join(f"- {entity}" for entity in entities) + "\n</entities>"
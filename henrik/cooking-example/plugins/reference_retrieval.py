@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import logging
+import re
+
+from memory_ingestion import BatchSemanticTextMemory, MemoryInput
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_chunk_words = 200
+default_overlap_words = 40
+default_top_k = 3
+chunk_separator = "\n[...]\n"
+
+sentence_regex = re.compile(r"(?<=[.!?;])\s+")
+
+
+def chunk_document(text: str, chunk_words: int = default_chunk_words, overlap_words: int = default_overlap_words) -> list[str]:
+    """
+    Split a document into chunks of about `chunk_words` words, on sentence boundaries.
+
+    Each chunk starts with the last sentences (about `overlap_words` words) of the previous one, so a passage
+    that spans a boundary is found whole in at least one chunk.
+    """
+    sentences = [sentence for sentence in sentence_regex.split(text.strip()) if sentence]
+    chunks, current, words = [], [], 0
+    for sentence in sentences:
+        current.append(sentence)
+        words += len(sentence.split())
+        if words >= chunk_words:
+            chunks.append(" ".join(current))
+            overlap, overlap_count = [], 0
+            for previous in reversed(current):
+                overlap_count += len(previous.split())
+                if overlap_count > overlap_words:
+                    break
+                overlap.insert(0, previous)
+            current, words = overlap, sum(len(sentence.split()) for sentence in overlap)
+    # The rest, unless it is only the overlap of the last chunk
+    if current and (not chunks or not chunks[-1].endswith(" ".join(current))):
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class ReferenceRetriever:
+    """
+    Description: Passes only the parts of a long reference document that are relevant to the entities to check.
+
+    A document is chunked (see `chunk_document`), embedded and saved to a memory collection named after its hash
+    once, the first time it is used; all summaries checked against the same document share the collection. The
+    name also holds the chunk sizes, so retrievers that chunk differently never read each other's records.
+    For a batch of entities, every entity is a query. The best chunk of every entity is always returned (so
+    a batch of many entities may get more than `top_k` chunks), then the entities' next best ones in turn up to
+    `top_k` chunks, in document order. Documents of at most `top_k` chunks are returned whole.
+
+    Usage:
+        memory = BatchSemanticTextMemory(storage=NumpyMemoryStore(), embeddings_generator=embedding_gen)
+        retriever = ReferenceRetriever(memory, top_k=3)
+        reference_context = await retriever.context(book_text, ["Beaufort", "Lucerne"])
+    """
+
+    def __init__(
+        self,
+        memory: BatchSemanticTextMemory,
+        top_k: int = default_top_k,
+        chunk_words: int = default_chunk_words,
+        overlap_words: int = default_overlap_words,
+    ) -> None:
+        """
+        Args:
+            memory -- The memory to save the chunks to; with a persistent store, chunks are embedded once across runs
+            top_k -- The number of chunks passed per entity batch, unless its entities have more distinct best chunks
+            chunk_words -- The approximate number of words of a chunk
+            overlap_words -- The approximate number of words a chunk repeats from the previous one
+        """
+        self.memory = memory
+        self.top_k = top_k
+        self.chunk_words = chunk_words
+        self.overlap_words = overlap_words
+        self.retrievals = 0
+        self.document_characters = 0
+        self.context_characters = 0
+        self._chunks: dict[str, list[str]] = {}
+        self._indexing: dict[str, asyncio.Task] = {}
+
+    @property
+    def stats(self) -> dict[str, float]:
+        return {
+            "documents": len(self._chunks),
+            "chunks": sum(len(chunks) for chunks in self._chunks.values()),
+            "retrievals": self.retrievals,
+            "context_fraction": self.context_characters / self.document_characters if self.document_characters else 0.0,
+        }
+
+    def collection_name(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode()).hexdigest()[:16]
+        return f"reference-{digest}-{self.chunk_words}-{self.overlap_words}"
+
+    async def index(self, text: str) -> str:
+        """Chunk and embed a document unless it already is; returns its collection. Concurrent callers share the work."""
+        collection = self.collection_name(text)
+        task = self._indexing.get(collection)
+        if task is None:
+            task = self._indexing[collection] = asyncio.create_task(self._index(collection, text))
+        try:
+            await task
+        except Exception:
+            # The next call indexes the document again, e.g. after a transient embedding error
+            if self._indexing.get(collection) is task:
+                del self._indexing[collection]
+            raise
+        return collection
+
+    async def _index(self, collection: str, text: str) -> None:
+        chunks = chunk_document(text, self.chunk_words, self.overlap_words)
+        if len(chunks) > self.top_k:
+            logger.info(f"Indexing {len(chunks)} chunks of reference document {collection}")
+            await self.memory.save_batch(
+                collection=collection,
+                records=[MemoryInput(id=str(position), text=chunk) for position, chunk in enumerate(chunks)],
+                skip_existing=True,
+            )
+        self._chunks[collection] = chunks
+
+    async def context(self, text: str, entities: list[str]) -> str:
+        """The chunks of a document most relevant to a batch of entities, in document order."""
+        collection = await self.index(text)
+        chunks = self._chunks[collection]
+        self.retrievals += 1
+        self.document_characters += len(text)
+        if len(chunks) <= self.top_k or not entities:
+            self.context_characters += len(text)
+            return text
+
+        matches = await self.memory.search_batch(collection=collection, queries=entities, limit=self.top_k)
+        rankings = [[int(result.id) for result in results] for results in matches]
+        # Round-robin over the entities' rankings: first the best chunk of every entity, then up to `top_k`
+        selected: dict[int, None] = {}
+        for rank in range(self.top_k):
+            for ranking in rankings:
+                if rank < len(ranking) and (rank == 0 or len(selected) < self.top_k):
+                    selected[ranking[rank]] = None
+            if len(selected) >= self.top_k:
+                break
+        best = sorted(selected)
+        context = chunk_separator.join(chunks[position] for position in best)
+        self.context_characters += len(context)
+        return context
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextvars import ContextVar
+from functools import partial
+from inspect import isasyncgen
+from typing import TYPE_CHECKING, Any
+
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
+from semantic_kernel.contents.streaming_text_content import StreamingTextContent
+from semantic_kernel.contents.text_content import TextContent
+from semantic_kernel.filters.functions.function_invocation_context import FunctionInvocationContext
+from semantic_kernel.filters.prompts.prompt_render_context import PromptRenderContext
+from semantic_kernel.functions.function_result import FunctionResult
+from semantic_kernel.functions.kernel_function import KernelFunction
+from semantic_kernel.functions.kernel_function_from_prompt import KernelFunctionFromPrompt
+
+from lazy_plugin_loader import LazyKernelFunction
+
+if TYPE_CHECKING:
+    from semantic_kernel.kernel import Kernel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_ttl_seconds = 24 * 60 * 60
+default_max_entries = 1_000
+default_max_disk_entries = 100_000
+cacheable_content_types = {"ChatMessageContent": ChatMessageContent, "TextContent": TextContent}
+
+# The prompt the cache filter already rendered, for the prompt rendering filter of the same call to reuse
+_prerendered_prompt: ContextVar[tuple[str, str] | None] = ContextVar("_prerendered_prompt", default=None)
+
+
+def is_streaming(next: Callable) -> bool | None:
+    """
+    Whether a function invocation filter chain ends in the streaming invoke of the function, or None if its end
+    is not recognized.
+
+    This follows semantic-kernel's private filter chain (as of 1.1.2: `functools.partial(filter, next=...)`
+    around `KernelFunction._invoke_internal` or `_invoke_internal_stream`); if it changes, the cache steps aside
+    rather than answer a streaming call with a list or an invoke with a stream.
+    """
+    while isinstance(next, partial):
+        next = next.keywords.get("next")
+    if not isinstance(getattr(next, "__self__", None), KernelFunction):
+        return None
+    return {"_invoke_internal": False, "_invoke_internal_stream": True}.get(getattr(next, "__name__", None))
+
+
+def response_cache_settings(function: Any) -> dict[str, Any] | None:
+    """The `response_cache` section of a function's config.json (see `load_compiled_function`), if enabled."""
+    settings = (function.metadata.additional_properties or {}).get("response_cache")
+    if isinstance(settings, bool):
+        settings = {"enabled": settings}
+    return settings if settings and settings.get("enabled") else None
+
+
+def usage_tokens(metadata: dict[str, Any] | None) -> int:
+    """The total number of tokens in the usage of a content's metadata (a dict or an OpenAI usage object), 0 if none."""
+    usage = (metadata or {}).get("usage")
+    if isinstance(usage, dict):
+        return usage.get("total_tokens") or 0
+    return getattr(usage, "total_tokens", 0) or 0
+
+
+def used_tokens(result: FunctionResult) -> int:
+    """The total number of tokens reported by the service for a completion, 0 if it reports none."""
+    return sum(usage_tokens(metadata) for metadata in (result.metadata or {}).get("metadata", []))
+
+
+def to_entry(contents: list[ChatMessageContent | TextContent], tokens: int) -> dict[str, Any] | None:
+    """The cache entry of a completion, or None if it is not made of chat messages or texts."""
+    if not contents or len({type(content) for content in contents}) != 1:
+        return None
+    if type(contents[0]).__name__ not in cacheable_content_types:
+        return None
+    return {
+        "type": type(contents[0]).__name__,
+        "value": [content.model_dump(mode="json", exclude={"inner_content"}) for content in contents],
+        "tokens": tokens,
+    }
+
+
+async def replay(contents: list[ChatMessageContent | TextContent]) -> AsyncGenerator[list[Any], None]:
+    """Stream a cached completion, all of it in one chunk."""
+    yield [
+        StreamingChatMessageContent(
+            role=content.role, content=content.content, choice_index=index, ai_model_id=content.ai_model_id
+        )
+        if isinstance(content, ChatMessageContent)
+        else StreamingTextContent(text=content.text, choice_index=index, ai_model_id=content.ai_model_id)
+        for index, content in enumerate(contents)
+    ]
+
+
+class ResponseCache:
+    """
+    Description: An opt-in cache of prompt function completions, applied at the kernel invoke layer.
+
+    Functions opt in through their config.json:
+        "response_cache": {"enabled": true, "ttl_seconds": 3600}
+
+    For those, the cache renders the prompt and selects the service first, and looks up the completion by
+    (service id, model id, rendered prompt, execution settings). A hit returns the stored completion without
+    calling the service; a miss calls the service with the prompt rendered once and stores the result.
+    Streamed completions are stored once the stream is complete, and replayed as a single chunk. Entries
+    expire after their TTL and are evicted least-recently-used from memory (`max_entries`) and oldest-first from
+    the optional SQLite file (`max_disk_entries`). Only use it for deterministic (temperature 0) functions.
+
+    Usage:
+        response_cache = ResponseCache("response-cache.sqlite")
+        response_cache.register(kernel)
+    """
+
+    def __init__(
+        self,
+        cache_path: str | None = None,
+        ttl_seconds: float = default_ttl_seconds,
+        max_entries: int = default_max_entries,
+        max_disk_entries: int = default_max_disk_entries,
+    ) -> None:
+        """
+        Args:
+            cache_path -- The SQLite file to store completions in; None keeps the cache in memory only
+            ttl_seconds -- The default time to live of an entry; functions can override it in their config.json
+            max_entries -- The maximum number of completions held in memory
+            max_disk_entries -- The maximum number of completions kept in the SQLite file
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self._lru: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._connection: sqlite3.Connection | None = None
+        if cache_path:
+            self._connection = sqlite3.connect(cache_path)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, created_at REAL NOT NULL, entry TEXT NOT NULL)"
+            )
+
+    @property
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_tokens": self.saved_tokens,
+            "entries_in_memory": len(self._lru),
+        }
+
+    def register(self, kernel: "Kernel") -> None:
+        """Add the cache's filters to a kernel."""
+        kernel.add_filter("function_invocation", self.function_invocation_filter)
+        kernel.add_filter("prompt_rendering", self.prompt_rendering_filter)
+
+    @staticmethod
+    def key(service_id: str, ai_model_id: str, prompt: str, settings: dict[str, Any]) -> str:
+        content = json.dumps(
+            {"service_id": service_id, "ai_model_id": ai_model_id, "prompt": prompt, "settings": settings},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        if key in self._lru:
+            expires_at, entry = self._lru[key]
+            if expires_at > now:
+                self._lru.move_to_end(key)
+                return entry
+            del self._lru[key]
+        if self._connection is None:
+            return None
+        row = self._connection.execute(
+            "SELECT expires_at, entry FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = json.loads(row[1])
+        self._remember(key, row[0], entry)
+        return entry
+
+    def put(self, key: str, entry: dict[str, Any], ttl_seconds: float) -> None:
+        now = time.time()
+        self._remember(key, now + ttl_seconds, entry)
+        if self._connection is None:
+            return
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, expires_at, created_at, entry) VALUES (?, ?, ?, ?)",
+                (key, now + ttl_seconds, now, json.dumps(entry)),
+            )
+            self._connection.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+
+    def _remember(self, key: str, expires_at: float, entry: dict[str, Any]) -> None:
+        self._lru[key] = (expires_at, entry)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def clear(self) -> None:
+        self._lru.clear()
+        if self._connection is not None:
+            with self._connection:
+                self._connection.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """Close the SQLite file."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def function_invocation_filter(
+        self, context: FunctionInvocationContext, next: Callable[[FunctionInvocationContext], Awaitable[None]]
+    ) -> None:
+        function = context.function.function if isinstance(context.function, LazyKernelFunction) else context.function
+        settings = response_cache_settings(context.function)
+        if settings is None or not isinstance(function, KernelFunctionFromPrompt):
+            await next(context)
+            return
+        streaming = is_streaming(next)
+        if streaming is None:
+            logger.debug(f"Not caching {function.fully_qualified_name}: unknown filter chain")
+            await next(context)
+            return
+
+        rendering = await function._render_prompt(context)
+        key = self.key(
+            rendering.ai_service.service_id,
+            rendering.ai_service.ai_model_id,
+            rendering.rendered_prompt,
+            rendering.execution_settings.model_dump(exclude_none=True),
+        )
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.saved_tokens += entry["tokens"]
+            content_type = cacheable_content_types[entry["type"]]
+            contents = [content_type.model_validate(item) for item in entry["value"]]
+            context.result = FunctionResult(
+                function=context.function.metadata,
+                value=replay(contents) if streaming else contents,
+                metadata={
+                    "arguments": context.arguments,
+                    "metadata": [item.get("metadata") for item in entry["value"]],
+                    "cached": True,
+                },
+            )
+            return
+
+        self.misses += 1
+        token = _prerendered_prompt.set((function.fully_qualified_name, rendering.rendered_prompt))
+        try:
+            await next(context)
+        finally:
+            _prerendered_prompt.reset(token)
+
+        ttl_seconds = settings.get("ttl_seconds", self.ttl_seconds)
+        value = context.result.value if context.result is not None else None
+        if streaming and isasyncgen(value):
+            context.result.value = self._record(value, key, ttl_seconds)
+        elif isinstance(value, list):
+            entry = to_entry(value, used_tokens(context.result))
+            if entry is not None:
+                self.put(key, entry, ttl_seconds)
+
+    async def _record(self, stream: AsyncGenerator, key: str, ttl_seconds: float) -> AsyncGenerator[list[Any], None]:
+        """Pass a completion stream through and cache the completion once the stream is complete."""
+        parts: dict[int, list[str]] = {}
+        first: dict[int, Any] = {}
+        async for chunk in stream:
+            for content in chunk:
+                parts.setdefault(content.choice_index, []).append(str(content))
+                first.setdefault(content.choice_index, content)
+            yield chunk
+        contents = [
+            ChatMessageContent(role=first[index].role, content="".join(parts[index]), ai_model_id=first[index].ai_model_id)
+            if isinstance(first[index], ChatMessageContent)
+            else TextContent(text="".join(parts[index]), ai_model_id=first[index].ai_model_id)
+            for index in sorted(parts)
+        ]
+        entry = to_entry(contents, 0)
+        if entry is not None:
+            self.put(key, entry, ttl_seconds)
+
+    async def prompt_rendering_filter(
+        self, context: PromptRenderContext, next: Callable[[PromptRenderContext], Awaitable[None]]
+    ) -> None:
+        prerendered = _prerendered_prompt.get()
+        if prerendered is not None and prerendered[0] == context.function.fully_qualified_name:
+            # Consumed once, so functions called while rendering other prompts render as usual
+            _prerendered_prompt.set(None)
+            context.rendered_prompt = prerendered[1]
+            return
+        await next(context)
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import time
+from collections.abc import Awaitable, Callable, Coroutine
+from typing import Any, TypeVar
+
+import httpx
+from openai import AsyncOpenAI
+
+T = TypeVar("T")
+
+# Definitions
+max_connections = 20
+max_keepalive_connections = 10
+keepalive_expiry = 30.0     # seconds
+timeout = httpx.Timeout(60.0, connect=10.0)
+
+_async_client: AsyncOpenAI | None = None
+_request_hooks: list[Callable[[httpx.Request], Awaitable[None]]] = []
+
+
+def get_async_client(api_key: str | None = None, org_id: str | None = None) -> AsyncOpenAI:
+    """
+    Get the shared OpenAI client used by every service in a script.
+
+    The client wraps a single pooled httpx.AsyncClient, so every chat turn, embedding and plan step
+    reuses warm (already TLS-negotiated) connections instead of opening new ones.
+    Pass it to the services with `async_client=get_async_client()`.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            organization=org_id or os.getenv("OPENAI_ORG_ID"),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry,
+                ),
+                timeout=timeout,
+                event_hooks={"request": [_run_request_hooks]},
+            ),
+        )
+    return _async_client
+
+
+async def _run_request_hooks(request: httpx.Request) -> None:
+    for hook in _request_hooks:
+        await hook(request)
+
+
+def add_request_hook(hook: Callable[[httpx.Request], Awaitable[None]]) -> None:
+    """Await `hook(request)` before every request of the shared client, e.g. a RateLimiter."""
+    _request_hooks.append(hook)
+
+
+class RateLimiter:
+    """
+    Description: Limits the rate of requests to a service, across every task of the event loop.
+
+    A token bucket: up to `burst` requests go out at once, after which requests are spaced to
+    `requests_per_minute`. Waiting requests go out in the order they arrived.
+
+    Usage:
+        add_request_hook(RateLimiter(requests_per_minute=500))
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int | None = None) -> None:
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst or max(1, int(self.rate))
+        self.requests = 0
+        self.waited_seconds = 0.0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a request may go out."""
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1
+            self.requests += 1
+
+    async def __call__(self, request: httpx.Request) -> None:
+        await self.acquire()
+
+
+async def close_async_client() -> None:
+    """Close the shared OpenAI client (and its connection pool) if it has been created."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def run(main: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a script's whole workflow inside one long-lived event loop.
+
+    Use this once per script instead of calling `asyncio.run` per step: the pooled connections of the
+    shared client are bound to the loop that opened them, and are closed when the workflow finishes.
+    Services holding the closed client cannot be used afterwards, so await every step inside `main`.
+    """
+    async def _main() -> T:
+        try:
+            return await main
+        finally:
+            await close_async_client()
+
+    return asyncio.run(_main())
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.functions.kernel_arguments import KernelArguments
+
+from response_cache import usage_tokens
+
+if TYPE_CHECKING:
+    from semantic_kernel.kernel import Kernel
+    from semantic_kernel.planners.function_calling_stepwise_planner import FunctionCallingStepwisePlanner
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Definitions
+default_max_concurrency = 8
+
+
+class QuestionResult(NamedTuple):
+    """
+    The outcome of one question of a batch.
+
+    index -- The position of the question in the batch
+    question -- The question
+    final_answer -- The planner's answer; empty if it found none or failed
+    iterations -- The number of planner iterations
+    tokens -- The tokens used by the planner's step requests, as reported by the service
+    seconds -- The wall time of the question
+    error -- The error the question failed with, if any
+    """
+
+    index: int
+    question: str
+    final_answer: str
+    iterations: int
+    tokens: int
+    seconds: float
+    error: str | None = None
+
+
+def history_tokens(chat_history: ChatHistory) -> int:
+    """The total number of tokens reported in the usage metadata of a chat history's messages."""
+    return sum(usage_tokens(message.metadata) for message in chat_history.messages)
+
+
+def isolated_kernel(kernel: "Kernel") -> "Kernel":
+    """
+    A copy of a kernel with its own plugin collection, sharing the services and filters.
+
+    The planner adds its own plugins (UserInteraction, the plan function) to the kernel it is given; on the copy
+    they do not leak into the caller's kernel, or into the other questions of a batch.
+    """
+    return kernel.model_copy(update={"plugins": dict(kernel.plugins)})
+
+
+async def run_questions(
+    planner: "FunctionCallingStepwisePlanner",
+    kernel: "Kernel",
+    questions: list[str],
+    max_concurrency: int = default_max_concurrency,
+    arguments: dict[str, Any] | None = None,
+    kernel_for_question: Callable[[str], Awaitable["Kernel"]] | None = None,
+    on_result: Callable[[QuestionResult], None] | None = None,
+) -> list[QuestionResult]:
+    """
+    Run many questions through a FunctionCallingStepwisePlanner concurrently.
+
+    At most `max_concurrency` questions run at once, each with its own kernel plugins, arguments and chat
+    history. To limit the rate of model requests across all questions, add a RateLimiter to the shared client
+    (see `runner.add_request_hook`). A failing question is recorded with its error and does not stop the batch.
+    Args:
+        planner -- The planner
+        kernel -- The kernel to run the questions with
+        questions -- The questions
+        max_concurrency -- The maximum number of questions running at once
+        arguments -- Arguments passed to every question
+        kernel_for_question -- Returns the kernel for a question instead (e.g. FunctionIndex.relevant_kernel)
+        on_result -- Called with the result of every question as soon as it completes
+    Returns:
+        The results, in the order of the questions
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_question(index: int, question: str) -> QuestionResult:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                question_kernel = await kernel_for_question(question) if kernel_for_question else kernel
+                result = await planner.invoke(
+                    isolated_kernel(question_kernel), question, KernelArguments(**(arguments or {}))
+                )
+                outcome = QuestionResult(
+                    index=index,
+                    question=question,
+                    final_answer=result.final_answer,
+                    iterations=result.iterations,
+                    tokens=history_tokens(result.chat_history),
+                    seconds=time.perf_counter() - start,
+                )
+            except Exception as exc:
+                logger.warning(f"Question {index} failed: {exc}")
+                outcome = QuestionResult(
+                    index=index,
+                    question=question,
+                    final_answer="",
+                    iterations=0,
+                    tokens=0,
+                    seconds=time.perf_counter() - start,
+                    error=str(exc),
+                )
+        if on_result is not None:
+            on_result(outcome)
+        return outcome
+
+    return await asyncio.gather(*(run_question(index, question) for index, question in enumerate(questions)))
+
+
+def summarize_results(results: list[QuestionResult], wall_seconds: float | None = None) -> dict[str, float]:
+    """Aggregate statistics of a batch: answers, failures, iterations, tokens and seconds per question."""
+    if not results:
+        return {"questions": 0}
+    completed = [result for result in results if result.error is None]
+    seconds = sorted(result.seconds for result in results)
+    summary = {
+        "questions": len(results),
+        "answered": sum(1 for result in completed if result.final_answer),
+        "failed": len(results) - len(completed),
+        "iterations_total": sum(result.iterations for result in completed),
+        "iterations_mean": statistics.fmean(result.iterations for result in completed) if completed else 0.0,
+        "iterations_max": max((result.iterations for result in completed), default=0),
+        "tokens_total": sum(result.tokens for result in completed),
+        "tokens_mean": statistics.fmean(result.tokens for result in completed) if completed else 0.0,
+        "seconds_mean": statistics.fmean(seconds),
+        "seconds_p50": seconds[len(seconds) // 2],
+        "seconds_p95": seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))],
+        "seconds_max": seconds[-1],
+    }
+    if wall_seconds is not None:
+        summary["wall_seconds"] = wall_seconds
+        summary["questions_per_minute"] = len(results) / wall_seconds * 60 if wall_seconds else 0.0
+    return summary
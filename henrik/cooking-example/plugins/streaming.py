@@ -0,0 +1,310 @@
+import asyncio
+import io
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from semantic_kernel.functions.function_result import FunctionResult
+from semantic_kernel.functions.kernel_arguments import KernelArguments
+
+if TYPE_CHECKING:
+    from semantic_kernel.functions.kernel_function import KernelFunction
+    from semantic_kernel.kernel import Kernel
+
+# Definitions
+benchmark_token = " token"
+
+
+class PipelineStage(NamedTuple):
+    """
+    A function in a streaming pipeline.
+
+    function -- The function to run
+    arguments -- Additional arguments of the function
+    input_name -- The argument that receives the complete output of the previous stage
+    """
+
+    function: "KernelFunction"
+    arguments: dict[str, Any] = {}
+    input_name: str = "input"
+
+
+class StreamChunk(NamedTuple):
+    """A piece of the output of a pipeline stage, as it arrives from the model."""
+
+    stage: int
+    function_name: str
+    text: str
+
+
+async def stream_text(
+    kernel: "Kernel",
+    function: "KernelFunction",
+    arguments: KernelArguments | None = None,
+    choice_index: int = 0,
+    **kwargs: Any,
+) -> AsyncIterator[str]:
+    """
+    Invoke a prompt function (e.g. one loaded from skprompt.txt) and yield its output text as it is generated.
+
+    Only the text of choice `choice_index` is yielded. Functions that do not stream (native functions) yield
+    their whole result once.
+    """
+    async for partial in kernel.invoke_stream(function, arguments, **kwargs):
+        if isinstance(partial, FunctionResult):
+            yield str(partial)
+            continue
+        for content in partial:
+            if getattr(content, "choice_index", 0) == choice_index:
+                text = str(content)
+                if text:
+                    yield text
+
+
+async def stream_pipeline(
+    kernel: "Kernel",
+    stages: list[PipelineStage],
+    arguments: KernelArguments | None = None,
+) -> AsyncIterator[StreamChunk]:
+    """
+    Stream a chain of functions, where every stage gets the complete output of the previous one as input.
+
+    The chunks of every stage are yielded as soon as they arrive, so the first one reaches the user with the
+    first model chunk. The chunks are collected once, in a list, and joined once the stage is complete to
+    start the next stage.
+    Args:
+        kernel -- The kernel
+        stages -- The functions to run, in order
+        arguments -- The arguments (and execution settings) of every stage; a stage's own arguments take precedence
+    """
+    output: str | None = None
+    for position, stage in enumerate(stages):
+        stage_arguments = KernelArguments(settings=arguments.execution_settings if arguments else None)
+        stage_arguments.update(arguments or {})
+        stage_arguments.update(stage.arguments)
+        if output is not None:
+            stage_arguments[stage.input_name] = output
+        chunks: list[str] = []
+        async for text in stream_text(kernel, stage.function, stage_arguments):
+            chunks.append(text)
+            yield StreamChunk(stage=position, function_name=stage.function.name, text=text)
+        output = "".join(chunks)
+
+
+def choice_finished(content: Any) -> bool:
+    """Whether a streamed chunk is the last one of its choice (chat chunks carry it, text chunks in their choices)."""
+    if getattr(content, "finish_reason", None):
+        return True
+    for choice in getattr(content.inner_content, "choices", None) or []:
+        if getattr(choice, "index", None) == content.choice_index and getattr(choice, "finish_reason", None):
+            return True
+    return False
+
+
+class ChoiceBuffer:
+    """
+    The text of one choice of a multi-choice stream, kept as the list of its chunks.
+
+    Appending a chunk costs the same however long the text is; the text is joined when it is asked for.
+    """
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.chunks: list[str] = []
+        self.done = asyncio.Event()
+        self._text = ""
+        self._joined = 0
+
+    @property
+    def text(self) -> str:
+        if self._joined != len(self.chunks):
+            self._text, self._joined = "".join(self.chunks), len(self.chunks)
+        return self._text
+
+
+class StreamDemultiplexer:
+    """
+    Description: Splits a multi-choice completion stream into the texts of its choices.
+
+    The chunks of every choice are appended to the choice's buffer as they arrive (see ChoiceBuffer). Consumers
+    read a choice with `stream_choice` (its chunks as they arrive), wait for it with `choices[index].done`, or read
+    all of them with `deltas`, which yields only the text added to each choice since the last time, optionally
+    coalesced over an interval, so a renderer never redraws what it already shows. The stream is read once, by a
+    task started by the first consumer.
+
+    Usage:
+        stream = chat_service.get_streaming_chat_message_contents(chat_history=chat, settings=settings)
+        demultiplexer = StreamDemultiplexer(stream, number_of_choices=settings.number_of_responses)
+        async for deltas in demultiplexer.deltas(interval=0.5):
+            for index, delta in deltas.items():
+                print(f"Result {index + 1}: ...{delta}")
+        texts = await demultiplexer.wait()
+    """
+
+    def __init__(self, stream: AsyncIterator[list[Any]], number_of_choices: int = 1) -> None:
+        """
+        Args:
+            stream -- The stream of a service (get_streaming_chat_message_contents, get_streaming_text_contents)
+            number_of_choices -- The number of choices expected; more are added as they appear
+        """
+        self.stream = stream
+        self.choices = [ChoiceBuffer(index) for index in range(number_of_choices)]
+        self.chunks = 0
+        self.completed = asyncio.Event()
+        # Set and replaced on every change; consumers wait for the current one
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._error: Exception | None = None
+
+    @property
+    def texts(self) -> list[str]:
+        return [choice.text for choice in self.choices]
+
+    def start(self) -> None:
+        """Start reading the stream, unless it is already."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._read())
+
+    async def wait(self) -> list[str]:
+        """The texts of all choices, once the stream is complete."""
+        self.start()
+        await self.completed.wait()
+        self._raise_error()
+        return self.texts
+
+    def _choice(self, index: int) -> ChoiceBuffer:
+        while index >= len(self.choices):
+            self.choices.append(ChoiceBuffer(len(self.choices)))
+        return self.choices[index]
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    async def _read(self) -> None:
+        try:
+            async for contents in self.stream:
+                for content in contents:
+                    choice = self._choice(getattr(content, "choice_index", 0))
+                    text = str(content)
+                    if text:
+                        choice.chunks.append(text)
+                    if choice_finished(content):
+                        choice.done.set()
+                self.chunks += 1
+                self._notify()
+        except Exception as exc:
+            # Raised to the consumers instead
+            self._error = exc
+        finally:
+            for choice in self.choices:
+                choice.done.set()
+            self.completed.set()
+            self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _wait_for(self, predicate: Callable[[], bool]) -> None:
+        while not predicate():
+            await self._changed.wait()
+
+    async def stream_choice(self, index: int) -> AsyncIterator[str]:
+        """Yield the chunks of one choice as they arrive (from its first chunk, whenever this is called)."""
+        self.start()
+        choice, cursor = self._choice(index), 0
+        while True:
+            await self._wait_for(lambda: len(choice.chunks) > cursor or choice.done.is_set())
+            while cursor < len(choice.chunks):
+                yield choice.chunks[cursor]
+                cursor += 1
+            if choice.done.is_set() and cursor == len(choice.chunks):
+                self._raise_error()
+                return
+
+    async def deltas(self, interval: float | None = None) -> AsyncIterator[dict[int, str]]:
+        """
+        Yield the text added to every choice since the previous yield, by choice index, until the stream is complete.
+
+        Args:
+            interval -- Wait this many seconds after a change before yielding, so that the deltas of all the chunks
+                        that arrive in the meantime are yielded at once
+        """
+        self.start()
+        cursors: dict[int, int] = {}
+
+        def changed() -> bool:
+            return self.completed.is_set() or any(len(choice.chunks) > cursors.get(choice.index, 0) for choice in self.choices)
+
+        while True:
+            await self._wait_for(changed)
+            if interval and not self.completed.is_set():
+                try:
+                    await asyncio.wait_for(self.completed.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+            deltas = {}
+            for choice in self.choices:
+                cursor, end = cursors.get(choice.index, 0), len(choice.chunks)
+                if end > cursor:
+                    deltas[choice.index] = "".join(choice.chunks[cursor:end])
+                    cursors[choice.index] = end
+            if deltas:
+                yield deltas
+            elif self.completed.is_set():
+                self._raise_error()
+                return
+
+
+async def benchmark_demultiplexer(choices: int = 8, tokens: int = 4096, redraw_every: int = 64) -> dict[str, float]:
+    """
+    Compare consuming a synthetic multi-choice stream by concatenating strings and redrawing every text (as
+    10-multiple-results-per-prompt.py did) with a StreamDemultiplexer that renders only the deltas.
+
+    Both write their output to an in-memory buffer, so only the consumer's cost is measured: the first redraws all
+    texts every `redraw_every` stream chunks, the demultiplexer renders the new text after every chunk.
+    Returns:
+        The seconds and rendered characters of the "concatenate" and "demultiplex" consumers
+    """
+    contents = [
+        [
+            StreamingChatMessageContent(role=AuthorRole.ASSISTANT, choice_index=index, content=benchmark_token)
+            for index in range(choices)
+        ]
+        for _ in range(tokens)
+    ]
+
+    async def stream() -> AsyncIterator[list[Any]]:
+        for chunk in contents:
+            # As a network stream would, let the consumer run between chunks
+            await asyncio.sleep(0)
+            yield chunk
+
+    # Concatenate every chunk to its text and redraw all the texts every `redraw_every` chunks
+    output = io.StringIO()
+    start = time.perf_counter()
+    texts = [""] * choices
+    position = 0
+    async for chunk in stream():
+        for content in chunk:
+            texts[content.choice_index] += str(content)
+        position += 1
+        if position % redraw_every == 0:
+            for index, text in enumerate(texts):
+                output.write(f"Result {index + 1}: {text}\n")
+    concatenate = {"seconds": time.perf_counter() - start, "rendered_characters": output.tell()}
+
+    # Render only the text added to every choice, as often as the stream allows
+    output = io.StringIO()
+    start = time.perf_counter()
+    demultiplexer = StreamDemultiplexer(stream(), number_of_choices=choices)
+    async for deltas in demultiplexer.deltas():
+        for index, delta in deltas.items():
+            output.write(f"Result {index + 1}: ...{delta}\n")
+    if await demultiplexer.wait() != texts:
+        raise ValueError("The demultiplexed texts differ from the concatenated ones")
+    demultiplex = {"seconds": time.perf_counter() - start, "rendered_characters": output.tell()}
+    return {"concatenate": concatenate, "demultiplex": demultiplex}